@@ -0,0 +1,68 @@
+"""Compare committing a version bump with `git commit -am` and with the plumbing commit path in a large repository.
+
+Usage: python benchmarks/bench_commit.py [--files 100000] [--rounds 5] [--repo-dir DIR]
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import tempfile
+import time
+
+from bumpyproject.git_helper import GitHelper
+
+
+def make_large_repo(repo_dir: pathlib.Path, num_files: int, files_per_dir=500):
+    subprocess.run(["git", "init", "-q", str(repo_dir)], check=True)
+    subprocess.run(["git", "config", "user.email", "bench@bumpyproject.com"], cwd=repo_dir, check=True)
+    subprocess.run(["git", "config", "user.name", "bench"], cwd=repo_dir, check=True)
+
+    for i in range(num_files):
+        sub_dir = repo_dir / "src" / f"module_{i // files_per_dir}"
+        if i % files_per_dir == 0:
+            sub_dir.mkdir(parents=True)
+        (sub_dir / f"file_{i}.py").write_text(f"VALUE = {i}\n")
+
+    (repo_dir / "pyproject.toml").write_text('[project]\nname = "bench"\nversion = "0.0.0"\n')
+    subprocess.run(["git", "add", "-A"], cwd=repo_dir, check=True)
+    subprocess.run(["git", "commit", "-q", "-m", "Initial Commit"], cwd=repo_dir, check=True)
+
+
+def timed_commit(git_helper: GitHelper, round_number: int, use_plumbing: bool) -> float:
+    pyproject_toml = git_helper.repo_root_dir / "pyproject.toml"
+    pyproject_toml.write_text(f'[project]\nname = "bench"\nversion = "0.0.{round_number}"\n')
+
+    paths = [pyproject_toml] if use_plumbing else None
+    start = time.perf_counter()
+    git_helper.commit(f"bump round {round_number}", paths)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--repo-dir", type=pathlib.Path, default=None, help="Reuse or create the repo here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo_dir = args.repo_dir or pathlib.Path(temp_dir) / "large_repo"
+        if not (repo_dir / ".git").exists():
+            print(f"Creating a repository with {args.files} files in {repo_dir}...")
+            make_large_repo(repo_dir, args.files)
+
+        git_helper = GitHelper(repo_dir)
+        porcelain, plumbing = [], []
+        for i in range(args.rounds):
+            porcelain.append(timed_commit(git_helper, 2 * i + 1, use_plumbing=False))
+            plumbing.append(timed_commit(git_helper, 2 * i + 2, use_plumbing=True))
+
+    porcelain_ms, plumbing_ms = statistics.median(porcelain) * 1000, statistics.median(plumbing) * 1000
+    print(f"median commit time over {args.rounds} rounds")
+    print(f"  git commit -am : {porcelain_ms:8.1f} ms")
+    print(f"  plumbing       : {plumbing_ms:8.1f} ms  ({porcelain_ms / plumbing_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare finding the latest of many versions with semver.compare and with the parse-once Version type.
+
+Usage: python benchmarks/bench_versions.py [--count 100000]
+"""
+
+import argparse
+import random
+import time
+
+import semver
+
+from bumpyproject import versions
+
+
+def make_versions(count: int, seed=0) -> list[str]:
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        ver = f"{rng.randint(0, 30)}.{rng.randint(0, 50)}.{rng.randint(0, 200)}"
+        if rng.random() < 0.5:
+            ver += f"-alpha.{rng.randint(1, 50)}"
+        result.append(ver)
+    return result
+
+
+def latest_with_semver_compare(version_list: list[str]) -> str:
+    # The implementation used before the Version type was introduced
+    latest = versions.make_semver_compatible(version_list[0])
+    for ver in version_list[1:]:
+        semver_compatible = versions.make_semver_compatible(ver)
+        if semver.compare(semver_compatible, latest) == 1:
+            latest = semver_compatible
+    return latest
+
+
+def timed(func, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    version_list = make_versions(args.count)
+    baseline, expected = timed(latest_with_semver_compare, version_list)
+
+    versions._parse_version.cache_clear()
+    cold, result = timed(versions.latest_version, version_list)
+    warm, _ = timed(versions.latest_version, version_list)
+    assert result == expected
+
+    print(f"latest of {args.count} versions")
+    print(f"  {'semver.compare scan':<23}: {baseline * 1000:8.1f} ms")
+    print(f"  {'Version (cold cache)':<23}: {cold * 1000:8.1f} ms  ({baseline / cold:.1f}x)")
+    print(f"  {'Version (warm cache)':<23}: {warm * 1000:8.1f} ms  ({baseline / warm:.1f}x)")
+
+    for name, func in [
+        ("top 10", lambda: versions.top_versions(version_list, 10)),
+        ("latest per minor series", lambda: versions.latest_versions_per_series(version_list)),
+        ("sorted", lambda: versions.sort_versions(version_list)),
+    ]:
+        elapsed, _ = timed(func)
+        print(f"  {name:<23}: {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
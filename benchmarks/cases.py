@@ -0,0 +1,290 @@
+"""The benchmark cases.
+
+A case receives the `BenchContext` and returns the callable to time, or a (setup, run) pair when every round needs a
+fresh state. Only `run` is timed."""
+
+import contextlib
+import functools
+import os
+import pathlib
+import shutil
+import tempfile
+from collections.abc import Callable
+
+from benchmarks import fixtures
+from tests.registry_stub import OCIRegistryStub, RegistryStub, conda_route, pypi_route, simple_route
+
+CASES: dict[str, Callable] = {}
+
+
+def case(name: str):
+    def decorator(func):
+        CASES[name] = func
+        return func
+
+    return decorator
+
+
+def _restore_environ(name: str, value: str | None):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+
+
+class BenchContext:
+    """Lazily built fixtures and registry stand-ins shared by the cases of one run."""
+
+    def __init__(self, fixtures_dir: pathlib.Path, scale=1.0, registry_latency=0.05):
+        self.fixtures_dir = fixtures_dir
+        self.scale = scale
+        self.registry_latency = registry_latency
+        self.stack = contextlib.ExitStack()
+        self.temp_dir = pathlib.Path(self.stack.enter_context(tempfile.TemporaryDirectory()))
+
+    def scaled(self, count: int) -> int:
+        return max(1, int(count * self.scale))
+
+    def __enter__(self):
+        # The HTTP cache of the run must not leak into the user's cache or into the next run
+        previous = os.environ.get("BUMPY_CACHE_DIR")
+        os.environ["BUMPY_CACHE_DIR"] = str(self.temp_dir / "cache")
+        self.stack.callback(_restore_environ, "BUMPY_CACHE_DIR", previous)
+        return self
+
+    def __exit__(self, *exc):
+        self.stack.close()
+
+    @functools.cached_property
+    def params(self) -> dict:
+        return {
+            "commits": self.scaled(10_000),
+            "tags_per_commit": 5,
+            "packages": self.scaled(300),
+            "worktree_files": self.scaled(200_000),
+            "versions": self.scaled(100_000),
+            "registry_releases": self.scaled(5_000),
+            "registry_latency": self.registry_latency,
+        }
+
+    @functools.cached_property
+    def history_repo(self) -> pathlib.Path:
+        return fixtures.make_history_repo(self.fixtures_dir, self.params["commits"], self.params["tags_per_commit"])
+
+    @functools.cached_property
+    def monorepo(self) -> pathlib.Path:
+        return fixtures.make_monorepo(self.fixtures_dir, self.params["packages"])
+
+    @functools.cached_property
+    def large_worktree(self) -> pathlib.Path:
+        return fixtures.make_large_worktree(self.fixtures_dir, self.params["worktree_files"])
+
+    @functools.cached_property
+    def version_strings(self) -> list[str]:
+        return fixtures.make_version_strings(self.params["versions"])
+
+    @functools.cached_property
+    def registry(self) -> RegistryStub:
+        """PyPI and Conda stand-ins whose releases are all older than the synthetic projects' version 10.0.0."""
+        releases = fixtures.make_version_strings(self.params["registry_releases"], seed=1, max_major=9)
+        routes = {
+            "/pypi/bench/json": pypi_route(releases, latency=self.registry_latency, headers={"ETag": '"pypi"'}),
+            "/simple/bench/": simple_route(releases, latency=self.registry_latency, headers={"ETag": '"simple"'}),
+            "/conda/bench/files": conda_route(releases, latency=self.registry_latency, headers={"ETag": '"conda"'}),
+        }
+        return self.stack.enter_context(RegistryStub(routes))
+
+    @functools.cached_property
+    def oci_registry(self) -> OCIRegistryStub:
+        stub = self.stack.enter_context(OCIRegistryStub(latency=self.registry_latency))
+        for i in range(self.params["registry_releases"]):
+            stub.add_image("bench", fixtures.commit_version(i), f'{{"build": {i}}}'.encode())
+        return stub
+
+    def new_dir(self, name: str) -> pathlib.Path:
+        path = self.temp_dir / name
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        return path
+
+
+@case("versions.latest")
+def versions_latest(ctx: BenchContext):
+    from bumpyproject import versions
+
+    def setup():
+        versions._parse_version.cache_clear()
+
+    return setup, lambda: versions.latest_version(ctx.version_strings)
+
+
+@case("versions.sort")
+def versions_sort(ctx: BenchContext):
+    from bumpyproject import versions
+
+    def setup():
+        versions._parse_version.cache_clear()
+
+    return setup, lambda: versions.sort_versions(ctx.version_strings)
+
+
+@case("project.bump")
+def project_bump(ctx: BenchContext):
+    from bumpyproject.project import Project
+
+    registry = ctx.registry
+    state = {}
+
+    def setup():
+        repo_dir = fixtures.make_project_repo(ctx.new_dir("bump") / "project")
+        state["project"] = Project(
+            repo_dir, pypi_url=f"{registry.url}/pypi/bench/json", conda_url=f"{registry.url}/conda/bench/files"
+        )
+
+    return setup, lambda: state["project"].bump("pre-release")
+
+
+@case("project.write_version")
+def project_write_version(ctx: BenchContext):
+    from bumpyproject.project import Project
+
+    repo_dir = fixtures.make_project_repo(ctx.new_dir("write") / "project", dependencies=2000)
+    project = Project(repo_dir)
+    counter = iter(range(1, 1_000_000))
+    return lambda: project.write_version(f"10.0.{next(counter)}")
+
+
+@case("git.history.cold")
+def git_history_cold(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+    from bumpyproject.history import VersionHistory
+
+    repo_dir = ctx.history_repo
+    git_helper = GitHelper(repo_dir)
+
+    def setup():
+        shutil.rmtree(repo_dir / ".git" / "bumpy", ignore_errors=True)
+
+    return setup, lambda: VersionHistory(git_helper, repo_dir / "pyproject.toml").update()
+
+
+@case("git.history.lookup")
+def git_history_lookup(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+    from bumpyproject.history import VersionHistory
+
+    repo_dir = ctx.history_repo
+    git_helper = GitHelper(repo_dir)
+    VersionHistory(git_helper, repo_dir / "pyproject.toml").update()
+    oldest = fixtures.commit_version(0)
+
+    def run():
+        history = VersionHistory(git_helper, repo_dir / "pyproject.toml")
+        history.update()
+        return history.commit_introducing(oldest)
+
+    return run
+
+
+@case("git.versions_at_tags")
+def git_versions_at_tags(ctx: BenchContext):
+    from bumpyproject.project import Project
+
+    project = Project(ctx.history_repo)
+    tags = [fixtures.commit_version(k) for k in range(0, ctx.params["commits"], max(1, ctx.params["commits"] // 500))]
+
+    def setup():
+        project.git.cat_file.close()
+        project.git.cat_file._cache.clear()
+
+    return setup, lambda: project.pyproject_versions_at(tags)
+
+
+@case("git.latest_tag")
+def git_latest_tag(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+
+    git_helper = GitHelper(ctx.history_repo)
+    return git_helper.get_latest_tag
+
+
+@case("git.latest_tag.cold")
+def git_latest_tag_cold(ctx: BenchContext):
+    from bumpyproject import tag_index
+    from bumpyproject.git_helper import GitHelper
+
+    git_helper = GitHelper(ctx.history_repo)
+    return tag_index._cache.clear, git_helper.get_latest_tag
+
+
+@case("git.bump_level")
+def git_bump_level(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+
+    # None of the fixture's messages asks for a level, so the whole history is scanned
+    git_helper = GitHelper(ctx.history_repo)
+    root = git_helper.git_repo.git.rev_list("--max-parents=0", "HEAD")
+
+    def run():
+        with contextlib.suppress(ValueError):
+            git_helper.get_bump_level_from_commit(since=root)
+
+    return run
+
+
+@case("git.dirty.full")
+def git_dirty_full(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+
+    git_helper = GitHelper(ctx.large_worktree)
+    return git_helper.is_dirty
+
+
+@case("git.dirty.scoped")
+def git_dirty_scoped(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+
+    git_helper = GitHelper(ctx.large_worktree)
+    paths = [ctx.large_worktree / "pyproject.toml"]
+    return git_helper._dirty_cache.clear, lambda: git_helper.is_dirty(paths)
+
+
+@case("git.dirty.scoped.cached")
+def git_dirty_scoped_cached(ctx: BenchContext):
+    from bumpyproject.git_helper import GitHelper
+
+    git_helper = GitHelper(ctx.large_worktree)
+    paths = [ctx.large_worktree / "pyproject.toml"]
+    return lambda: git_helper.is_dirty(paths)
+
+
+@case("discovery.find_pyprojects")
+def discovery_find_pyprojects(ctx: BenchContext):
+    from bumpyproject import discovery
+
+    return lambda: discovery.find_files(ctx.monorepo, "pyproject.toml")
+
+
+@case("registry.pypi")
+def registry_pypi(ctx: BenchContext):
+    from bumpyproject import py_distro
+
+    url = f"{ctx.registry.url}/pypi/bench/json"
+    return lambda: py_distro.get_latest_pypi_version(url)
+
+
+@case("registry.conda")
+def registry_conda(ctx: BenchContext):
+    from bumpyproject import py_distro
+
+    url = f"{ctx.registry.url}/conda/bench/files"
+    return lambda: py_distro.get_latest_conda_version(url)
+
+
+@case("registry.oci_tags")
+def registry_oci_tags(ctx: BenchContext):
+    from bumpyproject import versions
+    from bumpyproject.oci_registry import OCIRegistry
+
+    stub = ctx.oci_registry
+    return lambda: versions.latest_version(OCIRegistry(stub.url).iter_tags("bench", page_size=100), skip_invalid=True)
@@ -0,0 +1,160 @@
+"""Scaled fixtures for the benchmark suite.
+
+Fixtures are generated once per parameter set under the fixtures directory and reused by later runs, so results of
+different commits are measured against identical repositories."""
+
+import json
+import pathlib
+import random
+import shutil
+import subprocess
+
+GIT_ENV_NAME = "bench"
+GIT_ENV_EMAIL = "bench@bumpyproject.com"
+
+
+def _git(cwd: pathlib.Path, *args, **kwargs):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, **kwargs)
+
+
+def _init_repo(repo_dir: pathlib.Path, bare_remote: pathlib.Path | None = None):
+    repo_dir.mkdir(parents=True, exist_ok=True)
+    _git(repo_dir, "init", "-q", "-b", "main")
+    _git(repo_dir, "config", "user.email", GIT_ENV_EMAIL)
+    _git(repo_dir, "config", "user.name", GIT_ENV_NAME)
+    if bare_remote is not None:
+        _git(repo_dir, "init", "-q", "--bare", str(bare_remote))
+        _git(repo_dir, "remote", "add", "origin", str(bare_remote))
+
+
+def _cached(path: pathlib.Path, build) -> pathlib.Path:
+    """Build the fixture at path unless a complete one exists."""
+    marker = path / ".bench-complete"
+    if marker.exists():
+        return path
+
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+    build(path)
+    marker.touch()
+    return path
+
+
+def pyproject_text(name: str, version: str, dependencies=0) -> str:
+    deps = "".join(f'    "dependency-{i}>={i % 7}.{i % 13}",\n' for i in range(dependencies))
+    return (
+        f'[project]\nname = "{name}"\nversion = "{version}"\ndescription = "A synthetic {name} package"\n'
+        f"dependencies = [\n{deps}]\n\n[tool.black]\nline-length = 120\n"
+    )
+
+
+def commit_version(k: int) -> str:
+    return f"{k // 1000}.{(k // 100) % 10}.{k % 100}"
+
+
+def make_version_strings(count: int, seed=0, max_major=30) -> list[str]:
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        ver = f"{rng.randint(0, max_major)}.{rng.randint(0, 50)}.{rng.randint(0, 200)}"
+        if rng.random() < 0.5:
+            ver += f"-alpha.{rng.randint(1, 50)}"
+        result.append(ver)
+    return result
+
+
+def make_history_repo(fixtures_dir: pathlib.Path, commits: int, tags_per_commit: int) -> pathlib.Path:
+    """A repository with a linear history in which every commit bumps pyproject.toml.
+
+    Commit k has version `commit_version(k)` and is tagged with it and with `tags_per_commit - 1` alpha pre-releases
+    of that version. The history is written in one go with `git fast-import`."""
+
+    def build(repo_dir: pathlib.Path):
+        _init_repo(repo_dir, bare_remote=repo_dir.with_name(f"{repo_dir.name}-origin.git"))
+        lines = []
+
+        def data(payload: str):
+            raw = payload.encode()
+            lines.append(f"data {len(raw)}\n".encode() + raw + b"\n")
+
+        for k in range(commits):
+            version = commit_version(k)
+            lines.append(f"commit refs/heads/main\nmark :{k + 1}\n".encode())
+            lines.append(f"committer {GIT_ENV_NAME} <{GIT_ENV_EMAIL}> {1_600_000_000 + k * 60} +0000\n".encode())
+            data(f"bump to {version}\n")
+            if k > 0:
+                lines.append(f"from :{k}\n".encode())
+            lines.append(b"M 644 inline pyproject.toml\n")
+            data(pyproject_text("history", version))
+            lines.append(f"M 644 inline src/module_{k % 200}.py\n".encode())
+            data(f"VALUE = {k}\n")
+            lines.append(b"\n")
+
+        for k in range(commits):
+            version = commit_version(k)
+            names = [version] + [f"{version}-alpha.{i}" for i in range(1, tags_per_commit)]
+            for name in names:
+                lines.append(f"reset refs/tags/{name}\nfrom :{k + 1}\n\n".encode())
+
+        _git(repo_dir, "fast-import", "--quiet", input=b"".join(lines))
+        _git(repo_dir, "pack-refs", "--all")
+        _git(repo_dir, "checkout", "-q", "main")
+
+    return _cached(fixtures_dir / f"history-{commits}x{tags_per_commit}", build)
+
+
+def make_monorepo(fixtures_dir: pathlib.Path, packages: int, files_per_package=20) -> pathlib.Path:
+    """A committed monorepo with one pyproject.toml per package and an ignored virtual env next to them."""
+
+    def build(repo_dir: pathlib.Path):
+        _init_repo(repo_dir)
+        for i in range(packages):
+            package_dir = repo_dir / "packages" / f"pkg_{i}"
+            (package_dir / "src").mkdir(parents=True)
+            (package_dir / "pyproject.toml").write_text(pyproject_text(f"pkg_{i}", "1.0.0"))
+            for j in range(files_per_package):
+                (package_dir / "src" / f"module_{j}.py").write_text(f"VALUE = {j}\n")
+
+        (repo_dir / ".gitignore").write_text(".venv/\n")
+        site_packages = repo_dir / ".venv" / "lib" / "site-packages"
+        for i in range(packages):
+            (site_packages / f"dist_{i}").mkdir(parents=True)
+            (site_packages / f"dist_{i}" / "pyproject.toml").write_text(pyproject_text(f"dist_{i}", "0.1.0"))
+
+        _git(repo_dir, "add", "-A")
+        _git(repo_dir, "commit", "-q", "-m", "Initial Commit")
+
+    return _cached(fixtures_dir / f"monorepo-{packages}", build)
+
+
+def make_large_worktree(fixtures_dir: pathlib.Path, files: int, files_per_dir=500) -> pathlib.Path:
+    """A checked out single commit with a pyproject.toml and `files` small tracked files, written with
+    `git fast-import`."""
+
+    def build(repo_dir: pathlib.Path):
+        _init_repo(repo_dir)
+        lines = [f"commit refs/heads/main\ncommitter {GIT_ENV_NAME} <{GIT_ENV_EMAIL}> 1600000000 +0000\n".encode()]
+        lines.append(b"data 15\nInitial Commit\n\n")
+        lines.append(b"M 644 inline pyproject.toml\n")
+        raw = pyproject_text("large", "1.0.0").encode()
+        lines.append(f"data {len(raw)}\n".encode() + raw + b"\n")
+        for i in range(files):
+            raw = f"VALUE = {i}\n".encode()
+            lines.append(f"M 644 inline src/dir_{i // files_per_dir}/module_{i}.py\n".encode())
+            lines.append(f"data {len(raw)}\n".encode() + raw + b"\n")
+        lines.append(b"\n")
+
+        _git(repo_dir, "fast-import", "--quiet", input=b"".join(lines))
+        _git(repo_dir, "checkout", "-q", "main")
+
+    return _cached(fixtures_dir / f"worktree-{files}", build)
+
+
+def make_project_repo(repo_dir: pathlib.Path, version="10.0.0", dependencies=0) -> pathlib.Path:
+    """A fresh single project repository with a bare origin, the kind `Project.bump` runs against."""
+    _init_repo(repo_dir, bare_remote=repo_dir.parent / f"{repo_dir.name}-origin.git")
+    (repo_dir / "pyproject.toml").write_text(pyproject_text("bench", version, dependencies))
+    (repo_dir / "package.json").write_text(json.dumps({"name": "bench", "version": version}, indent=2))
+    _git(repo_dir, "add", "-A")
+    _git(repo_dir, "commit", "-q", "-m", "Initial Commit")
+    return repo_dir
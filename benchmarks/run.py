@@ -0,0 +1,116 @@
+"""Run the benchmark suite and write the results as JSON, optionally comparing them with an earlier run.
+
+Usage: python -m benchmarks.run [--scale 1.0] [--rounds 5] [--filter git.] [--output FILE] [--compare FILE]
+
+The fixtures are cached in --fixtures-dir so consecutive runs (e.g. on two commits) time the same repositories.
+"""
+
+import argparse
+import fnmatch
+import json
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.cases import CASES, BenchContext
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=False)
+        return result.stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "src"))}
+
+
+def run_case(name: str, ctx: BenchContext, rounds: int, warmup: int) -> dict:
+    prepared = CASES[name](ctx)
+    setup, func = prepared if isinstance(prepared, tuple) else (None, prepared)
+
+    timings = []
+    for i in range(warmup + rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+
+    return {
+        "rounds": rounds,
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "stdev_ms": statistics.stdev(timings) * 1000 if len(timings) > 1 else 0.0,
+    }
+
+
+def format_comparison(results: dict, baseline: dict, threshold: float) -> str:
+    lines = [f"{'case':<28} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}"]
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            lines.append(f"{name:<28} {'-':>12} {result['median_ms']:>12.1f} {'new':>7}")
+            continue
+
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        flag = "  slower" if ratio > 1 + threshold else "  faster" if ratio < 1 - threshold else ""
+        lines.append(f"{name:<28} {before['median_ms']:>12.1f} {result['median_ms']:>12.1f} {ratio:>7.2f}{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale the size of all fixtures")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--filter", default="*", help="Only run the cases matching this glob")
+    parser.add_argument("--registry-latency", type=float, default=0.05, help="Latency of the registry stand-ins (s)")
+    parser.add_argument("--fixtures-dir", type=pathlib.Path, default=REPO_ROOT / ".benchmarks" / "fixtures")
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    parser.add_argument("--compare", type=pathlib.Path, default=None, help="Results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as slower/faster")
+    args = parser.parse_args()
+
+    pattern = args.filter if any(c in args.filter for c in "*?[") else f"*{args.filter}*"
+    names = [name for name in CASES if fnmatch.fnmatch(name, pattern)]
+
+    results = {}
+    with BenchContext(args.fixtures_dir, args.scale, args.registry_latency) as ctx:
+        for name in names:
+            results[name] = run_case(name, ctx, args.rounds, args.warmup)
+            print(f"{name:<28} {results[name]['median_ms']:>10.1f} ms", file=sys.stderr)
+        params = ctx.params
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),  # noqa: UP017 - UTC needs 3.11
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": results,
+    }
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())
+        if baseline["meta"]["params"] != params:
+            print("Warning: the baseline was run with other fixture parameters", file=sys.stderr)
+        print(format_comparison(results, baseline, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+from bumpyproject import env_vars as env
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class DiskCachedCredential:
+    """Wraps an azure TokenCredential and keeps the access tokens it issues in a file until shortly before they
+    expire, so that consecutive bumpy runs do not have to authenticate against AAD again."""
+
+    def __init__(self, credential, cache_file: str | pathlib.Path, expiry_margin: float = 300):
+        self._credential = credential
+        self._cache_file = pathlib.Path(cache_file)
+        self._expiry_margin = expiry_margin
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes: str, **kwargs):
+        from azure.core.credentials import AccessToken
+
+        # Tokens requested with claims (e.g. a CAE challenge) are never served from the cache
+        if kwargs.get("claims"):
+            return self._credential.get_token(*scopes, **kwargs)
+
+        # Tokens differ by tenant and by whether they support continuous access evaluation
+        key = json.dumps([sorted(scopes), kwargs.get("tenant_id"), bool(kwargs.get("enable_cae"))])
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is not None and entry["expires_on"] - self._expiry_margin > time.time():
+                return AccessToken(entry["token"], entry["expires_on"])
+
+            token = self._credential.get_token(*scopes, **kwargs)
+            entries[key] = {"token": token.token, "expires_on": token.expires_on}
+            self._store(entries)
+
+        return token
+
+    def close(self):
+        self._credential.close()
+
+    def _load(self) -> dict:
+        try:
+            with open(self._cache_file, "r") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+        now = time.time()
+        return {key: entry for key, entry in entries.items() if entry["expires_on"] > now}
+
+    def _store(self, entries: dict):
+        self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # mkstemp creates the file readable by the current user only
+        fd, tmp_name = tempfile.mkstemp(dir=self._cache_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_name, self._cache_file)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+
+def get_acr_client(acr_name: str, tenant_id: str, client_id: str, client_secret: str, timeout: float | None = None):
+    """Return a ContainerRegistryClient shared by every caller using the same registry and service principal.
+
+    With a timeout (in seconds) every request of the client, and the retries of a request all together, give up
+    after that time."""
+    key = (acr_name, tenant_id, client_id, client_secret, timeout)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        from azure.containerregistry import ContainerRegistryClient
+        from azure.identity import ClientSecretCredential
+
+        credential = ClientSecretCredential(tenant_id=tenant_id, client_id=client_id, client_secret=client_secret)
+        if env.ACR_TOKEN_CACHE:
+            cache_name = hashlib.sha256(f"{tenant_id}:{client_id}".encode()).hexdigest()
+            credential = DiskCachedCredential(credential, env.BUMPY_CACHE_DIR / "tokens" / f"{cache_name}.json")
+
+        timeouts = {}
+        if timeout is not None:
+            timeouts = {"connection_timeout": timeout, "read_timeout": timeout, "timeout": timeout}
+
+        client = ContainerRegistryClient(
+            endpoint=f"https://{acr_name}.azurecr.io",
+            credential=credential,
+            audience="https://management.azure.com",
+            **timeouts,
+        )
+        _clients[key] = client
+
+    return client
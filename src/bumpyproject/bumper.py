@@ -1,7 +1,7 @@
 import semver
 
 from bumpyproject import env_vars as env
-from bumpyproject.versions import BumpLevel, make_semver_compatible
+from bumpyproject.versions import BumpLevel, parse_version
 
 
 class BumpLevelSizeError(Exception):
@@ -17,7 +17,7 @@ class NoVersionChangeError(Exception):
 
 
 def version_to_tuple(version: str) -> tuple:
-    ver = semver.VersionInfo.parse(version).to_tuple()
+    ver = parse_version(version).to_tuple()
     output = []
     for x in ver:
         if x is None:
@@ -40,12 +40,11 @@ def get_bump_delta(old_version: str, new_version: str) -> list[int, int, int, in
 
 
 def is_newer(old_version: str, new_version: str) -> bool:
-    old_version = make_semver_compatible(old_version)
+    old, new = parse_version(old_version), parse_version(new_version)
 
-    compare = semver.compare(old_version, new_version)
-    if compare == 1:
+    if old > new:
         raise OutdatedBumpError(f"Next bump is outdated! {new_version=} < {old_version=}")
-    elif compare == 0:
+    elif old == new:
         raise NoVersionChangeError(f"No version change {new_version=} == {old_version=}")
 
     return True
@@ -1,28 +1,68 @@
 from __future__ import annotations
 
-import re
+import pathlib
 import tempfile
 
 import typer
 from typing_extensions import Annotated
 
-from bumpyproject import project
-from bumpyproject.bumper import BumpLevel
-from bumpyproject.docker_helper import DockerACRHelper
-from bumpyproject.git_helper import GitHelper
-from bumpyproject.log_utils import logger
+from bumpyproject import env_vars as env
+from bumpyproject import tracing
 from bumpyproject.github_helper import set_github_actions_variable
+from bumpyproject.helpers import get_working_dir
+from bumpyproject.log_utils import logger
+from bumpyproject.versions import BumpLevel
+
+# Only light-weight modules are imported here. Project, GitHelper, DockerACRHelper and the registry clients pull in
+# git, docker, azure and requests, so they are imported within the commands that use them.
 
 logger.setLevel("INFO")
 app = typer.Typer()
 
-_pyproject_toml = typer.Option(None, envvar="PYPROJECT_TOML")
-_package_json = typer.Option(None, envvar="PACKAGE_JSON")
+
+def _resolve_path(value: str | None) -> str | None:
+    """Resolve relative paths against the directory the command was run in, which the daemon sets per request."""
+    if value is None:
+        return None
+    return str(pathlib.Path(get_working_dir(), value))
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: str = typer.Option(
+        None,
+        envvar="BUMPY_PROFILE",
+        callback=_resolve_path,
+        help="Write a Chrome trace of the run to this file and print a timing summary",
+    ),
+):
+    # Load the .env file before the options of the sub command fall back to their environment variables
+    env.load_env()
+
+    if profile is not None:
+        tracer = tracing.enable()
+        ctx.call_on_close(lambda: _write_profile(tracer, profile))
+
+
+def _write_profile(tracer: tracing.Tracer, path: str):
+    tracing.disable()
+    tracer.write_chrome_trace(path)
+    typer.echo(tracer.format_summary(), err=True)
+    typer.echo(f"Chrome trace written to {path}", err=True)
+
+
+_pyproject_toml = typer.Option(None, envvar="PYPROJECT_TOML", callback=_resolve_path)
+_package_json = typer.Option(None, envvar="PACKAGE_JSON", callback=_resolve_path)
+_git_root_dir = typer.Option(None, envvar="GIT_ROOT_DIR", callback=_resolve_path)
 
 
 @app.command()
 def pyproject(
     bump_level: BumpLevel = BumpLevel.PRE_RELEASE,
+    from_commits: bool = typer.Option(
+        False, help="Take the bump level from the commit messages since the last version tag instead"
+    ),
     pyproject_toml: str = _pyproject_toml,
     package_json: str = _package_json,
     pypi_url: str = typer.Option(None, envvar="PYPI_URL"),
@@ -32,6 +72,8 @@ def pyproject(
     push: bool = False,
     dry_run: bool = False,
 ):
+    from bumpyproject import project
+
     proj = project.Project(
         pyproject_toml=pyproject_toml,
         package_json=package_json,
@@ -40,6 +82,10 @@ def pyproject(
         ga_version_output=ga_version_output,
     )
 
+    if from_commits:
+        bump_level = proj.git.get_bump_level_from_commit()
+        logger.info(f"Bump level from the commit messages: {bump_level.value}")
+
     new_version = proj.bump(bump_level, check_current_version=check_current, dry_run=dry_run)
 
     if ga_version_output:
@@ -49,10 +95,60 @@ def pyproject(
         proj.git.push()
 
 
+@app.command()
+def workspace(
+    bump_level: BumpLevel = BumpLevel.PRE_RELEASE,
+    root_dir: str = _git_root_dir,
+    pypi_url: str = typer.Option(None, envvar="PYPI_URL", help='May contain a "{name}" placeholder'),
+    conda_url: str = typer.Option(None, envvar="CONDA_URL", help='May contain a "{name}" placeholder'),
+    max_workers: int = typer.Option(None, envvar="BUMPY_MAX_WORKERS"),
+    check_current: bool = False,
+    push: bool = False,
+    dry_run: bool = False,
+):
+    from bumpyproject.workspace import Workspace, format_summary
+
+    ws = Workspace(root_dir, pypi_url=pypi_url, conda_url=conda_url, max_workers=max_workers)
+    results = ws.bump(bump_level, check_current_version=check_current, dry_run=dry_run, git_push=push)
+    typer.echo(format_summary(results))
+
+
+@app.command()
+def history(
+    at: str = typer.Option(None, help="Print the version at this commit"),
+    introduced: str = typer.Option(None, help="Print the commit that introduced this version"),
+    ref: str = "HEAD",
+    pyproject_toml: str = _pyproject_toml,
+    git_root_dir: str = _git_root_dir,
+):
+    from bumpyproject import project
+    from bumpyproject.history import UnknownRevisionError
+
+    proj = project.Project(root_dir=git_root_dir, pyproject_toml=pyproject_toml)
+    try:
+        version_history = proj.version_history(ref)
+    except UnknownRevisionError as e:
+        raise typer.BadParameter(str(e), param_hint="REF") from e
+
+    if at is not None:
+        try:
+            typer.echo(version_history.version_at(at))
+        except UnknownRevisionError as e:
+            raise typer.BadParameter(str(e), param_hint="--at") from e
+    elif introduced is not None:
+        commit = version_history.commit_introducing(introduced)
+        if commit is None:
+            raise typer.BadParameter(f"No commit introduced version {introduced}", param_hint="--introduced")
+        typer.echo(commit)
+    else:
+        for commit, version in version_history.changes:
+            typer.echo(f"{commit} {version}")
+
+
 @app.command()
 def docker(
-    context_dir: Annotated[str, typer.Option()],
-    dockerfile: Annotated[str, typer.Option()],
+    context_dir: Annotated[str, typer.Option(callback=_resolve_path)],
+    dockerfile: Annotated[str, typer.Option(callback=_resolve_path)],
     acr_repo_name: str = typer.Option(envvar="AZ_ACR_REPO_NAME"),
     acr_name: str = typer.Option(envvar="AZ_ACR_NAME"),
     tenant_id: str = typer.Option(envvar="AZ_TENANT_ID"),
@@ -63,8 +159,11 @@ def docker(
     use_native_client=False,
     pyproject_toml: str = _pyproject_toml,
     package_json: str = _package_json,
-    git_root_dir: str = typer.Option(None, envvar="GIT_ROOT_DIR"),
+    git_root_dir: str = _git_root_dir,
 ):
+    from bumpyproject import project
+    from bumpyproject.docker_helper import DockerACRHelper
+
     proj = project.Project(
         root_dir=git_root_dir,
         pyproject_toml=pyproject_toml,
@@ -76,18 +175,115 @@ def docker(
     docker_helper.bump_acr_docker_image(proj, build, push, use_native_client)
 
 
+@app.command()
+def docker_matrix(
+    acr_name: str = typer.Option(envvar="AZ_ACR_NAME"),
+    tenant_id: str = typer.Option(None, envvar="AZ_TENANT_ID"),
+    client_id: str = typer.Option(None, envvar="AZ_ACR_SERVICE_PRINCIPAL_USERNAME"),
+    client_secret: str = typer.Option(None, envvar="AZ_ACR_SERVICE_PRINCIPAL_PASSWORD"),
+    push: bool = False,
+    check_acr: bool = True,
+    cache_dir: str = typer.Option(
+        None, envvar="BUMPY_DOCKER_CACHE_DIR", callback=_resolve_path, help="Local layer cache directory"
+    ),
+    cache_ref: str = typer.Option(None, envvar="BUMPY_DOCKER_CACHE_REF", help="Registry layer cache reference"),
+    max_workers: int = typer.Option(None, envvar="BUMPY_MAX_WORKERS"),
+    pyproject_toml: str = _pyproject_toml,
+    git_root_dir: str = _git_root_dir,
+):
+    """Build every image listed as [[tool.bumpy.images]] in pyproject.toml, tagged with the version and latest"""
+    from bumpyproject import docker_matrix as dm
+    from bumpyproject import project
+
+    proj = project.Project(root_dir=git_root_dir, pyproject_toml=pyproject_toml)
+    version = proj.get_pyproject_version()
+    specs = dm.load_build_matrix(proj.pyproject_toml_path)
+
+    if check_acr:
+        dm.check_image_versions(specs, acr_name, version, tenant_id, client_id, client_secret)
+
+    registry = f"{acr_name}.azurecr.io"
+    if push and client_id is not None and client_secret is not None:
+        dm.docker_login(registry, client_id, client_secret)
+
+    results = dm.build_matrix(specs, registry, version, cache_dir, cache_ref, push=push, max_workers=max_workers)
+    typer.echo(dm.format_summary(results))
+    if any(r.status != "built" for r in results):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def substitute(
+    new_version: str = typer.Option(None, help="Defaults to the version in pyproject.toml"),
+    pyproject_toml: str = _pyproject_toml,
+    git_root_dir: str = _git_root_dir,
+    dry_run: bool = False,
+):
+    """Write the version to every file matched by the [[tool.bumpy.substitutions]] rules in pyproject.toml"""
+    from bumpyproject import project
+
+    proj = project.Project(root_dir=git_root_dir, pyproject_toml=pyproject_toml)
+    if new_version is None:
+        new_version = proj.get_pyproject_version()
+
+    report = proj.apply_substitutions(new_version, dry_run=dry_run)
+    typer.echo(report.format() or "No matches")
+    if dry_run and report.changed_paths:
+        typer.echo(report.diff())
+
+
 @app.command()
 def git_file_editor(git_url: str, file_path: str, re_find_version: str, new_version: str):
+    from bumpyproject.git_helper import GitHelper
+    from bumpyproject.substitutions import SubstitutionRule, substitute_file
+
     with tempfile.TemporaryDirectory() as temp_dir:
-        git_helper = GitHelper.from_git_url(git_url, temp_dir)
+        git_helper = GitHelper.from_git_url(git_url, temp_dir, sparse_paths=[file_path])
         file_path = git_helper.repo_root_dir / file_path
-        with open(file_path, "r") as f:
-            file_content = f.read()
 
-        curr_version = re.search(re_find_version, file_content, flags=re.MULTILINE).group(1)
-        new_file_content = re.sub(re_find_version, new_version, file_content, flags=re.MULTILINE)
-        with open(file_path, "w") as f:
-            f.write(new_file_content)
+        # The first group of the pattern is the version that is replaced
+        result = substitute_file(file_path, (SubstitutionRule(file_path.name, re_find_version),), new_version)
+        if len(result.matches) == 0:
+            raise ValueError(f"{re_find_version!r} does not match anything in {file_path.name}")
 
-        commit_message = f"bumping version {curr_version} -> {new_version}"
+        commit_message = f"bumping version {result.matches[0].old} -> {new_version}"
         git_helper.git_repo.git.execute(["git", "commit", "-am", commit_message])
+
+
+@app.command()
+def fleet(
+    manifest: str = typer.Argument(
+        ..., callback=_resolve_path, help="TOML file listing the downstream repos as [[repos]]"
+    ),
+    new_version: str = typer.Option(None, help="Defaults to the version in pyproject.toml"),
+    pyproject_toml: str = _pyproject_toml,
+    max_workers: int = typer.Option(8, envvar="BUMPY_MAX_WORKERS"),
+    retries: int = 2,
+    push: bool = typer.Option(True, help="Push the commits (or the new branches) to the downstream repos"),
+):
+    """Write the version to the files pinning it in many downstream repositories concurrently"""
+    from bumpyproject import fleet as fl
+
+    if new_version is None:
+        from bumpyproject import project
+
+        new_version = project.Project(pyproject_toml=pyproject_toml).get_pyproject_version()
+
+    targets = fl.load_fleet_manifest(manifest)
+    results = fl.propagate_version(targets, new_version, max_workers=max_workers, retries=retries, push=push)
+    typer.echo(fl.format_summary(results))
+    if any(r.status == "failed" for r in results):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def daemon(
+    socket_path: str = typer.Option(None, "--socket", envvar="BUMPY_DAEMON_SOCKET", callback=_resolve_path),
+    max_workers: int = typer.Option(8, envvar="BUMPY_MAX_WORKERS", help="Commands run in parallel at most"),
+):
+    """Serve bumpy commands over a Unix socket, keeping repositories, HTTP sessions and credentials warm"""
+    from bumpyproject.daemon import BumpyDaemon
+
+    bumpy_daemon = BumpyDaemon(socket_path, max_workers=max_workers)
+    typer.echo(f"bumpy daemon listening on {bumpy_daemon.socket_path}", err=True)
+    bumpy_daemon.serve_forever()
@@ -0,0 +1,26 @@
+"""The `bumpy` entry point. Commands are forwarded to a running daemon (see `daemon`) and run in-process otherwise."""
+
+import sys
+
+
+def main():
+    argv = sys.argv[1:]
+    if argv[:1] != ["daemon"]:
+        from bumpyproject import env_vars as env
+
+        # The client's .env backs command line options just like a local run
+        env.load_env()
+        if not env.NO_DAEMON:
+            from bumpyproject.daemon import run_client
+
+            exit_code = run_client(argv)
+            if exit_code is not None:
+                sys.exit(exit_code)
+
+    from bumpyproject.cli_bumpy import app
+
+    app()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Bump levels from commit messages.
+
+A message selects a level with an explicit marker (`[major]`, `[minor]`, `[patch]`, `[pre-release]` or `[pre]`) or
+with a Conventional Commits header (https://www.conventionalcommits.org): `feat:` is a minor bump, `fix:` and
+`perf:` are patches, and a `!` after the type (`feat!:`, `fix(api)!:`) or a `BREAKING CHANGE:` footer is a major
+bump."""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+
+from bumpyproject.versions import BumpLevel
+
+# From the lowest to the highest level
+LEVEL_ORDER = (BumpLevel.PRE_RELEASE, BumpLevel.PATCH, BumpLevel.MINOR, BumpLevel.MAJOR)
+_RANK = {level: rank for rank, level in enumerate(LEVEL_ORDER)}
+
+_MARKERS = [(f"[{level.value}]", level) for level in reversed(LEVEL_ORDER)] + [("[pre]", BumpLevel.PRE_RELEASE)]
+_CONVENTIONAL_HEADER = re.compile(r"(?P<type>[A-Za-z]+)(?:\([^()\r\n]*\))?(?P<breaking>!)?: \S")
+_BREAKING_FOOTER = re.compile(r"^BREAKING[ -]CHANGE: ", re.MULTILINE)
+_TYPE_LEVELS = {"feat": BumpLevel.MINOR, "fix": BumpLevel.PATCH, "perf": BumpLevel.PATCH}
+
+
+def bump_level_of_message(message: str) -> BumpLevel | None:
+    """The level a single commit message asks for, or None if it does not ask for any."""
+    levels = [level for marker, level in _MARKERS if marker in message]
+
+    header = _CONVENTIONAL_HEADER.match(message.lstrip())
+    if header is not None:
+        if header["breaking"]:
+            levels.append(BumpLevel.MAJOR)
+        elif header["type"].lower() in _TYPE_LEVELS:
+            levels.append(_TYPE_LEVELS[header["type"].lower()])
+
+    if _BREAKING_FOOTER.search(message):
+        levels.append(BumpLevel.MAJOR)
+
+    return max(levels, key=_RANK.__getitem__, default=None)
+
+
+def highest_bump_level(messages: Iterable[str]) -> BumpLevel | None:
+    """The highest level asked for by any of the messages. Stops consuming the messages at the first major bump."""
+    highest = None
+    for message in messages:
+        level = bump_level_of_message(message)
+        if level is not None and (highest is None or _RANK[level] > _RANK[highest]):
+            highest = level
+            if highest is BumpLevel.MAJOR:
+                break
+
+    return highest
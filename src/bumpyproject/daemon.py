@@ -0,0 +1,327 @@
+"""A long-running bumpy process that runs the commands of thin `bumpy` clients over a Unix socket.
+
+The daemon keeps everything that a fresh process pays for on every call warm: the imported modules, the loaded .env,
+one `GitHelper` per repository, the pooled HTTP session, the ACR clients and their AAD tokens. Commands for the same
+repository are run one at a time, commands for different repositories run in parallel.
+
+Each request carries the client's arguments, working directory and the environment variables that back command line
+options. Module level settings (credentials, cache directories, timeouts) come from the daemon's own environment.
+The output of a command is collected and sent back, GitHub Actions outputs included, which the client writes to its
+own $GITHUB_OUTPUT.
+
+The protocol is a single line of JSON in each direction per connection."""
+
+from __future__ import annotations
+
+import contextvars
+import io
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+from bumpyproject import env_vars as env
+
+# The environment variables that back command line options, the only part of the client's environment that is sent
+# with a request. Kept in sync with the options of the app by tests/test_daemon.py, the client does not import it.
+OPTION_ENVVARS = frozenset(
+    {
+        "AZ_ACR_NAME",
+        "AZ_ACR_REPO_NAME",
+        "AZ_ACR_SERVICE_PRINCIPAL_PASSWORD",
+        "AZ_ACR_SERVICE_PRINCIPAL_USERNAME",
+        "AZ_TENANT_ID",
+        "BUMPY_DAEMON_SOCKET",
+        "BUMPY_DOCKER_CACHE_DIR",
+        "BUMPY_DOCKER_CACHE_REF",
+        "BUMPY_MAX_WORKERS",
+        "BUMPY_PROFILE",
+        "CONDA_URL",
+        "GIT_ROOT_DIR",
+        "PACKAGE_JSON",
+        "PYPI_URL",
+        "PYPROJECT_TOML",
+    }
+)
+
+_stdout: contextvars.ContextVar = contextvars.ContextVar("stdout", default=None)
+_stderr: contextvars.ContextVar = contextvars.ContextVar("stderr", default=None)
+
+
+class DaemonError(Exception):
+    pass
+
+
+class _RoutedStream:
+    """Stands in for sys.stdout/sys.stderr and writes to the stream of the request running in the current context."""
+
+    encoding = "utf-8"
+    errors = "strict"
+
+    def __init__(self, default, target: contextvars.ContextVar):
+        self._default = default
+        self._target = target
+
+    def _stream(self):
+        return self._target.get() or self._default
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        return self._stream().flush()
+
+    def isatty(self):
+        return self._stream().isatty()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+
+def _option_envvars(command, path=()) -> dict[str, tuple[tuple[str, ...], str]]:
+    """Map the environment variables of the app's options to (command path, parameter name)."""
+    envvars = {}
+    for param in command.params:
+        names = param.envvar if isinstance(param.envvar, (list, tuple)) else [param.envvar]
+        for name in names:
+            if name:
+                envvars[name] = (path, param.name)
+
+    for name, sub_command in getattr(command, "commands", {}).items():
+        envvars.update(_option_envvars(sub_command, (*path, name)))
+    return envvars
+
+
+def _click_exception() -> type[Exception]:
+    """The base class of click's usage errors. typer may ship its own copy of click, so it is looked up through typer"""
+    import typer
+
+    return next(cls for cls in typer.BadParameter.__mro__ if cls.__name__ == "ClickException")
+
+
+def _find_repo_root(directory: pathlib.Path) -> pathlib.Path:
+    for candidate in (directory, *directory.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return directory
+
+
+class BumpyDaemon:
+    def __init__(self, socket_path: str | pathlib.Path | None = None, max_workers=8):
+        from typer.main import get_command
+
+        from bumpyproject.cli_bumpy import app
+
+        self.socket_path = pathlib.Path(socket_path or env.DAEMON_SOCKET)
+        self._command = get_command(app)
+        self._option_envvars = _option_envvars(self._command)
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._repo_locks: dict[pathlib.Path, threading.Lock] = {}
+        self._repo_locks_lock = threading.Lock()
+        self._server = None
+
+    def _repo_dir(self, request: dict) -> pathlib.Path:
+        """The directory the command works in, from its parsed --git-root-dir/--pyproject-toml options."""
+        from bumpyproject.helpers import working_dir
+
+        # Relative paths are resolved against the client's directory. Only set in the copied context of the caller
+        working_dir.set(request["cwd"])
+        ctx = self._command.context_class(
+            self._command,
+            info_name="bumpy",
+            resilient_parsing=True,
+            default_map=self._default_map(request.get("env", {})),
+        )
+        params = {}
+        try:
+            self._command.parse_args(ctx, list(request.get("argv", [])))
+            # click >= 8.2 deprecates protected_args, the sub command's name is kept in _protected_args instead
+            protected = ctx._protected_args if hasattr(ctx, "_protected_args") else ctx.protected_args
+            args = [*protected, *ctx.args]
+            if args:
+                name, command, args = self._command.resolve_command(ctx, args)
+                if command is not None:
+                    params = command.make_context(name, args, parent=ctx, resilient_parsing=True).params
+        except _click_exception():
+            # Usage errors are reported when the command runs
+            pass
+
+        directory = params.get("git_root_dir") or params.get("root_dir")
+        if directory is None and params.get("pyproject_toml") is not None:
+            directory = pathlib.Path(params["pyproject_toml"]).parent
+        return pathlib.Path(request["cwd"], directory or ".")
+
+    def _repo_lock(self, request: dict) -> threading.Lock:
+        directory = contextvars.copy_context().run(self._repo_dir, request)
+        key = _find_repo_root(directory.resolve())
+        with self._repo_locks_lock:
+            return self._repo_locks.setdefault(key, threading.Lock())
+
+    def _default_map(self, client_env: dict[str, str]) -> dict:
+        default_map = {}
+        for name, (path, param) in self._option_envvars.items():
+            if name not in client_env:
+                continue
+            target = default_map
+            for command in path:
+                target = target.setdefault(command, {})
+            target[param] = client_env[name]
+        return default_map
+
+    def handle(self, request: dict) -> dict:
+        """Run a single command and return its exit code, output and GitHub Actions outputs."""
+        from bumpyproject.log_utils import logger
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        github_outputs = []
+        try:
+            exit_code = self._run(request, stdout, stderr, github_outputs)
+        except Exception:
+            # A bug rather than a failed command: it is logged by the daemon and the client gets the traceback
+            logger.exception(f"bumpy {' '.join(request['argv'])} failed")
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+
+        return {
+            "exit_code": exit_code,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "github_outputs": github_outputs,
+        }
+
+    def _run(self, request: dict, stdout, stderr, github_outputs: list) -> int:
+        import typer
+
+        from bumpyproject.github_helper import output_writer
+        from bumpyproject.helpers import working_dir
+
+        click_exception = _click_exception()
+
+        with self._slots, self._repo_lock(request):
+            tokens = [
+                (_stdout, _stdout.set(stdout)),
+                (_stderr, _stderr.set(stderr)),
+                (working_dir, working_dir.set(request["cwd"])),
+                (output_writer, output_writer.set(lambda name, value: github_outputs.append((name, str(value))))),
+            ]
+            try:
+                exit_code = self._command.main(
+                    args=request["argv"],
+                    prog_name="bumpy",
+                    standalone_mode=False,
+                    default_map=self._default_map(request.get("env", {})),
+                )
+                return exit_code if isinstance(exit_code, int) else 0
+            except typer.Exit as e:
+                return e.exit_code
+            except typer.Abort:
+                stderr.write("Aborted!\n")
+                return 1
+            except click_exception as e:
+                e.show(file=stderr)
+                return e.exit_code
+            finally:
+                for var, token in reversed(tokens):
+                    var.reset(token)
+
+    def serve_forever(self):
+        from bumpyproject.git_helper import share_git_helpers
+        from bumpyproject.log_utils import logger
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                # A connection without a request, e.g. from `is_daemon_running`
+                if not line:
+                    return
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logger.exception("Received a request that is not JSON")
+                    response = {"exit_code": 1, "stdout": "", "stderr": traceback.format_exc(), "github_outputs": []}
+                else:
+                    response = daemon.handle(request)
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        if is_daemon_running(self.socket_path):
+            raise DaemonError(f"A daemon is already listening on {self.socket_path}")
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # A socket file left behind by a daemon that was killed
+        self.socket_path.unlink(missing_ok=True)
+
+        # Options are filled from each client's environment, so the daemon's own values must not take precedence
+        env.read_all()
+        daemon_environ = {name: os.environ.pop(name) for name in self._option_envvars if name in os.environ}
+        streams = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = _RoutedStream(sys.stdout, _stdout), _RoutedStream(sys.stderr, _stderr)
+        share_git_helpers()
+
+        self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            sys.stdout, sys.stderr = streams
+            os.environ.update(daemon_environ)
+            share_git_helpers(enabled=False)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def is_daemon_running(socket_path: str | pathlib.Path | None = None) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path or env.DAEMON_SOCKET))
+        return True
+    except OSError:
+        return False
+
+
+def send_command(
+    argv: list[str], socket_path: str | pathlib.Path | None = None, cwd: str | None = None, environ=None
+) -> dict | None:
+    """Run the command in the daemon. Returns None if no daemon is listening."""
+    environ = os.environ if environ is None else environ
+    client_env = {name: value for name, value in environ.items() if name in OPTION_ENVVARS}
+    request = {"argv": argv, "cwd": cwd or os.getcwd(), "env": client_env}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path or env.DAEMON_SOCKET))
+        except OSError:
+            return None
+
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        raise DaemonError("The daemon closed the connection without a response")
+    return json.loads(line)
+
+
+def run_client(argv: list[str], socket_path: str | pathlib.Path | None = None) -> int | None:
+    """Forward the command to the daemon and replay its output. Returns the exit code, or None if no daemon is
+    listening and the command has to run in this process."""
+    response = send_command(argv, socket_path)
+    if response is None:
+        return None
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if response["github_outputs"]:
+        from bumpyproject.github_helper import set_github_actions_variable
+
+        for name, value in response["github_outputs"]:
+            set_github_actions_variable(name, value)
+    return response["exit_code"]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import subprocess
+import threading
+
+from bumpyproject import env_vars as env
+
+IGNORED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        ".tox",
+        ".nox",
+        ".eggs",
+        "node_modules",
+        "build",
+        "dist",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+    }
+)
+
+_index_cache: dict[tuple[str, str], tuple[tuple[int, int], list[pathlib.Path]]] = {}
+_index_cache_lock = threading.Lock()
+
+
+def get_ignored_dirs() -> frozenset[str]:
+    return IGNORED_DIRS | frozenset(x for x in env.IGNORED_DIRS if x)
+
+
+def is_ignored_dir(dir_name: str, ignored_dirs: frozenset[str]) -> bool:
+    return dir_name in ignored_dirs or dir_name.endswith(".egg-info")
+
+
+def walk_for_files(root_dir: str | pathlib.Path, file_name: str) -> list[pathlib.Path]:
+    """Walk the file tree below root_dir without descending into any of the ignored directories."""
+    ignored_dirs = get_ignored_dirs()
+    files = []
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        # Pruning in place stops os.walk from ever listing the ignored directories
+        dir_names[:] = [d for d in dir_names if not is_ignored_dir(d, ignored_dirs)]
+        if file_name in file_names:
+            files.append(pathlib.Path(dir_path) / file_name)
+
+    return sorted(files)
+
+
+def iter_files(root_dir: str | pathlib.Path):
+    """Yield the paths of all files below root_dir relative to it (as posix strings), skipping the ignored dirs."""
+    ignored_dirs = get_ignored_dirs()
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names[:] = [d for d in dir_names if not is_ignored_dir(d, ignored_dirs)]
+        rel_dir = pathlib.Path(dir_path).relative_to(root_dir).as_posix()
+        prefix = "" if rel_dir == "." else f"{rel_dir}/"
+        for file_name in file_names:
+            yield prefix + file_name
+
+
+def find_git_index(root_dir: str | pathlib.Path) -> pathlib.Path | None:
+    if os.environ.get("GIT_INDEX_FILE"):
+        return pathlib.Path(os.environ["GIT_INDEX_FILE"])
+
+    for parent in [pathlib.Path(root_dir).resolve(), *pathlib.Path(root_dir).resolve().parents]:
+        dot_git = parent / ".git"
+        if dot_git.is_dir():
+            return dot_git / "index"
+        if dot_git.is_file():
+            # Worktrees and submodules use a .git file pointing at the real git dir
+            git_dir = dot_git.read_text().strip().removeprefix("gitdir:").strip()
+            return (parent / git_dir).resolve() / "index"
+
+    return None
+
+
+def git_index_files(root_dir: str | pathlib.Path, file_name: str) -> list[pathlib.Path] | None:
+    """List the files named file_name tracked in the git index below root_dir.
+
+    The result is cached until the index file changes. Returns None if root_dir is not inside a git work tree."""
+    root_dir = pathlib.Path(root_dir).resolve()
+    index_path = find_git_index(root_dir)
+    if index_path is None:
+        return None
+
+    try:
+        stat = index_path.stat()
+    except FileNotFoundError:
+        return None
+
+    key = (str(root_dir), file_name)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _index_cache_lock:
+        cached = _index_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return list(cached[1])
+
+    result = subprocess.run(
+        ["git", "ls-files", "-z", "--cached", "--", f":(glob)**/{file_name}"],
+        cwd=root_dir,
+        capture_output=True,
+        check=True,
+    )
+    ignored_dirs = get_ignored_dirs()
+    files = []
+    for rel_path in result.stdout.decode().split("\0"):
+        if not rel_path:
+            continue
+        parts = rel_path.split("/")
+        if any(is_ignored_dir(part, ignored_dirs) for part in parts[:-1]):
+            continue
+        path = root_dir / rel_path
+        if path.is_file():
+            files.append(path)
+
+    files = sorted(files)
+    with _index_cache_lock:
+        _index_cache[key] = (stamp, files)
+
+    return list(files)
+
+
+def find_files(root_dir: str | pathlib.Path, file_name: str, use_git_index: bool | None = None) -> list[pathlib.Path]:
+    """Find all files named file_name below root_dir, skipping ignored directories.
+
+    With use_git_index (or BUMPY_FILE_DISCOVERY=git) the candidates are read from the git index instead of the
+    file system. Outside a git work tree it falls back to walking the file system."""
+    if use_git_index is None:
+        use_git_index = env.FILE_DISCOVERY == "git"
+
+    if use_git_index:
+        files = git_index_files(root_dir, file_name)
+        if files is not None:
+            return files
+
+    return walk_for_files(root_dir, file_name)
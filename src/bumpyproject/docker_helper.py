@@ -2,15 +2,14 @@ from __future__ import annotations
 
 import pathlib
 import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-import docker
-from azure.containerregistry import ContainerRegistryClient
-from azure.identity import ClientSecretCredential
-
-from bumpyproject import bumper
+from bumpyproject import bumper, tracing, versions
 from bumpyproject import env_vars as env
-from bumpyproject.versions import get_latest_version_from_list_of_versions_by_numeric_sorting
 
 if TYPE_CHECKING:
     from bumpyproject.project import Project
@@ -20,18 +19,19 @@ colors = {"black": 30, "red": 31, "green": 32, "yellow": 33, "blue": 34, "magent
 
 class DockerACRHelper:
     def __init__(
-            self,
-            acr_name,
-            acr_repo_name,
-            tenant_id=env.AZ_TENANT_ID,
-            client_id=env.ACR_CLIENT_ID,
-            client_secret=env.ACR_CLIENT_SECRET,
+        self,
+        acr_name,
+        acr_repo_name,
+        tenant_id=env.AZ_TENANT_ID,
+        client_id=env.ACR_CLIENT_ID,
+        client_secret=env.ACR_CLIENT_SECRET,
     ):
         self._acr_name = acr_name
         self._acr_repo_name = acr_repo_name
         self._tenant_id = tenant_id
         self._client_id = client_id
         self._client_secret = client_secret
+        self._acr_client = None
 
         if acr_name is None:
             raise ValueError("ACR_NAME environment variable is not set")
@@ -63,29 +63,50 @@ class DockerACRHelper:
         if should_push:
             self.push(repo=tagged_name, use_native_client=use_native_client)
 
-    def get_latest_tagged_image(self):
-        # Get the service principal credentials
-        credential = ClientSecretCredential(
-            tenant_id=self._tenant_id, client_id=self._client_id, client_secret=self._client_secret
-        )
+    @property
+    def acr_client(self):
+        if self._acr_client is None:
+            from bumpyproject.acr_client import get_acr_client
 
-        # Create a ContainerRegistryClient object
-        acr_client = ContainerRegistryClient(
-            endpoint=f"https://{self.acr_name}.azurecr.io",
-            credential=credential,
-            audience="https://management.azure.com",
-        )
+            self._acr_client = get_acr_client(
+                self.acr_name, self._tenant_id, self._client_id, self._client_secret, timeout=env.ACR_TIMEOUT
+            )
+        return self._acr_client
+
+    def iter_tag_names(self) -> Iterator[str]:
+        """Stream the tag names of the repository page by page, most recently updated first."""
+        from azure.containerregistry import ArtifactTagOrder
+
+        pages = self.acr_client.list_tag_properties(
+            repository=self.acr_repo_name,
+            order_by=ArtifactTagOrder.LAST_UPDATED_ON_DESCENDING,
+            results_per_page=env.ACR_TAG_PAGE_SIZE,
+        ).by_page()
+        for page in pages:
+            for tag in page:
+                yield tag.name
+
+    @tracing.traced("docker.latest_tag")
+    def get_latest_tagged_image(self, scan_limit=None):
+        if scan_limit is None:
+            scan_limit = env.ACR_TAG_SCAN_LIMIT
+
+        tag_names = self.iter_tag_names()
+        if scan_limit > 0:
+            tag_names = _limit_tag_scan(tag_names, scan_limit)
 
-        # Get the list of tags for repository
-        versions = [tag.name for tag in acr_client.list_tag_properties(repository=self.acr_repo_name)]
-        latest_version = get_latest_version_from_list_of_versions_by_numeric_sorting(versions)
+        # Tags that are not versions (e.g. "latest") are skipped
+        latest_version = versions.latest_version(tag_names, skip_invalid=True)
 
         print(f"The latest tagged image of {self.acr_repo_name} is: {latest_version}")
 
         return latest_version
 
     @staticmethod
+    @tracing.traced("docker.build")
     def build(context_dir: pathlib.Path, dockerfile: pathlib.Path, tag):
+        import docker
+
         print(f'Building docker image with tag "{tag}"...')
 
         # find relative path from context dir to dockerfile
@@ -101,13 +122,47 @@ class DockerACRHelper:
         )
         print("Docker image build complete.")
 
-    def push(self, repo, use_native_client=False):
+    @property
+    def registry_url(self):
+        return f"https://{self.acr_name}.azurecr.io"
+
+    @tracing.traced("docker.retag")
+    def retag_if_pushed(self, repo) -> bool:
+        """Tag the image in the registry with a manifest PUT if an identical image was pushed before.
+
+        Returns False if the image has to be pushed."""
+        import docker
+        import requests
+        from docker.errors import DockerException
+
+        from bumpyproject.oci_registry import OCIRegistry, RegistryError, retag_existing_image
+
+        name, tag = repo.rsplit(":", 1)
+        registry = OCIRegistry(self.registry_url, self._client_id, self._client_secret, timeout=env.ACR_TIMEOUT)
+        try:
+            image = docker.APIClient().inspect_image(repo)
+            # The other tags of the image in this repository, e.g. latest or the version it was first pushed as
+            expected_tags = [t.rsplit(":", 1)[1] for t in image.get("RepoTags") or [] if t.rsplit(":", 1)[0] == name]
+            expected_tags = [t for t in dict.fromkeys([*expected_tags, "latest"]) if t != tag]
+            return retag_existing_image(
+                registry, self.acr_repo_name, tag, image["Id"], image.get("RepoDigests") or [], expected_tags
+            )
+        except (RegistryError, requests.RequestException, DockerException) as e:
+            print(f"Could not check the registry for an existing image, pushing instead: {e}")
+            return False
+
+    @tracing.traced("docker.push")
+    def push(self, repo, use_native_client=False, skip_existing=True):
         print(f'Pushing docker image with tag "{repo}" {use_native_client=}...')
         if self._client_id is None:
             raise ValueError("AZ_ACR_SERVICE_PRINCIPAL_USERNAME environment variable is not set")
         if self._client_secret is None:
             raise ValueError("AZ_ACR_SERVICE_PRINCIPAL_PASSWORD environment variable is not set")
 
+        if skip_existing and self.retag_if_pushed(repo):
+            print("Docker image already exists in the registry. Skipped the push.")
+            return
+
         if use_native_client:
             subprocess.run(
                 [
@@ -118,6 +173,8 @@ class DockerACRHelper:
             )
             return
 
+        import docker
+
         print_logs(
             docker.APIClient().push(
                 repository=repo,
@@ -129,6 +186,22 @@ class DockerACRHelper:
         print("Docker image push complete.")
 
 
+def _limit_tag_scan(tag_names: Iterator[str], limit: int) -> Iterator[str]:
+    """The first `limit` tags, and as many more as it takes to see a version tag (e.g. past commit SHA tags)."""
+    seen_version = False
+    for count, name in enumerate(tag_names, start=1):
+        if not seen_version:
+            try:
+                versions.parse_version(name)
+                seen_version = True
+            except ValueError:
+                pass
+        yield name
+        # Stop before the next page is requested
+        if count >= limit and seen_version:
+            return
+
+
 def colorize_text(color, text):
     cm = colors.get(color)
     return f"\033[{cm}m" + text + "\033[0m"
@@ -138,28 +211,149 @@ class NoAuthenticationError(Exception):
     pass
 
 
-def print_logs(build_logs, color="green"):
-    while True:
-        try:
-            json_output = build_logs.__next__()
-            status = json_output.get("status", None)
-            stream = json_output.get("stream", None)
-            if stream is not None:
-                if "unauthorized: authentication required" in stream:
-                    raise NoAuthenticationError("unauthorized: authentication required")
-                print(colorize_text(color, stream.strip()))
-            elif status is not None:
-                id_str = json_output.get("id", "")
-                prog_str = json_output.get("progress", "").strip()
-                prog_detail = json_output.get("progressDetail", "")
-                if isinstance(prog_detail, dict) and len(prog_detail.keys()) == 0:
-                    prog_detail = ""
-
-                state_message = f"{id_str}: {status} {prog_str} {prog_detail}"
-                print(colorize_text(color, state_message))
-            elif len(json_output.keys()) > 0:
-                print(json_output)
-        except StopIteration:
+def format_bytes(num_bytes: float) -> str:
+    if abs(num_bytes) < 1000:
+        return f"{num_bytes:.0f}B"
+    for unit in ("kB", "MB", "GB"):
+        num_bytes /= 1000
+        if round(abs(num_bytes), 1) < 1000:
             break
-        except ValueError:
+    return f"{num_bytes:.1f}{unit}"
+
+
+@dataclass
+class LayerProgress:
+    layer_id: str
+    status: str
+    current: int = 0
+    total: int = 0
+    started_at: float | None = None
+    start_bytes: int = 0
+    updated_at: float | None = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.started_at is None or self.updated_at is None or self.updated_at <= self.started_at:
+            return 0.0
+        return (self.current - self.start_bytes) / (self.updated_at - self.started_at)
+
+    def describe(self) -> str:
+        text = f"{self.layer_id}: {self.status}"
+        if self.total > 0:
+            text += f" {format_bytes(self.current)}/{format_bytes(self.total)}"
+        if self.bytes_per_second > 0:
+            text += f" ({format_bytes(self.bytes_per_second)}/s)"
+        return text
+
+
+class ProgressRenderer:
+    """Renders the JSON event stream of docker build/push.
+
+    Instead of printing every progress event, the state of each layer is kept in a table. On a terminal the table is
+    redrawn at most `frame_rate` times per second, otherwise only status changes of a layer (e.g. Waiting ->
+    Pushing -> Pushed) are printed, followed by a per layer summary with the average transfer rate."""
+
+    def __init__(self, stream=None, color="green", is_tty=None, frame_rate=10.0, clock=time.monotonic):
+        self._stream = stream if stream is not None else sys.stdout
+        self._color = color
+        self._is_tty = is_tty if is_tty is not None else self._stream.isatty()
+        self._frame_interval = 1.0 / frame_rate
+        self._clock = clock
+        self._last_draw = None
+        self._drawn_lines = 0
+        self._dirty = False
+        self.layers: dict[str, LayerProgress] = {}
+
+    def _write(self, text: str):
+        self._stream.write(colorize_text(self._color, text) + "\n")
+
+    def _clear_table(self):
+        if self._drawn_lines > 0:
+            # Move the cursor to the start of the table and clear everything below it
+            self._stream.write(f"\033[{self._drawn_lines}F\033[J")
+            self._drawn_lines = 0
+
+    def _draw(self, now: float):
+        self._clear_table()
+        for layer in self.layers.values():
+            self._write(layer.describe())
+        self._drawn_lines = len(self.layers)
+        self._last_draw = now
+        self._dirty = False
+        self._stream.flush()
+
+    def print_line(self, text: str):
+        if self._is_tty:
+            self._clear_table()
+            self._write(text)
+            self._dirty = True
+        else:
+            self._write(text)
+
+    def handle(self, event: dict):
+        stream = event.get("stream")
+        error = event.get("error")
+        status = event.get("status")
+        for message in (stream, error):
+            if message is not None and "unauthorized: authentication required" in message:
+                raise NoAuthenticationError("unauthorized: authentication required")
+
+        if stream is not None:
+            self.print_line(stream.strip())
+        elif error is not None:
+            self.print_line(f"Error: {error.strip()}")
+        elif status is not None and event.get("id") and event.get("progressDetail") is not None:
+            self._update_layer(event["id"], status, event.get("progressDetail") or {})
+        elif status is not None:
+            layer_id = event.get("id")
+            self.print_line(f"{layer_id}: {status}" if layer_id else status)
+        elif len(event.keys()) > 0:
+            self.print_line(str(event))
+
+        if self._is_tty and self._dirty:
+            now = self._clock()
+            if self._last_draw is None or now - self._last_draw >= self._frame_interval:
+                self._draw(now)
+
+    def _update_layer(self, layer_id: str, status: str, detail: dict):
+        now = self._clock()
+        layer = self.layers.get(layer_id)
+        is_new_status = layer is None or layer.status != status
+        if layer is None:
+            layer = LayerProgress(layer_id, status)
+            self.layers[layer_id] = layer
+
+        layer.status = status
+        if "current" in detail:
+            if layer.started_at is None or is_new_status:
+                layer.started_at, layer.start_bytes = now, detail["current"]
+            layer.current = detail["current"]
+            layer.total = detail.get("total", layer.total)
+            layer.updated_at = now
+
+        if self._is_tty:
+            self._dirty = True
+        elif is_new_status:
+            self._write(f"{layer_id}: {status}")
+
+    def close(self):
+        if self._is_tty:
+            self._draw(self._clock())
+            return
+
+        for layer in self.layers.values():
+            if layer.total > 0:
+                self._write(layer.describe())
+
+
+def print_logs(build_logs, color="green", renderer: ProgressRenderer = None):
+    if renderer is None:
+        renderer = ProgressRenderer(color=color)
+
+    for json_output in build_logs:
+        try:
+            renderer.handle(json_output)
+        except (ValueError, AttributeError):
             print("Error parsing output from docker image build: %s" % json_output)
+
+    renderer.close()
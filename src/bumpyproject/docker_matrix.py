@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import pathlib
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+import tomlkit
+
+from bumpyproject.helpers import map_in_context
+from bumpyproject.log_utils import logger
+
+# The docker-container builder created for builds that export layer caches, the docker driver cannot export them
+CACHE_BUILDER_NAME = "bumpy"
+
+
+class BuildMatrixError(Exception):
+    pass
+
+
+@dataclass
+class ImageSpec:
+    name: str
+    dockerfile: pathlib.Path
+    context: pathlib.Path
+    depends_on: tuple[str, ...] = ()
+    build_args: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class ImageBuildResult:
+    name: str
+    status: str = "pending"
+    duration: float = 0.0
+    output: str = ""
+
+
+def load_build_matrix(pyproject_toml: str | pathlib.Path) -> list[ImageSpec]:
+    """Read the images listed as [[tool.bumpy.images]] in pyproject.toml.
+
+    Each image has a `name` (the registry repository), a `dockerfile`, a `context` (relative to pyproject.toml,
+    defaults to its directory) and optionally `depends_on` (names of images it is built FROM) and `build_args`."""
+    pyproject_toml = pathlib.Path(pyproject_toml)
+    with open(pyproject_toml, mode="r") as fp:
+        toml_data = tomlkit.load(fp)
+
+    images = toml_data.get("tool", {}).get("bumpy", {}).get("images", [])
+    if len(images) == 0:
+        raise BuildMatrixError(f"No [[tool.bumpy.images]] found in {pyproject_toml}")
+
+    root_dir = pyproject_toml.parent.resolve()
+    specs = []
+    for image in images:
+        context = (root_dir / image.get("context", ".")).resolve()
+        specs.append(
+            ImageSpec(
+                name=str(image["name"]),
+                dockerfile=(root_dir / image["dockerfile"]).resolve(),
+                context=context,
+                depends_on=tuple(str(x) for x in image.get("depends_on", [])),
+                build_args={str(k): str(v) for k, v in image.get("build_args", {}).items()},
+            )
+        )
+
+    return specs
+
+
+def plan_build_waves(specs: list[ImageSpec]) -> list[list[ImageSpec]]:
+    """Group the images into waves. The images within a wave do not depend on each other and can be built
+    concurrently, and every wave only depends on the waves before it."""
+    by_name = {spec.name: spec for spec in specs}
+    for spec in specs:
+        unknown = [d for d in spec.depends_on if d not in by_name]
+        if len(unknown) > 0:
+            raise BuildMatrixError(f"Image {spec.name} depends on unknown images {unknown}")
+
+    waves = []
+    built = set()
+    remaining = list(specs)
+    while len(remaining) > 0:
+        wave = [spec for spec in remaining if all(d in built for d in spec.depends_on)]
+        if len(wave) == 0:
+            raise BuildMatrixError(f"Circular dependencies between images {[s.name for s in remaining]}")
+        waves.append(wave)
+        built.update(spec.name for spec in wave)
+        remaining = [spec for spec in remaining if spec.name not in built]
+
+    return waves
+
+
+def image_tags(registry: str, spec: ImageSpec, version: str) -> list[str]:
+    return [f"{registry}/{spec.name}:{version}", f"{registry}/{spec.name}:latest"]
+
+
+def buildx_command(
+    spec: ImageSpec,
+    registry: str,
+    version: str,
+    cache_dir: str | pathlib.Path | None = None,
+    cache_ref: str | None = None,
+    push=False,
+    builder: str | None = None,
+    cache_export=True,
+) -> list[str]:
+    """The `docker buildx build` command for an image.
+
+    Layer caches are imported from and exported to `cache_dir/<name>` (a local directory) or `cache_ref/<name>:cache`
+    (a registry reference) so that builds on other machines can reuse them. Without cache_export, which the docker
+    driver does not support, only the registry cache is imported."""
+    cmd = ["docker", "buildx", "build", "--file", str(spec.dockerfile)]
+    if builder is not None:
+        cmd += ["--builder", builder]
+    for tag in image_tags(registry, spec, version):
+        cmd += ["--tag", tag]
+    for key, value in spec.build_args.items():
+        cmd += ["--build-arg", f"{key}={value}"]
+
+    if cache_dir is not None and cache_export:
+        image_cache_dir = pathlib.Path(cache_dir) / spec.name
+        if (image_cache_dir / "index.json").exists():
+            cmd += ["--cache-from", f"type=local,src={image_cache_dir}"]
+        cmd += ["--cache-to", f"type=local,dest={image_cache_dir},mode=max"]
+
+    if cache_ref is not None:
+        ref = f"{cache_ref}/{spec.name}:cache"
+        cmd += ["--cache-from", f"type=registry,ref={ref}"]
+        if cache_export:
+            cmd += ["--cache-to", f"type=registry,ref={ref},mode=max"]
+
+    cmd.append("--push" if push else "--load")
+    cmd.append(str(spec.context))
+
+    return cmd
+
+
+def builder_driver(name: str | None = None, runner=subprocess.run) -> str | None:
+    """The driver of the named buildx builder (the active one if name is None), None if there is no such builder."""
+    cmd = ["docker", "buildx", "inspect"] + ([] if name is None else [name])
+    proc = runner(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    if proc.returncode != 0:
+        return None
+
+    for line in (proc.stdout or "").splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "Driver":
+            return value.strip()
+    return None
+
+
+def select_builder(push: bool, caching: bool, runner=subprocess.run) -> tuple[str | None, bool]:
+    """The builder to build the matrix with and whether it can export layer caches.
+
+    The docker driver of the default builder cannot export caches, but it is the only one whose `--load`ed images
+    are visible to the FROM lines of later waves. Pushed builds resolve their base images from the registry, so they
+    use a docker-container builder, which is created if needed. Local builds stay on the active builder and only
+    export caches if its driver supports it."""
+    if not caching:
+        return None, False
+
+    if not push:
+        if builder_driver(runner=runner) == "docker":
+            logger.warning("The active buildx builder uses the docker driver, layer caches are not exported")
+            return None, False
+        return None, True
+
+    driver = builder_driver(CACHE_BUILDER_NAME, runner=runner)
+    if driver is None:
+        cmd = ["docker", "buildx", "create", "--name", CACHE_BUILDER_NAME, "--driver", "docker-container"]
+        runner(cmd, check=True, stdout=subprocess.DEVNULL)
+    elif driver == "docker":
+        raise BuildMatrixError(f"The buildx builder {CACHE_BUILDER_NAME!r} uses the docker driver")
+
+    return CACHE_BUILDER_NAME, True
+
+
+def build_matrix(
+    specs: list[ImageSpec],
+    registry: str,
+    version: str,
+    cache_dir: str | pathlib.Path | None = None,
+    cache_ref: str | None = None,
+    push=False,
+    max_workers: int | None = None,
+    runner=subprocess.run,
+) -> list[ImageBuildResult]:
+    """Build (and push) all images, building the independent images of each wave concurrently.
+
+    If an image fails, the images in later waves are skipped."""
+    results = {spec.name: ImageBuildResult(spec.name) for spec in specs}
+    waves = plan_build_waves(specs)
+    builder, cache_export = select_builder(push, cache_dir is not None or cache_ref is not None, runner)
+
+    def build_image(spec: ImageSpec) -> ImageBuildResult:
+        result = results[spec.name]
+        cmd = buildx_command(spec, registry, version, cache_dir, cache_ref, push, builder, cache_export)
+        logger.info(f"Building {spec.name}: {' '.join(cmd)}")
+        start = time.perf_counter()
+        proc = runner(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        result.duration = time.perf_counter() - start
+        result.output = proc.stdout or ""
+        result.status = "built" if proc.returncode == 0 else "failed"
+        logger.info(f"{spec.name} {result.status} in {result.duration:.1f}s")
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bumpy-docker") as executor:
+        for wave in waves:
+            wave_results = map_in_context(executor, build_image, wave)
+            failed = [r for r in wave_results if r.status == "failed"]
+            if len(failed) > 0:
+                for r in failed:
+                    logger.error(f"Build of {r.name} failed:\n{r.output}")
+                for r in results.values():
+                    if r.status == "pending":
+                        r.status = "skipped"
+                break
+
+    return [results[spec.name] for spec in specs]
+
+
+def check_image_versions(specs: list[ImageSpec], acr_name: str, version: str, tenant_id, client_id, client_secret):
+    """Check concurrently that version is newer than the latest tagged image of every image repository."""
+    from bumpyproject import bumper
+    from bumpyproject import env_vars as env
+    from bumpyproject.docker_helper import DockerACRHelper
+    from bumpyproject.helpers import run_concurrently
+
+    probes = {}
+    for spec in specs:
+        helper = DockerACRHelper(acr_name, spec.name, tenant_id, client_id, client_secret)
+        probes[spec.name] = (partial(_latest_published_version, helper), env.ACR_TIMEOUT)
+
+    for name, latest_version in run_concurrently(probes).items():
+        if latest_version is None:
+            logger.info(f"No version of {name} is published on ACR yet, OK for push to '{version}'")
+            continue
+        bumper.is_newer(latest_version, version)
+        logger.info(f"Latest version of {name} on ACR '{latest_version}' OK for push to '{version}'")
+
+
+def _latest_published_version(helper) -> str | None:
+    """The latest tagged version of the image, None for a repository that has no version tags yet."""
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        return helper.get_latest_tagged_image()
+    except ResourceNotFoundError:
+        # The repository is created by its first push
+        return None
+    except ValueError:
+        # Tags that are not versions are skipped, so this is a repository without version tags
+        return None
+
+
+def docker_login(registry: str, username: str, password: str, runner=subprocess.run):
+    cmd = ["docker", "login", registry, "--username", username, "--password-stdin"]
+    runner(cmd, input=password, text=True, check=True, stdout=subprocess.DEVNULL)
+
+
+def format_summary(results: list[ImageBuildResult]) -> str:
+    width = max(len(r.name) for r in results)
+    return "\n".join(f"{r.name.ljust(width)}  {r.status:<8} {r.duration:8.1f}s" for r in results)
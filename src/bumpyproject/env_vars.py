@@ -1,34 +1,112 @@
+"""Environment variables used by bumpyproject.
+
+The variables are read (and the .env file loaded) the first time any of them is accessed, so importing this module
+is free. Call `load_env()` to load the .env file up front, e.g. before command line options fall back to env vars.
+
+The values are a snapshot of the environment at that first access: later changes to `os.environ` are not seen until
+`read_all(refresh=True)` is called."""
+
 import os
 import pathlib
 
-from dotenv import load_dotenv, find_dotenv
+_is_loaded = False
+
+
+def load_env():
+    global _is_loaded
+    if _is_loaded:
+        return
+    _is_loaded = True
+
+    from dotenv import find_dotenv, load_dotenv
+
+    curr_env = ".env"
+    res = find_dotenv(curr_env)
+    if not res:
+        curr_env = pathlib.Path(os.getcwd()) / ".env"
+
+    load_dotenv(curr_env)
+
+
+def _read_variables() -> dict:
+    variables = {"RELEASE_TAG": os.environ.get("RELEASE_TAG", "alpha")}
+
+    # Core env variables
+    variables["ONLY_VALID_REPOS"] = os.getenv("VALID_REPOS", "").split(";")
+
+    # File discovery related env variables. BUMPY_FILE_DISCOVERY is either "walk" or "git"
+    variables["FILE_DISCOVERY"] = os.getenv("BUMPY_FILE_DISCOVERY", "walk")
+    variables["IGNORED_DIRS"] = os.getenv("BUMPY_IGNORED_DIRS", "").split(";")
+
+    # Parse every rewritten pyproject.toml/package.json to check the new version before it is written
+    variables["VALIDATE_REWRITE"] = os.getenv("BUMPY_VALIDATE_REWRITE", "0") != "0"
+
+    # Registry related env variables (timeouts are in seconds)
+    registry_timeout = float(os.getenv("REGISTRY_TIMEOUT", "30"))
+    variables["REGISTRY_TIMEOUT"] = registry_timeout
+    variables["PYPI_TIMEOUT"] = float(os.getenv("PYPI_TIMEOUT", registry_timeout))
+    variables["CONDA_TIMEOUT"] = float(os.getenv("CONDA_TIMEOUT", registry_timeout))
+    variables["ACR_TIMEOUT"] = float(os.getenv("ACR_TIMEOUT", registry_timeout))
+
+    # Local cache related env variables
+    xdg_cache_home = pathlib.Path(os.getenv("XDG_CACHE_HOME", pathlib.Path.home() / ".cache"))
+    variables["BUMPY_CACHE_DIR"] = pathlib.Path(os.getenv("BUMPY_CACHE_DIR", xdg_cache_home / "bumpyproject"))
+    variables["HTTP_CACHE_TTL"] = float(os.getenv("HTTP_CACHE_TTL", "0"))
+    variables["HTTP_CACHE_MAX_BYTES"] = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+    # Git related env variables
+    variables["GIT_USER_EMAIL"] = os.getenv("GIT_USER_EMAIL", "bumpybot@bumpyproject.com")
+    variables["GIT_USER"] = os.getenv("GIT_USER", "bumpybot")
+    variables["GIT_LOCAL_TEMP_DIR"] = pathlib.Path(os.getenv("GIT_LOCAL_TEMP_DIR", "temp"))
+    # "full" checks the whole work tree for uncommitted changes before a bump, "scoped" only the files it rewrites
+    variables["DIRTY_CHECK"] = os.getenv("BUMPY_DIRTY_CHECK", "full")
+    # Remote repositories are cloned through a cache of bare mirrors unless GIT_USE_MIRROR=0
+    variables["GIT_USE_MIRROR"] = os.getenv("GIT_USE_MIRROR", "1") != "0"
+    # Defaults to BUMPY_CACHE_DIR/mirrors
+    variables["GIT_MIRROR_DIR"] = os.getenv("GIT_MIRROR_DIR")
+
+    # The socket of the bumpy daemon. The CLI forwards its commands to a running daemon unless BUMPY_NO_DAEMON=1
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    default_socket = pathlib.Path(runtime_dir) if runtime_dir else variables["BUMPY_CACHE_DIR"]
+    variables["DAEMON_SOCKET"] = pathlib.Path(os.getenv("BUMPY_DAEMON_SOCKET", default_socket / "bumpyd.sock"))
+    variables["NO_DAEMON"] = os.getenv("BUMPY_NO_DAEMON", "0") != "0"
 
-curr_env = '.env'
-res = find_dotenv(curr_env)
-if not res:
-    curr_env = pathlib.Path(os.getcwd()) / '.env'
+    # These are only applicable for any AZURE Container Registry docker resources
+    variables["AZ_TENANT_ID"] = os.getenv("AZ_TENANT_ID")
+    variables["ACR_CLIENT_ID"] = os.getenv("AZ_ACR_SERVICE_PRINCIPAL_USERNAME")
+    variables["ACR_CLIENT_SECRET"] = os.getenv("AZ_ACR_SERVICE_PRINCIPAL_PASSWORD")
+    variables["ACR_NAME"] = os.getenv("AZ_ACR_NAME")
+    variables["ACR_REPO_NAME"] = os.getenv("AZ_ACR_REPO_NAME")
+    variables["ACR_TOKEN_CACHE"] = os.getenv("ACR_TOKEN_CACHE", "1") != "0"
+    variables["ACR_TAG_PAGE_SIZE"] = int(os.getenv("ACR_TAG_PAGE_SIZE", "100"))
+    # Only consider the N most recently updated tags (and more until a version tag is seen) when looking for the latest
+    # version. Opt-in: an old version that was pushed again recently could hide a newer one. 0 means all tags
+    variables["ACR_TAG_SCAN_LIMIT"] = int(os.getenv("ACR_TAG_SCAN_LIMIT", "0"))
 
-load_dotenv(curr_env)
+    return variables
 
 
-RELEASE_TAG = os.environ.get("RELEASE_TAG", "alpha")
+def read_all(refresh=False):
+    """Read every variable now instead of on first access, e.g. before the process environment is changed.
 
-# Core env variables
+    Values that were already read or set (e.g. overridden in tests) are kept unless `refresh` is true, in which case
+    every variable is read again from the current environment."""
+    load_env()
+    variables = _read_variables()
+    if refresh:
+        globals().update(variables)
+        return
 
+    for key, value in variables.items():
+        globals().setdefault(key, value)
 
-ONLY_VALID_REPOS = os.getenv("VALID_REPOS", "").split(";")
 
-# Git related env variables
-GIT_USER_EMAIL = os.getenv("GIT_USER_EMAIL", "bumpybot@bumpyproject.com")
-GIT_USER = os.getenv("GIT_USER", "bumpybot")
-GIT_LOCAL_TEMP_DIR = os.getenv("GIT_LOCAL_TEMP_DIR", "temp")
-if isinstance(GIT_LOCAL_TEMP_DIR, str):
-    GIT_LOCAL_TEMP_DIR = pathlib.Path(GIT_LOCAL_TEMP_DIR)
+def __getattr__(name: str):
+    if name.startswith("__"):
+        raise AttributeError(name)
 
+    read_all()
+    if name not in globals():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# These are only applicable for any AZURE Container Registry docker resources
-AZ_TENANT_ID = os.getenv("AZ_TENANT_ID")
-ACR_CLIENT_ID = os.getenv("AZ_ACR_SERVICE_PRINCIPAL_USERNAME")
-ACR_CLIENT_SECRET = os.getenv("AZ_ACR_SERVICE_PRINCIPAL_PASSWORD")
-ACR_NAME = os.getenv("AZ_ACR_NAME")
-ACR_REPO_NAME = os.getenv("AZ_ACR_REPO_NAME")
+    return globals()[name]
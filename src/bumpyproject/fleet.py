@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import pathlib
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import git
+import tomlkit
+
+from bumpyproject import tracing
+from bumpyproject.git_helper import GitHelper
+from bumpyproject.git_mirror import GitMirrorError
+from bumpyproject.helpers import map_in_context
+from bumpyproject.log_utils import logger
+from bumpyproject.substitutions import SubstitutionError, SubstitutionRule, substitute_file
+
+# Errors that may be resolved by trying again, e.g. a network hiccup or a push that lost a race
+RETRYABLE_ERRORS = (git.GitCommandError, GitMirrorError)
+
+
+class FleetManifestError(Exception):
+    pass
+
+
+class NoMatchError(Exception):
+    pass
+
+
+# The errors that fail a single target. Anything else is a bug and aborts the whole propagation
+TARGET_ERRORS = (NoMatchError, SubstitutionError, subprocess.CalledProcessError, OSError)
+
+
+@dataclass(frozen=True)
+class FleetTarget:
+    """A downstream repository and the (file, pattern) rules that pin the version in it."""
+
+    url: str
+    rules: tuple[SubstitutionRule, ...]
+    branch: str | None = None
+
+    @property
+    def files(self) -> list[str]:
+        return sorted({rule.glob for rule in self.rules})
+
+
+@dataclass
+class FleetResult:
+    url: str
+    status: str = "pending"
+    old_versions: list[str] = field(default_factory=list)
+    branch: str | None = None
+    attempts: int = 0
+    duration: float = 0.0
+    error: str | None = None
+
+
+def load_fleet_manifest(manifest: str | pathlib.Path) -> list[FleetTarget]:
+    """Read the [[repos]] of a fleet manifest.
+
+    Each entry has a `url`, a `file` (relative to the repository root), a `pattern` whose first group is the version
+    and optionally a `format` ("semver" or "pep440") and a `branch`. If a branch is given the change is pushed to that
+    new branch instead of the default branch. Entries with the same url and branch are edited in one commit."""
+    with open(manifest, mode="r") as fp:
+        toml_data = tomlkit.load(fp)
+
+    grouped: dict[tuple[str, str | None], list[SubstitutionRule]] = {}
+    for i, entry in enumerate(toml_data.get("repos", [])):
+        missing = [key for key in ("url", "file", "pattern") if key not in entry]
+        if len(missing) > 0:
+            raise FleetManifestError(f"Entry {i} of {manifest} is missing {missing}")
+
+        branch = str(entry["branch"]) if "branch" in entry else None
+        rule = SubstitutionRule(str(entry["file"]), str(entry["pattern"]), str(entry.get("format", "semver")))
+        grouped.setdefault((str(entry["url"]), branch), []).append(rule)
+
+    if len(grouped) == 0:
+        raise FleetManifestError(f"No [[repos]] found in {manifest}")
+
+    return [FleetTarget(url, tuple(rules), branch) for (url, branch), rules in grouped.items()]
+
+
+def propagate_version(
+    targets: list[FleetTarget],
+    new_version: str,
+    max_workers: int = 8,
+    retries: int = 2,
+    retry_delay: float = 2.0,
+    push: bool = True,
+    work_dir: str | pathlib.Path | None = None,
+) -> list[FleetResult]:
+    """Write new_version to every target repository concurrently. Each worker clones the repository (sparse, through
+    the mirror cache), patches the files, commits and pushes.
+
+    A failed attempt is retried on a fresh clone after retry_delay seconds, doubled for each further attempt."""
+
+    def run(target: FleetTarget) -> FleetResult:
+        return _propagate_to_target(target, new_version, retries, retry_delay, push, work_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return map_in_context(executor, run, targets)
+
+
+def _propagate_to_target(target, new_version, retries, retry_delay, push, work_dir) -> FleetResult:
+    result = FleetResult(target.url, branch=target.branch)
+    start = time.perf_counter()
+    while True:
+        result.attempts += 1
+        try:
+            with tracing.span("fleet.target", url=target.url), tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+                result.old_versions, result.status = _patch_and_push(target, new_version, temp_dir, push)
+            result.error = None
+            break
+        except RETRYABLE_ERRORS as e:
+            result.status = "failed"
+            result.error = f"{type(e).__name__}: {e}"
+            if result.attempts > retries:
+                break
+            delay = retry_delay * 2 ** (result.attempts - 1)
+            logger.warning(f"Attempt {result.attempts} for {target.url} failed, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+        except TARGET_ERRORS as e:
+            result.status = "failed"
+            result.error = f"{type(e).__name__}: {e}"
+            break
+
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def _patch_and_push(target: FleetTarget, new_version: str, clone_dir: str, push: bool) -> tuple[list[str], str]:
+    git_helper = GitHelper.from_git_url(target.url, clone_dir, sparse_paths=target.files)
+
+    old_versions = []
+    changed = False
+    for rule in target.rules:
+        path = git_helper.repo_root_dir / rule.glob
+        if not path.exists():
+            raise FileNotFoundError(f"{rule.glob} does not exist")
+
+        substitution = substitute_file(path, (rule,), new_version)
+        if substitution.error is not None:
+            raise NoMatchError(f"{rule.glob}: {substitution.error}")
+        if len(substitution.matches) == 0:
+            raise NoMatchError(f"{rule.pattern!r} does not match anything in {rule.glob}")
+        old_versions += [m.old for m in substitution.matches if m.old not in old_versions]
+        changed |= substitution.changed
+
+    if not changed:
+        return old_versions, "unchanged"
+
+    curr_repo = git_helper.git_repo
+    if target.branch is not None:
+        git_helper.create_branch(target.branch, push=False)
+
+    commit_message = f"bumping version {', '.join(old_versions)} -> {new_version}"
+    git_helper.commit(commit_message, paths=[git_helper.repo_root_dir / f for f in target.files])
+
+    if not push:
+        return old_versions, "committed"
+
+    if target.branch is not None:
+        curr_repo.git.push("--set-upstream", "origin", target.branch)
+    else:
+        curr_repo.git.push("origin", "HEAD")
+    return old_versions, "pushed"
+
+
+def format_summary(results: list[FleetResult]) -> str:
+    header = ("repository", "old", "branch", "status", "attempts", "seconds")
+    rows = [header]
+    for r in results:
+        row = (r.url, ", ".join(r.old_versions), r.branch or "", r.error or r.status, str(r.attempts))
+        rows.append((*row, f"{r.duration:.3f}"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+
+    return "\n".join(lines)
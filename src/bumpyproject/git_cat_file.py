@@ -0,0 +1,159 @@
+"""Long-lived `git cat-file` processes for reading many blobs without a subprocess per lookup.
+
+Objects are named like on the command line, e.g. `<sha>`, `HEAD:pyproject.toml` or `refs/tags/1.0.0:package.json`.
+A batch is resolved in two pipelined round trips: `--batch-check` for every name, then `--batch` for the blobs that
+are not in the LRU cache yet. Blobs are immutable, so the cache is keyed by the blob SHA and never goes stale.
+
+Both modes exist in every git version that is still in use (`--batch-command`, which would need only one process,
+requires git 2.36)."""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from bumpyproject.log_utils import logger
+
+
+class CatFileError(Exception):
+    pass
+
+
+class CatFileReader:
+    def __init__(self, repo_dir, cache_size=1024):
+        self._repo_dir = repo_dir
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        # One process per mode, "--batch-check" or "--batch", with the finalizer that stops it
+        self._processes: dict[str, tuple[subprocess.Popen, weakref.finalize]] = {}
+
+    def _start(self, mode: str) -> subprocess.Popen:
+        entry = self._processes.get(mode)
+        if entry is None or entry[0].poll() is not None:
+            process = subprocess.Popen(
+                ["git", "cat-file", mode],
+                cwd=self._repo_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            entry = (process, weakref.finalize(self, _stop, process))
+            self._processes[mode] = entry
+        return entry[0]
+
+    def close(self):
+        with self._lock:
+            self._stop_all()
+
+    def _stop_all(self):
+        for _, finalizer in self._processes.values():
+            finalizer()
+        self._processes.clear()
+
+    def _exchange(self, mode: str, names: list[str], read_response):
+        """Send the object names and read one response per name. The names are written from a separate thread, so
+        neither side blocks on a full pipe when a batch is large."""
+        process = self._start(mode)
+        request = "".join(f"{name}\n" for name in names).encode()
+
+        write_errors = []
+
+        def write():
+            try:
+                process.stdin.write(request)
+                process.stdin.flush()
+            except OSError as e:
+                write_errors.append(e)
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        try:
+            responses = [read_response(process.stdout) for _ in names]
+        except (OSError, ValueError) as e:
+            raise CatFileError(f"git cat-file failed in {self._repo_dir}: {e}") from e
+        finally:
+            writer.join()
+
+        if write_errors:
+            raise CatFileError(f"git cat-file failed in {self._repo_dir}: {write_errors[0]}")
+        return responses
+
+    def resolve(self, names: Iterable[str]) -> dict[str, tuple[str, str, int] | None]:
+        """(sha, type, size) of the named objects, None for objects that do not exist."""
+        names = list(dict.fromkeys(names))
+        if len(names) == 0:
+            return {}
+
+        with self._lock:
+            try:
+                infos = self._exchange("--batch-check", names, _read_info)
+            except CatFileError:
+                # The processes may have died in between, e.g. after a `git gc`, start fresh ones
+                logger.debug("Restarting git cat-file")
+                self._stop_all()
+                infos = self._exchange("--batch-check", names, _read_info)
+
+        return dict(zip(names, infos))
+
+    def read_blobs(self, names: Iterable[str]) -> dict[str, bytes | None]:
+        """The contents of the named blobs, None for names that do not exist or are not blobs."""
+        infos = self.resolve(names)
+        result = {}
+        # Uncached blob SHA -> the names that resolve to it
+        missing: dict[str, list[str]] = {}
+        with self._lock:
+            for name, info in infos.items():
+                if info is None or info[1] != "blob":
+                    result[name] = None
+                elif info[0] in self._cache:
+                    self._cache.move_to_end(info[0])
+                    result[name] = self._cache[info[0]]
+                else:
+                    missing.setdefault(info[0], []).append(name)
+
+            if missing:
+                for sha, content in zip(missing, self._exchange("--batch", list(missing), _read_blob)):
+                    self._cache[sha] = content
+                    if len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+                    result.update(dict.fromkeys(missing[sha], content))
+
+        return {name: result[name] for name in infos}
+
+    def read_blob(self, name: str) -> bytes | None:
+        return self.read_blobs([name])[name]
+
+
+def _stop(process: subprocess.Popen):
+    try:
+        process.stdin.close()
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
+    process.stdout.close()
+
+
+def _read_info(stdout) -> tuple[str, str, int] | None:
+    line = stdout.readline()
+    if not line:
+        raise CatFileError("git cat-file exited")
+    # The name is echoed for objects that do not exist, so it is not split: it may contain spaces
+    if line.endswith((b" missing\n", b" ambiguous\n")):
+        return None
+    sha, object_type, size = line.split()
+    return sha.decode(), object_type.decode(), int(size)
+
+
+def _read_blob(stdout) -> bytes:
+    info = _read_info(stdout)
+    if info is None:
+        raise CatFileError("An object disappeared while it was read")
+    content = stdout.read(info[2])
+    # The content is followed by a line break
+    stdout.read(1)
+    return content
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import os
 import pathlib
+import subprocess
+import threading
+from collections.abc import Iterator
+from io import BytesIO
 from typing import TYPE_CHECKING
 
 import git
+from gitdb import IStream
 
 from bumpyproject import env_vars as env
+from bumpyproject import tracing
 from bumpyproject.log_utils import logger
 
 if TYPE_CHECKING:
+    from bumpyproject.git_cat_file import CatFileReader
+    from bumpyproject.tag_index import TagIndex
     from bumpyproject.versions import BumpLevel
 
 
@@ -16,7 +25,28 @@ class DirtyRepoError(Exception):
     pass
 
 
+_shared_helpers: dict[pathlib.Path, GitHelper] | None = None
+_shared_helpers_lock = threading.Lock()
+
+
+def share_git_helpers(enabled=True):
+    """Make `GitHelper.for_dir` return one long-lived instance per repository, e.g. in the daemon."""
+    global _shared_helpers
+    _shared_helpers = {} if enabled else None
+
+
 class GitHelper:
+    @classmethod
+    def for_dir(cls, git_root_dir) -> GitHelper:
+        if _shared_helpers is None:
+            return cls(git_root_dir)
+
+        key = pathlib.Path(git_root_dir).resolve()
+        with _shared_helpers_lock:
+            if key not in _shared_helpers or not (key / ".git").exists():
+                _shared_helpers[key] = cls(key)
+            return _shared_helpers[key]
+
     def __init__(self, git_root_dir=None, project=None):
         if isinstance(git_root_dir, str):
             git_root_dir = pathlib.Path(git_root_dir)
@@ -26,6 +56,9 @@ class GitHelper:
         self._git_root_dir = git_root_dir
         self._git_repo = git.Repo(git_root_dir)
         self._project = project
+        self._cat_file = None
+        # (paths) -> (signature, dirty), see `is_dirty`
+        self._dirty_cache: dict[tuple[str, ...], tuple[tuple, bool]] = {}
 
         remotes = list(self._git_repo.remotes)
         if len(remotes) == 1:
@@ -48,8 +81,21 @@ class GitHelper:
             self._git_repo.git.config("user.email", env.GIT_USER_EMAIL)
 
     @staticmethod
-    def from_git_url(git_url, git_root_dir, project=None):
-        git.Repo.clone_from(git_url, git_root_dir)
+    @tracing.traced("git.clone")
+    def from_git_url(git_url, git_root_dir, project=None, sparse_paths=None, use_mirror=None):
+        """Clone git_url into git_root_dir.
+
+        By default the clone goes through the local mirror cache (see `git_mirror`) and is shallow and blob-less, and
+        only sparse_paths are checked out if they are given. With use_mirror=False the repository is cloned in full."""
+        if use_mirror is None:
+            use_mirror = env.GIT_USE_MIRROR
+
+        if use_mirror:
+            from bumpyproject.git_mirror import clone_from_mirror
+
+            clone_from_mirror(str(git_url), git_root_dir, sparse_paths=sparse_paths)
+        else:
+            git.Repo.clone_from(git_url, git_root_dir)
         return GitHelper(git_root_dir, project)
 
     @property
@@ -64,22 +110,193 @@ class GitHelper:
     def git_remote(self) -> git.Remote:
         return self._remote
 
-    def check_git_state(self):
-        curr_repo = self._git_repo
-        if curr_repo.is_dirty(self):
+    @property
+    def cat_file(self) -> CatFileReader:
+        """A long-lived `git cat-file` process with a cache of blob contents, see `git_cat_file`."""
+        if self._cat_file is None:
+            from bumpyproject.git_cat_file import CatFileReader
+
+            self._cat_file = CatFileReader(self.repo_root_dir)
+        return self._cat_file
+
+    def read_file_at(self, path, revs) -> dict[str, bytes | None]:
+        """The contents of the file at each of the revisions, None where it does not exist."""
+        rel_path = self._rel_path(path)
+        contents = self.cat_file.read_blobs(f"{rev}:{rel_path}" for rev in revs)
+        return {rev: contents[f"{rev}:{rel_path}"] for rev in revs}
+
+    @tracing.traced("git.check_state")
+    def check_git_state(self, paths=None):
+        """Raise DirtyRepoError if there are uncommitted changes, see `is_dirty`."""
+        if self.is_dirty(paths):
             raise DirtyRepoError("There are uncommitted changes!")
 
-    def get_latest_tag(self) -> str:
-        tags = list(self.git_repo.tags)
-        return tags[-1].name
+    def is_dirty(self, paths=None) -> bool:
+        """Whether the index differs from HEAD or a tracked file in the work tree differs from the index. Untracked
+        files are ignored.
+
+        If paths are given only those paths of the work tree are checked (the whole index still is), so the work
+        tree of a large repository is not scanned. The verdict for a set of paths is cached until the index, HEAD or
+        one of the paths changes. `git status` refreshes the index as it goes and uses core.fsmonitor and
+        core.untrackedCache if they are configured."""
+        if paths is None:
+            return self._status(None) != ""
+
+        rel_paths = tuple(sorted({self._rel_path(p) for p in paths}))
+        signature = self._dirty_signature(rel_paths)
+        cached = self._dirty_cache.get(rel_paths)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        staged = self.git_repo.git.execute(
+            ["git", "diff", "--cached", "--quiet"], with_extended_output=True, with_exceptions=False
+        )[0]
+        dirty = staged != 0 or self._status(rel_paths) != ""
+
+        # A verdict is only cached if nothing changed while it was computed; the index refresh of `git status` may
+        # rewrite the index, in which case it is cached on the next call.
+        if self._dirty_signature(rel_paths) == signature:
+            self._dirty_cache[rel_paths] = (signature, dirty)
+        return dirty
+
+    def _status(self, rel_paths) -> str:
+        args = ["git", "status", "--porcelain", "--untracked-files=no"]
+        if rel_paths is not None:
+            args += ["--", *rel_paths]
+        return self.git_repo.git.execute(args)
+
+    def _dirty_signature(self, rel_paths) -> tuple:
+        signature = []
+        for path in (pathlib.Path(self.git_repo.git_dir) / "index", *[self.repo_root_dir / p for p in rel_paths]):
+            try:
+                stat = os.lstat(path)
+                signature.append((stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino, stat.st_mode))
+            except FileNotFoundError:
+                signature.append(None)
+
+        try:
+            signature.append(self.git_repo.head.commit.hexsha)
+        except ValueError:
+            # No commits yet
+            signature.append(None)
+        return tuple(signature)
+
+    def tag_index(self, prefix="") -> TagIndex:
+        """The tags named `<prefix><version>` sorted by version, e.g. prefix="<package>-" for workspace tags."""
+        from bumpyproject.tag_index import get_tag_index
+
+        return get_tag_index(self.git_repo.git_dir, prefix)
+
+    def get_latest_tag(self, prefix="") -> str:
+        latest = self.tag_index(prefix).latest()
+        if latest is None:
+            raise ValueError(f"No version tags found in {self.repo_root_dir}")
+        return latest
 
-    def commit_and_tag(self, old_version, new_version):
+    @tracing.traced("git.commit_and_tag")
+    def commit_and_tag(self, old_version, new_version, paths=None):
         commit_message = f"bump {old_version} --> {new_version}"
+
+        plumbing = self.commit(commit_message, paths)
+        self.tag([(new_version, commit_message)], plumbing=plumbing)
+
+    @tracing.traced("git.commit_and_tag")
+    def commit_and_tag_packages(self, bumps: list[tuple[str, str, str]], paths=None):
+        """Commit several bumped packages at once and tag each of them as "<name>-<version>".
+
+        The bumps are given as (package name, old version, new version)."""
+        lines = [f"{name} {old_version} --> {new_version}" for name, old_version, new_version in bumps]
+        commit_message = f"bump {len(bumps)} packages\n\n" + "\n".join(lines)
+
+        plumbing = self.commit(commit_message, paths)
+        tags = [(f"{name}-{new_version}", f"bump {line}") for (name, _, new_version), line in zip(bumps, lines)]
+        self.tag(tags, plumbing=plumbing)
+
+    def tag(self, tags: list[tuple[str, str]], plumbing=False):
+        """Create an annotated tag of HEAD for every (name, message).
+
+        With plumbing the tag objects are written to the object database directly and all refs are created in one
+        `git update-ref --stdin`, instead of one `git tag -a` per tag. The resulting tag objects are identical.
+        Repositories with tag signing enabled always use `git tag`."""
+        git_cmd = self.git_repo.git
+        if not plumbing or not self.can_tag_with_plumbing():
+            for name, message in tags:
+                git_cmd.execute(["git", "tag", "-a", name, "-m", message])
+            return
+
+        head = self.git_repo.head.commit.hexsha
+        tagger = git_cmd.execute(["git", "var", "GIT_COMMITTER_IDENT"])
+        updates = []
+        for name, message in tags:
+            data = f"object {head}\ntype commit\ntag {name}\ntagger {tagger}\n\n{message.strip()}\n".encode()
+            tag_object = self.git_repo.odb.store(IStream("tag", len(data), BytesIO(data)))
+            # "create" fails if the tag exists, like `git tag` without --force
+            updates.append(f"create refs/tags/{name} {tag_object.binsha.hex()}\n")
+
+        cmd = ["git", "update-ref", "--stdin"]
+        result = subprocess.run(
+            cmd, cwd=self.repo_root_dir, input="".join(updates), capture_output=True, text=True, check=False
+        )
+        if result.returncode != 0:
+            raise git.GitCommandError(cmd, result.returncode, result.stderr)
+
+    def can_tag_with_plumbing(self) -> bool:
+        config_reader = self.git_repo.config_reader()
+        return not any(config_reader.get_value("tag", key, default=False) for key in ("gpgSign", "forceSignAnnotated"))
+
+    @tracing.traced("git.commit")
+    def commit(self, commit_message, paths=None) -> bool:
+        """Commit all tracked changes, or only the given paths. Returns whether plumbing commands were used.
+
+        When the paths are known the commit is written with plumbing commands that only hash the given files instead
+        of `git commit -a` which stats every tracked file in the work tree. The resulting commit object is identical.
+        Repositories with commit hooks or commit signing enabled always use `git commit`."""
+        if paths is None:
+            self.git_repo.git.execute(["git", "commit", "-am", commit_message])
+            return False
+        if not self.can_commit_with_plumbing():
+            # Only the given paths, a scoped dirty check (see `is_dirty`) allows changes in other files
+            rel_paths = [self._rel_path(p) for p in paths]
+            self.git_repo.git.execute(["git", "commit", "-m", commit_message, "--", *rel_paths])
+            return False
+
+        git_cmd = self.git_repo.git
+        rel_paths = [self._rel_path(p) for p in paths]
+
+        git_cmd.execute(["git", "update-index", "--", *rel_paths])
+        tree = git_cmd.execute(["git", "write-tree"])
+        head = self.git_repo.head.commit.hexsha
+        commit = git_cmd.execute(["git", "commit-tree", tree, "-p", head, "-m", commit_message])
+
+        subject = commit_message.splitlines()[0]
+        git_cmd.execute(["git", "update-ref", "-m", f"commit: {subject}", "HEAD", commit, head])
+        return True
+
+    def can_commit_with_plumbing(self) -> bool:
         curr_repo = self.git_repo
+        if not curr_repo.head.is_valid():
+            return False
+
+        config_reader = curr_repo.config_reader()
+        if config_reader.get_value("commit", "gpgsign", default=False):
+            return False
+
+        hooks_dir = pathlib.Path(config_reader.get_value("core", "hooksPath", default="") or "")
+        if not hooks_dir.parts:
+            hooks_dir = pathlib.Path(curr_repo.git_dir) / "hooks"
+        elif not hooks_dir.is_absolute():
+            hooks_dir = self.repo_root_dir / hooks_dir
+
+        for hook in ("pre-commit", "prepare-commit-msg", "commit-msg", "post-commit"):
+            if os.access(hooks_dir / hook, os.X_OK):
+                return False
 
-        curr_repo.git.execute(["git", "commit", "-am", commit_message])
-        curr_repo.git.execute(["git", "tag", "-a", new_version, "-m", commit_message])
+        return True
 
+    def _rel_path(self, path) -> str:
+        return pathlib.Path(path).resolve().relative_to(self.repo_root_dir).as_posix()
+
+    @tracing.traced("git.push")
     def push(self):
         curr_repo = self.git_repo
         self.git_remote.push(refspec=f"{curr_repo.active_branch}:{curr_repo.active_branch}")
@@ -92,18 +309,59 @@ class GitHelper:
         if push:
             curr_repo.git.push("--set-upstream", "origin", branch_name)
 
-    def get_bump_level_from_commit(self) -> BumpLevel:
-        from bumpyproject.versions import BumpLevel
+    def iter_commit_messages(self, rev_range="HEAD", chunk_size=64 * 1024) -> Iterator[str]:
+        """Stream the full messages of the commits in rev_range, newest first.
+
+        The output of `git log` is parsed while it is read, so no commit objects are built and a consumer that stops
+        early does not wait for the rest of the history. git is stopped when the iterator is closed."""
+        process = subprocess.Popen(
+            ["git", "log", "--format=%B%x00", rev_range, "--"],
+            cwd=self.repo_root_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            buffer = b""
+            while chunk := process.stdout.read1(chunk_size):
+                *messages, buffer = (buffer + chunk).split(b"\0")
+                for message in messages:
+                    # Every record but the first starts with the line break that ends the previous one
+                    yield message.lstrip(b"\n").decode("utf-8", errors="replace")
+
+            if process.wait() != 0:
+                raise git.GitCommandError(["git", "log", rev_range], process.returncode, process.stderr.read())
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def get_latest_version_tag(self, rev="HEAD") -> str | None:
+        """The newest version tag reachable from rev, or None if there is none."""
+        try:
+            return self.git_repo.git.describe("--tags", "--abbrev=0", "--match=[0-9]*", rev)
+        except git.GitCommandError:
+            return None
+
+    @tracing.traced("git.bump_level")
+    def get_bump_level_from_commit(self, since: str | None = None, rev="HEAD") -> BumpLevel:
+        """The highest bump level asked for by the commits since the last release (see `commit_messages`).
 
-        commits = list(self.git_repo.iter_commits(max_count=1))
-        latest_commit = commits[0]
-        msg = latest_commit.message
-        for level in BumpLevel:
-            if f"[{level.value}]" in msg:
-                return level
+        The commits in `since..rev` are scanned, where since defaults to the latest version tag reachable from rev.
+        If there is no such tag the whole history is scanned."""
+        from bumpyproject.commit_messages import highest_bump_level
 
-        if "[pre]" in msg:
-            return BumpLevel.PRE_RELEASE
+        if since is None:
+            since = self.get_latest_version_tag(rev)
+        rev_range = rev if since is None else f"{since}..{rev}"
 
-        raise ValueError(f'No bump level found in commit message "{msg}"')
+        messages = self.iter_commit_messages(rev_range)
+        try:
+            level = highest_bump_level(messages)
+        finally:
+            messages.close()
 
+        if level is None:
+            raise ValueError(f"No bump level found in the commit messages of {rev_range}")
+        return level
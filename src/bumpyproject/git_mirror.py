@@ -0,0 +1,127 @@
+"""A local cache of bare mirrors of remote repositories.
+
+Cloning a large repository to edit a single file is dominated by transferring the history and checking out the work
+tree. A mirror is cloned once and afterwards only fetched incrementally. Work trees are cloned from the mirror with
+depth 1, without blobs and with a sparse checkout of just the paths that are edited, so only the blobs of those paths
+are ever copied.
+
+The mirror itself keeps all objects: it serves the filtered clones, which a blob-less mirror could only do by lazily
+fetching the missing blobs from the remote.
+
+Credentials in an http(s) url (e.g. a CI token) are neither part of the mirror's name nor stored in its config. They
+are passed to git as an authorization header on the command line of each clone and fetch."""
+
+from __future__ import annotations
+
+import base64
+import contextlib
+import hashlib
+import pathlib
+import re
+import shutil
+import subprocess
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+from bumpyproject import env_vars as env
+from bumpyproject.log_utils import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class GitMirrorError(Exception):
+    pass
+
+
+def _git(*args, cwd=None, auth_header: str | None = None) -> str:
+    # The header is kept out of the error message
+    config = [] if auth_header is None else ["-c", f"http.extraHeader={auth_header}"]
+    result = subprocess.run(["git", *config, *args], cwd=cwd, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise GitMirrorError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def split_credentials(git_url: str) -> tuple[str, str | None]:
+    """The url without the credentials of an http(s) url, and those credentials as a basic authorization header."""
+    parts = urlsplit(git_url)
+    if parts.scheme not in ("http", "https") or "@" not in parts.netloc:
+        return git_url, None
+
+    userinfo, host = parts.netloc.rsplit("@", 1)
+    username, _, password = userinfo.partition(":")
+    token = base64.b64encode(f"{unquote(username)}:{unquote(password)}".encode()).decode()
+    return urlunsplit(parts._replace(netloc=host)), f"Authorization: Basic {token}"
+
+
+def mirror_path(git_url: str, mirror_dir: pathlib.Path | None = None) -> pathlib.Path:
+    """The mirror of a url is named after the repository and a hash of the url without its credentials."""
+    git_url, _ = split_credentials(git_url)
+    if mirror_dir is None:
+        mirror_dir = env.GIT_MIRROR_DIR or env.BUMPY_CACHE_DIR / "mirrors"
+
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", git_url.rstrip("/").rsplit("/", 1)[-1].removesuffix(".git"))
+    digest = hashlib.sha256(git_url.encode()).hexdigest()[:16]
+    return pathlib.Path(mirror_dir) / f"{name}-{digest}.git"
+
+
+@contextlib.contextmanager
+def _locked(path: pathlib.Path):
+    """Hold an exclusive lock on the mirror while it is cloned or fetched, e.g. by concurrent CI jobs."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def update_mirror(git_url: str, mirror_dir: pathlib.Path | None = None) -> pathlib.Path:
+    """Create the mirror of git_url or fetch what changed since the last update. Returns the mirror's path."""
+    path = mirror_path(git_url, mirror_dir)
+    git_url, auth_header = split_credentials(git_url)
+    with _locked(path):
+        if (path / "HEAD").exists():
+            logger.info(f"Fetching {git_url} into the mirror {path}")
+            # Also removes the credentials from the config of a mirror that was created with them
+            _git("remote", "set-url", "origin", git_url, cwd=path)
+            _git("fetch", "--prune", "--quiet", "origin", cwd=path, auth_header=auth_header)
+        else:
+            logger.info(f"Creating a mirror of {git_url} in {path}")
+            tmp_path = path.with_name(path.name + ".tmp")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            _git("clone", "--mirror", "--quiet", git_url, str(tmp_path), auth_header=auth_header)
+            # Let clones from the mirror ask for partial (blob-less) packs
+            _git("config", "uploadpack.allowFilter", "true", cwd=tmp_path)
+            tmp_path.rename(path)
+
+    return path
+
+
+def clone_from_mirror(
+    git_url: str,
+    dest: str | pathlib.Path,
+    sparse_paths: list[str] | None = None,
+    branch: str | None = None,
+    mirror_dir: pathlib.Path | None = None,
+) -> pathlib.Path:
+    """Clone git_url into dest through the mirror cache with depth 1 and without blobs.
+
+    If sparse_paths are given only those paths are checked out. The origin of the clone is git_url, so pushes go to
+    the remote and not to the mirror."""
+    mirror = update_mirror(git_url, mirror_dir)
+    dest = pathlib.Path(dest)
+
+    args = ["clone", "--quiet", "--depth", "1", "--filter=blob:none", "--no-checkout"]
+    if branch is not None:
+        args += ["--branch", branch]
+    # A file:// url makes git use the pack protocol, which supports --depth and --filter for local repositories
+    _git(*args, mirror.resolve().as_uri(), str(dest))
+
+    if sparse_paths is not None:
+        _git("sparse-checkout", "set", "--no-cone", *[f"/{p.lstrip('/')}" for p in sparse_paths], cwd=dest)
+    _git("checkout", "--quiet", cwd=dest)
+
+    _git("remote", "set-url", "origin", git_url, cwd=dest)
+    return dest
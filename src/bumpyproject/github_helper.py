@@ -1,7 +1,17 @@
+import contextvars
 import os
 
+# When set, the variables are passed to this callable instead of being written to $GITHUB_OUTPUT. The daemon uses it
+# to send the outputs back to the client, which writes them to its own $GITHUB_OUTPUT.
+output_writer: contextvars.ContextVar = contextvars.ContextVar("output_writer", default=None)
+
 
 def set_github_actions_variable(var_name, var_value):
+    writer = output_writer.get()
+    if writer is not None:
+        writer(var_name, var_value)
+        return
+
     env_file = os.environ.get("GITHUB_OUTPUT", None)
     if env_file is None:
         raise ValueError("GITHUB_OUTPUT environment variable not set")
@@ -1,26 +1,126 @@
+import contextvars
+import os
 import pathlib
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_EXCEPTION, Executor, Future, wait
+from typing import Any
 
+from bumpyproject import discovery
 from bumpyproject import env_vars as env
 
+# The directory a command runs in. The daemon runs the commands of many clients in one process and sets this per
+# request instead of changing the process-wide working directory.
+working_dir: contextvars.ContextVar[str | None] = contextvars.ContextVar("working_dir", default=None)
+
+
+class ProbeTimeoutError(TimeoutError):
+    pass
+
+
+def get_working_dir() -> str:
+    return working_dir.get() or os.getcwd()
+
 
 def check_git_repo_validity(repository):
     if len(env.ONLY_VALID_REPOS) > 0 and repository not in env.ONLY_VALID_REPOS:
         raise ValueError(f"Repository {repository} is not in the list of valid repositories: {env.ONLY_VALID_REPOS}")
 
 
+def find_files_in_subdirectories(root_dir, file_name) -> list[pathlib.Path]:
+    return discovery.find_files(root_dir, file_name)
+
+
 def find_file_in_subdirectories(root_dir, file_name):
-    if isinstance(root_dir, str):
-        root_dir = pathlib.Path(root_dir)
-    files = []
-    for path in root_dir.rglob(file_name):
-        if 'node_modules' in str(path):
-            continue
-        if path.is_file():
-            files.append(path)
+    files = find_files_in_subdirectories(root_dir, file_name)
 
     if len(files) == 0:
         raise FileNotFoundError(f"Could not find {file_name} in {root_dir}")
     elif len(files) > 1:
         raise ValueError(f"Found multiple {file_name} files in {root_dir}")
 
-    return files[0]
\ No newline at end of file
+    return files[0]
+
+
+def run_concurrently(tasks: dict[str, tuple[Callable[[], Any], float | None]]) -> dict[str, Any]:
+    """Run each named task in its own thread and return the results in the order the tasks were given.
+
+    Every task has its own timeout (in seconds, None for no timeout) counted from when the tasks were started.
+    The first task to fail or time out is re-raised as soon as it does, whichever of the tasks it is.
+
+    The tasks run on daemon threads, so a task that is still running after its timeout does not keep the process
+    alive. The tasks should still bound their own I/O, e.g. with a socket timeout, as the thread cannot be stopped."""
+    if len(tasks) == 0:
+        return {}
+
+    futures, deadlines = _start_tasks(tasks)
+    pending = dict(futures)
+    while pending:
+        known_deadlines = [deadlines[name] for name in pending if deadlines[name] is not None]
+        next_deadline = min(known_deadlines, default=None)
+        timeout = None if next_deadline is None else max(0.0, next_deadline - time.monotonic())
+        done, _ = wait(pending.values(), timeout=timeout, return_when=FIRST_EXCEPTION)
+
+        for name in [name for name, future in pending.items() if future in done]:
+            # Raises the exception of a failed task
+            pending.pop(name).result()
+
+        now = time.monotonic()
+        for name in pending:
+            if deadlines[name] is not None and deadlines[name] <= now:
+                raise ProbeTimeoutError(f"{name} did not respond within {tasks[name][1]} seconds")
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def iter_concurrently(tasks: dict[str, tuple[Callable[[], Any], float | None]]) -> Iterator[tuple[str, Any]]:
+    """Run the named tasks like `run_concurrently`, but yield (name, result) in the order the tasks were given.
+
+    The failure or timeout of a task is raised when its turn comes, so the caller can act on the results of the
+    earlier tasks first, e.g. raise its own error for them, no matter which task finished first."""
+    futures, deadlines = _start_tasks(tasks)
+    for name, future in futures.items():
+        timeout = None if deadlines[name] is None else max(0.0, deadlines[name] - time.monotonic())
+        done, _ = wait([future], timeout=timeout)
+        if not done:
+            raise ProbeTimeoutError(f"{name} did not respond within {tasks[name][1]} seconds")
+        yield name, future.result()
+
+
+def _start_tasks(tasks: dict[str, tuple[Callable[[], Any], float | None]]) -> tuple[dict, dict]:
+    """Start every task on its own daemon thread. Returns the futures and the deadlines of the tasks by name."""
+    start = time.monotonic()
+    deadlines = {name: None if timeout is None else start + timeout for name, (_, timeout) in tasks.items()}
+    futures = {}
+    for name, (func, _) in tasks.items():
+        future = Future()
+        futures[name] = future
+        # Each task runs in a copy of the caller's context, e.g. to write its output to the caller's stream
+        thread = threading.Thread(
+            target=_run_task,
+            args=(future, contextvars.copy_context(), func),
+            name=f"bumpy-probe-{name}",
+            daemon=True,
+        )
+        thread.start()
+
+    return futures, deadlines
+
+
+def map_in_context(executor: Executor, func: Callable[[Any], Any], items: Iterable) -> list:
+    """Like `executor.map`, but every call runs in a copy of the caller's context, so the workers write to the same
+    streams and see the same working directory as the caller (see `daemon`)."""
+    futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def _run_task(future: Future, context: contextvars.Context, func: Callable[[], Any]):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = context.run(func)
+    except BaseException as e:  # noqa: BLE001 - re-raised in the waiting thread
+        future.set_exception(e)
+    else:
+        future.set_result(result)
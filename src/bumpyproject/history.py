@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING
+
+from tomlkit.exceptions import ParseError
+
+from bumpyproject.rewrite import read_pyproject_version
+from bumpyproject.versions import make_semver_compatible
+
+if TYPE_CHECKING:
+    from bumpyproject.git_helper import GitHelper
+
+_NULL_SHA = "0" * 40
+
+
+class UnknownRevisionError(ValueError):
+    pass
+
+
+def parse_pyproject_version(content: bytes) -> str | None:
+    try:
+        version = read_pyproject_version(content)
+    except (KeyError, UnicodeDecodeError, ParseError):
+        return None
+
+    return make_semver_compatible(str(version))
+
+
+class VersionHistory:
+    """A persistent commit -> version index of a pyproject.toml file.
+
+    The index is built incrementally from `git rev-list` and `git log -- <path>` and stored in the git directory.
+    Versions are keyed by blob SHA, so a pyproject.toml that did not change between commits is parsed only once.
+    Once built, "version at commit X" and "commit that introduced version Y" are dictionary lookups."""
+
+    def __init__(self, git_helper: GitHelper, pyproject_toml: str | pathlib.Path):
+        self._git = git_helper
+        self._root_dir = git_helper.repo_root_dir
+        pyproject_toml = pathlib.Path(pyproject_toml).resolve().absolute()
+        self._rel_path = pyproject_toml.relative_to(self._root_dir).as_posix()
+
+        path_hash = hashlib.sha1(self._rel_path.encode()).hexdigest()[:12]
+        self._index_file = pathlib.Path(git_helper.git_repo.git_dir) / "bumpy" / f"history-{path_hash}.json"
+
+        self._tips: list[str] = []
+        self._commits: dict[str, str | None] = {}
+        self._blobs: dict[str, str | None] = {}
+        self._changes: list[tuple[str, str | None]] = []
+        self._introduced: dict[str, str] = {}
+        self._load()
+
+    @property
+    def changes(self) -> list[tuple[str, str | None]]:
+        """(commit, version) for every commit where the version changed, oldest first."""
+        return list(self._changes)
+
+    def _git_output(self, args: list[str], stdin: str | bytes | None = None) -> bytes:
+        if isinstance(stdin, str):
+            stdin = stdin.encode()
+        result = subprocess.run(["git", *args], cwd=self._root_dir, input=stdin, capture_output=True, check=True)
+        return result.stdout
+
+    def _resolve(self, rev: str) -> str:
+        if len(rev) == 40 and rev in self._commits:
+            return rev
+        try:
+            return self._git_output(["rev-parse", "--verify", f"{rev}^{{commit}}"]).decode().strip()
+        except subprocess.CalledProcessError as e:
+            raise UnknownRevisionError(f"Unknown revision {rev!r}") from e
+
+    def update(self, rev="HEAD") -> int:
+        """Index all commits reachable from rev that are not indexed yet. Returns the number of new commits."""
+        tip = self._resolve(rev)
+        if tip in self._commits:
+            return 0
+
+        # Tips that were rewritten (e.g. rebased) and garbage collected cannot be excluded any more
+        infos = self._git.cat_file.resolve(self._tips)
+        self._tips = [t for t in self._tips if infos[t] is not None]
+        exclude = "".join(f"^{t}\n" for t in self._tips)
+        rev_list_args = ["rev-list", "--topo-order", "--reverse", "--parents", "--stdin"]
+        rev_list = self._git_output(rev_list_args, f"{tip}\n{exclude}")
+        new_commits = [line.split() for line in rev_list.decode().splitlines()]
+
+        log_args = ["log", "--format=%x00%H", "--raw", "--no-abbrev", "--root", "--full-history"]
+        log_args += ["--diff-merges=first-parent", "--stdin", "--", self._rel_path]
+        touched = {}
+        for chunk in self._git_output(log_args, f"{tip}\n{exclude}").decode().split("\0")[1:]:
+            lines = chunk.strip().splitlines()
+            for line in lines[1:]:
+                meta, _, path = line.partition("\t")
+                if line.startswith(":") and path == self._rel_path:
+                    blob = meta.split()[3]
+                    touched[lines[0]] = None if blob == _NULL_SHA else blob
+
+        self._read_blobs({blob for blob in touched.values() if blob is not None and blob not in self._blobs})
+
+        for commit, *parents in new_commits:
+            # Already indexed from a tip that no longer exists
+            if commit in self._commits:
+                continue
+            parent_blob = self._commits.get(parents[0]) if parents else None
+            blob = touched.get(commit, parent_blob)
+            self._commits[commit] = blob
+
+            version = self._blobs.get(blob)
+            if version != self._blobs.get(parent_blob) or (not parents and version is not None):
+                self._changes.append((commit, version))
+                if version is not None:
+                    self._introduced.setdefault(version, commit)
+
+        self._tips = [t for t in self._tips if t != tip] + [tip]
+        self._save()
+
+        return len(new_commits)
+
+    def version_at(self, rev: str) -> str | None:
+        commit = self._resolve(rev)
+        if commit not in self._commits:
+            self.update(commit)
+
+        return self._blobs.get(self._commits[commit])
+
+    def commit_introducing(self, version: str) -> str | None:
+        return self._introduced.get(make_semver_compatible(version))
+
+    def _read_blobs(self, blobs: set[str]):
+        if len(blobs) == 0:
+            return
+
+        for blob, content in self._git.cat_file.read_blobs(sorted(blobs)).items():
+            self._blobs[blob] = None if content is None else parse_pyproject_version(content)
+
+    def _load(self):
+        try:
+            with open(self._index_file, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if data.get("path") != self._rel_path:
+            return
+
+        self._tips = data["tips"]
+        self._commits = data["commits"]
+        self._blobs = data["blobs"]
+        self._changes = [tuple(x) for x in data["changes"]]
+        self._introduced = data["introduced"]
+
+    def _save(self):
+        data = {
+            "path": self._rel_path,
+            "tips": self._tips,
+            "commits": self._commits,
+            "blobs": self._blobs,
+            "changes": self._changes,
+            "introduced": self._introduced,
+        }
+        self._index_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self._index_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_name, self._index_file)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bumpyproject import env_vars as env
+
+_session = None
+_default_cache = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """A process wide session so that connections to the registries are pooled and reused."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "bumpyproject"
+            _session = session
+    return _session
+
+
+class CachedResponse:
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes, from_cache: bool):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    """On-disk cache of GET responses keyed by URL (and Accept header).
+
+    Entries younger than `ttl` seconds are served without touching the network. Older entries are revalidated
+    with If-None-Match/If-Modified-Since so an unchanged document costs a 304. The least recently used entries
+    are evicted once the cache grows beyond `max_bytes`."""
+
+    def __init__(self, cache_dir: str | pathlib.Path, ttl: float = 0, max_bytes: int = 50 * 1024 * 1024):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @property
+    def settings(self) -> tuple[pathlib.Path, float, int]:
+        return self.cache_dir, self.ttl, self.max_bytes
+
+    def get(self, url: str, headers: dict | None = None, timeout: float | None = None) -> CachedResponse:
+        headers = dict(headers or {})
+        entry_path = self._entry_path(url, headers)
+        meta, content = self._load(entry_path)
+
+        if meta is not None and time.time() - meta["stored_at"] < self.ttl:
+            self._touch(entry_path)
+            return CachedResponse(url, meta["status_code"], meta["headers"], content, from_cache=True)
+
+        if meta is not None:
+            if meta["headers"].get("ETag") is not None:
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified") is not None:
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and meta is not None:
+            meta["stored_at"] = time.time()
+            self._store(entry_path, meta, content)
+            return CachedResponse(url, meta["status_code"], meta["headers"], content, from_cache=True)
+
+        response.raise_for_status()
+        kept_headers = {
+            key: response.headers[key] for key in ("ETag", "Last-Modified", "Content-Type") if key in response.headers
+        }
+        meta = {"url": url, "status_code": response.status_code, "headers": kept_headers, "stored_at": time.time()}
+        self._store(entry_path, meta, response.content)
+        self._evict()
+
+        return CachedResponse(url, response.status_code, kept_headers, response.content, from_cache=False)
+
+    def stream(
+        self, url: str, headers: dict | None = None, timeout: float | None = None, chunk_size=64 * 1024
+    ) -> Iterator[bytes]:
+        """Like `get`, but yields the body in chunks instead of holding it in memory. A document that is downloaded
+        is written to the cache while it is read, and stored if it is read to the end."""
+        headers = dict(headers or {})
+        entry_path = self._entry_path(url, headers)
+        meta = self._load_meta(entry_path)
+
+        if meta is not None and time.time() - meta["stored_at"] < self.ttl:
+            self._touch(entry_path)
+            yield from self._iter_content(entry_path, chunk_size)
+            return
+
+        if meta is not None:
+            if meta["headers"].get("ETag") is not None:
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified") is not None:
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and meta is not None:
+                meta["stored_at"] = time.time()
+                self._restamp(entry_path, meta)
+                yield from self._iter_content(entry_path, chunk_size)
+                return
+
+            response.raise_for_status()
+            kept_headers = {
+                key: response.headers[key]
+                for key in ("ETag", "Last-Modified", "Content-Type")
+                if key in response.headers
+            }
+            meta = {"url": url, "status_code": response.status_code, "headers": kept_headers, "stored_at": time.time()}
+            if self.max_bytes <= 0:
+                yield from response.iter_content(chunk_size)
+                return
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(json.dumps(meta).encode() + b"\n")
+                    # If the consumer stops reading early, the rest is not downloaded and the partial document is
+                    # discarded with the temporary file
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        yield chunk
+                os.replace(tmp_name, entry_path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+
+        self._evict()
+
+    def clear(self):
+        for entry in self._entries():
+            entry.unlink(missing_ok=True)
+
+    def _entry_path(self, url: str, headers: dict) -> pathlib.Path:
+        key = f"{url}\n{headers.get('Accept', '')}"
+        return self.cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.entry"
+
+    def _entries(self) -> list[pathlib.Path]:
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob("*.entry"))
+
+    @staticmethod
+    def _load(entry_path: pathlib.Path) -> tuple[dict | None, bytes | None]:
+        try:
+            with open(entry_path, "rb") as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+        except (FileNotFoundError, ValueError):
+            return None, None
+
+        return meta, content
+
+    @staticmethod
+    def _load_meta(entry_path: pathlib.Path) -> dict | None:
+        try:
+            with open(entry_path, "rb") as f:
+                return json.loads(f.readline())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _iter_content(entry_path: pathlib.Path, chunk_size: int) -> Iterator[bytes]:
+        with open(entry_path, "rb") as f:
+            f.readline()
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def _restamp(self, entry_path: pathlib.Path, meta: dict):
+        """Rewrite the metadata of an entry without reading its content into memory."""
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, open(entry_path, "rb") as src:
+                src.readline()
+                f.write(json.dumps(meta).encode() + b"\n")
+                shutil.copyfileobj(src, f)
+            os.replace(tmp_name, entry_path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    def _store(self, entry_path: pathlib.Path, meta: dict, content: bytes):
+        if self.max_bytes <= 0:
+            return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(meta).encode() + b"\n")
+                f.write(content)
+            os.replace(tmp_name, entry_path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    @staticmethod
+    def _touch(entry_path: pathlib.Path):
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+
+def get_default_cache() -> HttpCache:
+    """The cache configured by BUMPY_CACHE_DIR, HTTP_CACHE_TTL and HTTP_CACHE_MAX_BYTES."""
+    global _default_cache
+    cache_dir = env.BUMPY_CACHE_DIR / "http"
+    with _lock:
+        cache = _default_cache
+        if cache is None or cache.settings != (cache_dir, env.HTTP_CACHE_TTL, env.HTTP_CACHE_MAX_BYTES):
+            cache = HttpCache(cache_dir, env.HTTP_CACHE_TTL, env.HTTP_CACHE_MAX_BYTES)
+            _default_cache = cache
+    return cache
+
+
+def cached_get(url: str, headers: dict | None = None, timeout: float | None = None) -> CachedResponse:
+    return get_default_cache().get(url, headers=headers, timeout=timeout)
+
+
+def cached_stream(url: str, headers: dict | None = None, timeout: float | None = None) -> Iterator[bytes]:
+    return get_default_cache().stream(url, headers=headers, timeout=timeout)
@@ -0,0 +1,146 @@
+"""Incremental parsing of large JSON documents.
+
+Only the top level object is walked token by token. The members that are asked for are parsed one item at a time
+with `json.JSONDecoder.raw_decode`, so an array of thousands of objects is never held in memory as a whole, and
+reading stops as soon as all requested members were seen."""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SEPARATOR = re.compile(r"[ \t\n\r]*,[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk. Returns False at the end of the document."""
+        if self.eof:
+            return False
+
+        # The consumed part of the buffer is dropped once per chunk rather than after every item
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+
+        self.buffer += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """The next character that is not whitespace, or "" at the end of the document."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def skip_separator(self) -> bool:
+        """Skip a "," between two items. Returns False if the next token is anything else."""
+        match = _SEPARATOR.match(self.buffer, self.pos)
+        # The whitespace after the separator may continue in the next chunk, which `value` takes care of
+        if match is not None:
+            self.pos = match.end()
+            return True
+        return False
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        if self.pos >= len(self.buffer) or self.buffer[self.pos] in " \t\n\r":
+            self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # The value continues in the next chunks. Read until the unparsed text doubled, so a long value is
+                # not parsed again for every chunk.
+                target = 2 * (len(self.buffer) - self.pos) + 1
+                while len(self.buffer) - self.pos < target and self.fill():
+                    pass
+                continue
+
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_members(chunks: Iterable[bytes], keys: set[str]) -> Iterator[tuple[str, Any]]:
+    """Yield the contents of the given members of the top level object of the JSON document in chunks.
+
+    The items of an array are yielded as (key, item), the members of an object as (key, (name, value)) and any other
+    value as (key, value). The rest of the document is not read once all keys were seen."""
+    reader = _Reader(chunks)
+    remaining = set(keys)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while remaining:
+        name = reader.value()
+        if not isinstance(name, str):
+            raise json.JSONDecodeError("Expecting property name", reader.buffer, reader.pos)
+        reader.expect(":")
+
+        if name in remaining:
+            remaining.discard(name)
+            yield from ((name, item) for item in _iter_container(reader))
+        else:
+            reader.value()
+
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
+
+
+def _iter_container(reader: _Reader) -> Iterator[Any]:
+    opening = reader.peek()
+    if opening not in ("[", "{"):
+        yield reader.value()
+        return
+
+    closing = "]" if opening == "[" else "}"
+    reader.pos += 1
+    if reader.peek() == closing:
+        reader.pos += 1
+        return
+
+    while True:
+        if opening == "[":
+            yield reader.value()
+        else:
+            name = reader.value()
+            reader.expect(":")
+            yield name, reader.value()
+
+        if reader.skip_separator():
+            continue
+        if reader.peek() == closing:
+            reader.pos += 1
+            return
+        reader.expect(",")
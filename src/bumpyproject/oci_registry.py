@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import itertools
+import json
+import re
+from collections.abc import Iterator
+from urllib.parse import urljoin
+
+from bumpyproject.http_cache import get_session
+from bumpyproject.log_utils import logger
+from bumpyproject.versions import parse_version
+
+MANIFEST_MEDIA_TYPES = (
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+)
+
+_AUTH_PARAM_REGEX = re.compile(r'(\w+)="([^"]*)"')
+
+
+class RegistryError(Exception):
+    pass
+
+
+class OCIRegistry:
+    """A minimal client for the OCI distribution API (/v2) of a container registry such as ACR.
+
+    Supports anonymous access, basic auth and the docker token flow (a 401 with a `WWW-Authenticate: Bearer` challenge
+    is answered by requesting a token from the realm using the username and password)."""
+
+    def __init__(self, base_url: str, username: str | None = None, password: str | None = None, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._tokens: dict[str, str] = {}
+
+    def _basic_auth(self):
+        if self._username is None or self._password is None:
+            return None
+        return self._username, self._password
+
+    def _fetch_token(self, challenge: str) -> str:
+        params = dict(_AUTH_PARAM_REGEX.findall(challenge))
+        realm = params.pop("realm")
+        response = get_session().get(realm, params=params, auth=self._basic_auth(), timeout=self._timeout)
+        if response.status_code != 200:
+            raise RegistryError(f"Could not get a registry token from {realm}: {response.status_code}")
+
+        data = response.json()
+        return data.get("token") or data["access_token"]
+
+    def request(self, method: str, path: str, repository: str, headers: dict | None = None, **kwargs):
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        headers = dict(headers or {})
+        token = self._tokens.get(repository)
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+
+        session = get_session()
+        response = session.request(method, url, headers=headers, timeout=self._timeout, **kwargs)
+        if response.status_code != 401:
+            return response
+
+        challenge = response.headers.get("WWW-Authenticate", "")
+        if challenge.lower().startswith("bearer"):
+            token = self._fetch_token(challenge)
+            self._tokens[repository] = token
+            headers["Authorization"] = f"Bearer {token}"
+            return session.request(method, url, headers=headers, timeout=self._timeout, **kwargs)
+
+        if challenge.lower().startswith("basic") and self._basic_auth() is not None:
+            return session.request(
+                method, url, headers=headers, auth=self._basic_auth(), timeout=self._timeout, **kwargs
+            )
+
+        raise RegistryError(f"Not authorized to {method} {url}")
+
+    def manifest_exists(self, repository: str, reference: str) -> bool:
+        headers = {"Accept": ", ".join(MANIFEST_MEDIA_TYPES)}
+        response = self.request("HEAD", f"/v2/{repository}/manifests/{reference}", repository, headers)
+        return response.status_code == 200
+
+    def blob_exists(self, repository: str, digest: str) -> bool:
+        response = self.request("HEAD", f"/v2/{repository}/blobs/{digest}", repository)
+        return response.status_code == 200
+
+    def get_manifest(self, repository: str, reference: str) -> tuple[bytes, str] | None:
+        """Return the raw manifest and its media type, or None if it does not exist."""
+        headers = {"Accept": ", ".join(MANIFEST_MEDIA_TYPES)}
+        response = self.request("GET", f"/v2/{repository}/manifests/{reference}", repository, headers)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise RegistryError(f"Could not get manifest {repository}:{reference}: {response.status_code}")
+
+        return response.content, response.headers.get("Content-Type", MANIFEST_MEDIA_TYPES[0])
+
+    def put_manifest(self, repository: str, reference: str, content: bytes, media_type: str):
+        headers = {"Content-Type": media_type}
+        path = f"/v2/{repository}/manifests/{reference}"
+        response = self.request("PUT", path, repository, headers, data=content)
+        if response.status_code not in (200, 201):
+            raise RegistryError(f"Could not put manifest {repository}:{reference}: {response.status_code}")
+
+    def iter_tags(self, repository: str, page_size=100) -> Iterator[str]:
+        path = f"/v2/{repository}/tags/list?n={page_size}"
+        while path is not None:
+            response = self.request("GET", path, repository)
+            if response.status_code == 404:
+                return
+            if response.status_code != 200:
+                raise RegistryError(f"Could not list tags of {repository}: {response.status_code}")
+
+            yield from response.json().get("tags") or []
+
+            # Pagination follows the RFC 5988 Link header
+            next_link = response.links.get("next", {}).get("url")
+            path = None if next_link is None else urljoin(f"{self.base_url}/", next_link)
+
+    def find_manifest_by_config(
+        self, repository: str, config_digest: str, expected_tags=(), scan_limit=50, list_limit=1000
+    ) -> tuple[bytes, str] | None:
+        """Find the manifest of an image in the repository by the digest of its config blob.
+
+        The expected tags (e.g. the tags the image has locally) are checked first. Then at most `list_limit` tags are
+        listed and at most `scan_limit` of them are checked, newest version first."""
+        if not self.blob_exists(repository, config_digest):
+            return None
+
+        def matches(manifest) -> bool:
+            return manifest is not None and json.loads(manifest[0]).get("config", {}).get("digest") == config_digest
+
+        for tag in expected_tags:
+            manifest = self.get_manifest(repository, tag)
+            if matches(manifest):
+                return manifest
+
+        def version_key(tag: str):
+            try:
+                return 1, parse_version(tag).key
+            except ValueError:
+                return 0, ()
+
+        # Newest versions first, tags that are not versions (e.g. "latest") last
+        tags = itertools.islice(self.iter_tags(repository), list_limit)
+        candidates = [tag for tag in sorted(tags, key=version_key, reverse=True) if tag not in expected_tags]
+        for tag in candidates[:scan_limit]:
+            manifest = self.get_manifest(repository, tag)
+            if matches(manifest):
+                return manifest
+
+        return None
+
+
+def retag_existing_image(
+    registry: OCIRegistry,
+    repository: str,
+    tag: str,
+    image_id: str,
+    repo_digests: list[str] | tuple[str, ...] = (),
+    expected_tags: list[str] | tuple[str, ...] = (),
+) -> bool:
+    """Tag an image that already exists in the registry under another tag with a single manifest PUT.
+
+    The local image is identified by the manifest digests it was pushed/pulled with (docker's RepoDigests), by its id
+    (the manifest digest with the containerd image store) and by its config digest (the id with the classic image
+    store). The expected tags are where the image is looked for first when it is found by its config digest. Returns
+    False if the image has to be pushed."""
+    candidates = [d.split("@", 1)[1] for d in repo_digests if "@" in d]
+    candidates.append(image_id)
+
+    for digest in candidates:
+        manifest = registry.get_manifest(repository, digest)
+        if manifest is not None:
+            registry.put_manifest(repository, tag, *manifest)
+            logger.info(f"Manifest {digest} already exists in {repository}. Tagged it as {tag} without pushing.")
+            return True
+
+    manifest = registry.find_manifest_by_config(repository, image_id, expected_tags)
+    if manifest is not None:
+        registry.put_manifest(repository, tag, *manifest)
+        logger.info(f"Image {image_id} already exists in {repository}. Tagged it as {tag} without pushing.")
+        return True
+
+    return False
@@ -1,20 +1,26 @@
-import json
-import os
 import pathlib
+from functools import partial
 
+import git
 import semver
 import tomlkit
 
-from bumpyproject import bumper
-from bumpyproject import docker_helper
+from bumpyproject import bumper, rewrite, tracing
 from bumpyproject import env_vars as env
-from bumpyproject import py_distro
 from bumpyproject.bumper import NoVersionChangeError, OutdatedBumpError
 from bumpyproject.git_helper import GitHelper
 from bumpyproject.github_helper import set_github_actions_variable
-from bumpyproject.helpers import find_file_in_subdirectories
-from bumpyproject.versions import make_semver_compatible, make_pep440_compatible
+from bumpyproject.helpers import find_file_in_subdirectories, get_working_dir, iter_concurrently, run_concurrently
+from bumpyproject.history import VersionHistory, parse_pyproject_version
 from bumpyproject.log_utils import logger
+from bumpyproject.substitutions import (
+    SubstitutionReport,
+    SubstitutionRule,
+    apply_substitutions,
+    find_target_files,
+    load_substitution_rules,
+)
+from bumpyproject.versions import make_pep440_compatible, make_semver_compatible
 
 
 class Project:
@@ -28,9 +34,10 @@ class Project:
         pypi_url=None,
         conda_url=None,
         ga_version_output=False,
+        git_helper=None,
     ):
         if root_dir is None:
-            root_dir = os.getcwd()
+            root_dir = get_working_dir()
 
         if pyproject_toml is None:
             pyproject_toml = find_file_in_subdirectories(root_dir, "pyproject.toml")
@@ -53,12 +60,13 @@ class Project:
         self._root_dir = root_dir
         self._pyproject_toml = pyproject_toml.resolve().absolute()
         self._package_json = package_json
-        self._git_helper = GitHelper(self.root_dir)
+        self._git_helper = git_helper if git_helper is not None else GitHelper.for_dir(self.root_dir)
         self._dockerfile = dockerfile if dockerfile is None else pathlib.Path(dockerfile)
         self._docker_context = docker_context if docker_context is None else pathlib.Path(docker_context)
         self.pypi_url = pypi_url
         self.conda_url = conda_url
         self._ga_version_output = ga_version_output
+        self._substitution_rules = None
 
         if self._dockerfile is not None and not self._dockerfile.exists():
             if self._docker_context is not None:
@@ -77,6 +85,22 @@ class Project:
     def package_json_path(self):
         return self._package_json
 
+    @property
+    def version_files(self) -> list[pathlib.Path]:
+        """The files that are rewritten when the version is bumped"""
+        files = [self.pyproject_toml_path]
+        if self.package_json_path.exists():
+            files.append(self.package_json_path)
+        return files
+
+    @property
+    def bump_paths(self) -> list[pathlib.Path]:
+        """The version files and the files of the substitutions"""
+        paths = self.version_files
+        if self.substitution_rules:
+            paths += list(find_target_files(self.pyproject_toml_path.parent.resolve(), self.substitution_rules))
+        return paths
+
     @property
     def root_dir(self):
         return self._root_dir
@@ -93,6 +117,13 @@ class Project:
     def docker_context(self) -> pathlib.Path | None:
         return self._docker_context
 
+    def version_history(self, rev="HEAD") -> VersionHistory:
+        """The version history of pyproject.toml, indexed up to rev."""
+        history = VersionHistory(self.git, self.pyproject_toml_path)
+        history.update(rev)
+        return history
+
+    @tracing.traced("project.check_git_history")
     def check_git_history(self, new_version=None):
         from bumpyproject import bumper
 
@@ -113,43 +144,96 @@ class Project:
                 f"Cannot bump to {new_version=} from {git_old_version=} because it is not a single level bump"
             )
 
+    @tracing.traced("git.pushed_version")
     def get_pyproject_toml_version_from_latest_pushed_commit(self):
-        # Initialize the repo object
+        # Look up the remote tracking branch of the active branch directly instead of listing all remote refs
         remote = self.git.git_remote
+        active_local_branch = self.git.git_repo.active_branch.name
+        remote_head = git.RemoteReference(self.git.git_repo, f"refs/remotes/{remote.name}/{active_local_branch}")
 
-        # If there are no pushed commits return None
-        if len(remote.refs) == 0:
+        # If the active branch has not been pushed return None
+        if not remote_head.is_valid():
             return None
 
-        active_local_branch = self.git.git_repo.active_branch.name
-        remote_head = None
-        for ref in remote.refs:
-            if ref.remote_head == active_local_branch:
-                remote_head = ref
-                break
+        content = self.git.read_file_at(self.pyproject_toml_path, [remote_head.path])[remote_head.path]
+        if content is None:
+            logger.error(f"'pyproject.toml' not found in the latest pushed commit of {remote_head.path}.")
+            return
 
-        # Get the last pushed commit to active branch
-        latest_pushed_commit = remote_head.commit
+        # Get the version from the file
+        version = rewrite.read_pyproject_version(content)
 
-        pytoml = self.pyproject_toml_path
+        version = make_semver_compatible(version)
+        return version
 
-        toml_rel = pytoml.relative_to(self.git.repo_root_dir)
+    def pyproject_versions_at(self, revs) -> dict[str, str | None]:
+        """The version in pyproject.toml at each of the revisions, read in one batch. None where pyproject.toml does
+        not exist or has no valid version."""
+        revs = list(revs)
+        return {
+            rev: None if content is None else parse_pyproject_version(content)
+            for rev, content in self.git.read_file_at(self.pyproject_toml_path, revs).items()
+        }
 
-        # Get the pyproject.toml file from both commits
-        try:
-            latest_file = latest_pushed_commit.tree / str(toml_rel.as_posix())
-        except KeyError as e:
-            print(f"Error: {e} 'pyproject.toml' not found in the latest or previous commit.")
-            return
+    def get_latest_registry_versions(self) -> dict[str, str]:
+        """Query the latest published version on PyPI, Conda and ACR concurrently.
 
-        # Read the contents of the files
-        toml_data = tomlkit.parse(latest_file.data_stream.read().decode("utf-8"))
+        Only the registries configured for this project are queried. Each registry has its own timeout."""
+        return run_concurrently(self._registry_probes())
 
-        # Get the version from the file
-        version = toml_data["project"]["version"]
+    def _registry_probes(self) -> dict:
+        from bumpyproject import docker_helper, py_distro
 
-        version = make_semver_compatible(version)
-        return version
+        probes = {}
+        if self.pypi_url is not None:
+            probes["pypi"] = (
+                tracing.traced("registry.pypi")(
+                    partial(py_distro.get_latest_pypi_version, self.pypi_url, env.PYPI_TIMEOUT)
+                ),
+                env.PYPI_TIMEOUT,
+            )
+
+        if self.conda_url is not None:
+            # Channel repodata lists every package of the channel, so the project's own name is looked up in it
+            package_name = self.get_pyproject_name() if py_distro.is_repodata_url(self.conda_url) else None
+            probes["conda"] = (
+                tracing.traced("registry.conda")(
+                    partial(py_distro.get_latest_conda_version, self.conda_url, env.CONDA_TIMEOUT, package_name)
+                ),
+                env.CONDA_TIMEOUT,
+            )
+
+        if env.ACR_NAME is not None and env.ACR_REPO_NAME is not None:
+            acr_helper = docker_helper.DockerACRHelper(env.ACR_NAME, env.ACR_REPO_NAME)
+            probes["acr"] = (tracing.traced("registry.acr")(acr_helper.get_latest_tagged_image), env.ACR_TIMEOUT)
+
+        return probes
+
+    def check_registries(self, new_version: str):
+        # The registries are queried concurrently, but checked in order (PyPI, Conda, ACR): an outdated version on
+        # PyPI is reported even if a later lookup fails
+        with tracing.span("project.registries"):
+            for registry, version in iter_concurrently(self._registry_probes()):
+                if registry == "pypi":
+                    self._check_package_version(version, new_version, "PyPI", "PYPIBUMP")
+                elif registry == "conda":
+                    self._check_package_version(version, new_version, "Conda", "CONDABUMP")
+                else:
+                    bumper.is_newer(version, new_version)
+                    logger.info(f"Latest version on ACR '{version}' OK for push to '{new_version}'")
+
+    def _check_package_version(self, published_version: str, new_version: str, registry: str, output_name: str):
+        try:
+            bumper.is_newer(published_version, new_version)
+            if self._ga_version_output:
+                set_github_actions_variable(output_name, "TRUE")
+            logger.info(f"{new_version=}' OK to succeed '{published_version=}' on {registry}")
+        except (OutdatedBumpError, NoVersionChangeError):
+            if self._ga_version_output:
+                set_github_actions_variable(output_name, "FALSE")
+                logger.info(f"{new_version=}' NOT OK to succeed '{published_version=}' on {registry}")
+            else:
+                raise
 
     def bump(
         self,
@@ -160,6 +244,10 @@ class Project:
         check_current_version=False,
         dry_run=False,
     ) -> str:
+        with tracing.span("project.bump", level=bump_level):
+            return self._bump(bump_level, check_git, ignore_git_state, git_push, check_current_version, dry_run)
+
+    def _bump(self, bump_level, check_git, ignore_git_state, git_push, check_current_version, dry_run) -> str:
         git_helper = self.git
 
         current_version = self.get_pyproject_version()
@@ -172,39 +260,7 @@ class Project:
         if check_git:
             self.check_git_history(new_version)
 
-        if self.pypi_url is not None:
-            pypi_version = py_distro.get_latest_pypi_version(self.pypi_url)
-            try:
-                bumper.is_newer(pypi_version, new_version)
-                if self._ga_version_output:
-                    set_github_actions_variable("PYPIBUMP", "TRUE")
-                logger.info(f"{new_version=}' OK to succeed '{pypi_version=}' on PyPI")
-            except (OutdatedBumpError, NoVersionChangeError) as e:
-                if self._ga_version_output:
-                    set_github_actions_variable("PYPIBUMP", "FALSE")
-                    logger.info(f"{new_version=}' NOT OK to succeed '{pypi_version=}' on PyPI")
-                else:
-                    raise e
-
-        if self.conda_url is not None:
-            conda_version = py_distro.get_latest_conda_version(self.conda_url)
-            try:
-                bumper.is_newer(conda_version, new_version)
-                if self._ga_version_output:
-                    set_github_actions_variable("CONDABUMP", "TRUE")
-                logger.info(f"{new_version=}' OK to succeed '{conda_version=}' on Conda")
-            except (OutdatedBumpError, NoVersionChangeError) as e:
-                if self._ga_version_output:
-                    set_github_actions_variable("CONDABUMP", "FALSE")
-                    logger.info(f"{new_version=}' NOT OK to succeed '{conda_version=}' on Conda")
-                else:
-                    raise e
-
-        check_acr = env.ACR_NAME is not None and env.ACR_REPO_NAME is not None
-        if check_acr:
-            acr_version = docker_helper.DockerACRHelper(env.ACR_NAME, env.ACR_REPO_NAME).get_latest_tagged_image()
-            bumper.is_newer(acr_version, new_version)
-            logger.info(f"Latest version on ACR '{acr_version}' OK for push to '{new_version}'")
+        self.check_registries(new_version)
 
         if check_current_version:
             logger.info(f"Check complete for {new_version}.")
@@ -212,23 +268,22 @@ class Project:
 
             # Before the image is pushed we do some checks
         if not ignore_git_state:
-            git_helper.check_git_state()
+            git_helper.check_git_state(self.bump_paths if env.DIRTY_CHECK == "scoped" else None)
 
         if dry_run:
+            diff = self.apply_substitutions(new_version, dry_run=True).diff()
+            if diff:
+                logger.info(f"Dry run: the substitutions would change\n{diff}")
             logger.info(f"Dry run: Version '{new_version}' would be pushed.")
             return new_version
 
-        # If exists bump package.json file
-        is_pkg_json_bumped = True
-        if self.package_json_path.exists():
-            is_pkg_json_bumped = bump_package_json(self.package_json_path, new_version)
-
-        # Bump pyproject.toml file
-        is_pyproject_bumped = bump_pyproject(self.pyproject_toml_path, new_version)
+        is_bumped = self.write_version(new_version)
+        # Nothing is committed if the version did not change, so the other files are left alone too
+        substituted_files = self.apply_substitutions(new_version).changed_paths if is_bumped else []
 
         # Commit and tag the new version
-        if not ignore_git_state and (is_pyproject_bumped and is_pkg_json_bumped):
-            git_helper.commit_and_tag(current_version, new_version)
+        if not ignore_git_state and is_bumped:
+            git_helper.commit_and_tag(current_version, new_version, paths=self.version_files + substituted_files)
 
         # Push the new version to git
         if git_push:
@@ -236,21 +291,46 @@ class Project:
 
         return new_version
 
-    def get_pyproject_version(self) -> str:
+    @property
+    def substitution_rules(self) -> list[SubstitutionRule]:
+        if self._substitution_rules is None:
+            self._substitution_rules = load_substitution_rules(self.pyproject_toml_path)
+        return self._substitution_rules
+
+    @tracing.traced("project.substitutions")
+    def apply_substitutions(self, new_version: str, dry_run=False) -> SubstitutionReport:
+        """Replace the version in the files listed as [[tool.bumpy.substitutions]], relative to pyproject.toml."""
+        return apply_substitutions(self.pyproject_toml_path.parent, self.substitution_rules, new_version, dry_run)
+
+    @tracing.traced("project.write_version")
+    def write_version(self, new_version: str) -> bool:
+        # If exists bump package.json file
+        is_pkg_json_bumped = True
+        if self.package_json_path.exists():
+            is_pkg_json_bumped = bump_package_json(self.package_json_path, new_version)
+
+        # Bump pyproject.toml file
+        is_pyproject_bumped = bump_pyproject(self.pyproject_toml_path, new_version)
+
+        return is_pyproject_bumped and is_pkg_json_bumped
+
+    def get_pyproject_name(self) -> str:
         with open(self.pyproject_toml_path, mode="r") as fp:
             toml_data = tomlkit.load(fp)
 
-        old_version = toml_data["project"]["version"]
+        return toml_data["project"]["name"]
+
+    @tracing.traced("project.read_version")
+    def get_pyproject_version(self) -> str:
+        old_version = rewrite.read_pyproject_version(self.pyproject_toml_path.read_bytes())
         old_version = make_semver_compatible(old_version)
 
         return old_version
 
 
 def bump_pyproject(pyproject_toml_path: str | pathlib.Path, new_version: str) -> bool:
-    with open(pyproject_toml_path, mode="r") as fp:
-        toml_data = tomlkit.load(fp)
-
-    old_version = toml_data["project"]["version"]
+    content = pathlib.Path(pyproject_toml_path).read_bytes()
+    old_version = rewrite.read_pyproject_version(content)
 
     old_version = make_semver_compatible(old_version)
     compare = semver.Version.compare(semver.Version.parse(old_version), semver.Version.parse(new_version))
@@ -261,27 +341,23 @@ def bump_pyproject(pyproject_toml_path: str | pathlib.Path, new_version: str) ->
         return False
 
     new_version = make_pep440_compatible(new_version)
-    toml_data["project"]["version"] = new_version
-    with open(pyproject_toml_path, "w") as f:
-        f.write(tomlkit.dumps(toml_data))
+    # Only the version value is replaced, the rest of the file is kept byte for byte
+    rewrite.write_atomic(pyproject_toml_path, rewrite.set_pyproject_version(content, new_version))
 
     return True
 
 
 def bump_package_json(package_json, new_version) -> bool:
-    with open(package_json, "r") as f:
-        data = json.load(f)
+    content = pathlib.Path(package_json).read_bytes()
+    old_version = rewrite.read_package_json_version(content)
 
-    old_version = data["version"]
-    compare = semver.compare(old_version, new_version)
+    compare = semver.Version.compare(semver.Version.parse(old_version), semver.Version.parse(new_version))
     if compare == 1:
         raise ValueError(f"New version {new_version} is less than old version {old_version}")
     elif compare == 0:
         print("No version change")
         return False
 
-    data["version"] = new_version
-    with open(package_json, "w") as f:
-        json.dump(data, f, indent=2)
+    rewrite.write_atomic(package_json, rewrite.set_package_json_version(content, new_version))
 
     return True
@@ -1,26 +1,180 @@
-import requests
+import re
+import threading
+from collections.abc import Iterable, Iterator
 
-from bumpyproject.versions import get_latest_version_from_list_of_versions_by_numeric_sorting
+from bumpyproject.http_cache import cached_get, cached_stream
+from bumpyproject.json_stream import iter_members
+from bumpyproject.log_utils import logger
+from bumpyproject.versions import get_latest_version_from_list_of_versions_by_numeric_sorting, latest_version
 
+# PEP 691: the JSON form of the simple repository API
+SIMPLE_JSON_TYPE = "application/vnd.pypi.simple.v1+json"
+_SDIST_SUFFIXES = (".tar.gz", ".tar.bz2", ".tgz", ".zip")
+
+# Simple index pages that turned out to serve no JSON, they are not asked again by this process
+_no_simple_json: set[str] = set()
+_no_simple_json_lock = threading.Lock()
+
+
+def get_latest_pypi_version(pypi_url, timeout=None) -> str:
+    """URL to the JSON API of the PyPI package, for example https://pypi.org/pypi/ada-py/json, or to the project
+    page of a simple index (PyPI, a private index or a mirror), for example https://pypi.org/simple/ada-py/
+
+    The JSON form of the simple index (PEP 691) is preferred, which lists the versions (PEP 700) or at least the
+    file names in one small response. The legacy JSON API, which contains the metadata of every release file, is the
+    fallback for indexes that do not support it."""
+    simple_url, json_url = pypi_urls(pypi_url)
+
+    if simple_url is not None:
+        versions = get_simple_index_versions(simple_url, timeout)
+        if versions is not None:
+            return latest_version(versions)
 
-def get_latest_pypi_version(pypi_url) -> str:
-    """URL to the JSON API of the PyPI package. For example: https://pypi.org/pypi/ada-py/json"""
     # Make a GET request to the URL
-    response = requests.get(pypi_url)
+    response = cached_get(json_url, timeout=timeout)
     data = response.json()
 
-    latest_version = get_latest_version_from_list_of_versions_by_numeric_sorting(list(data["releases"].keys()))
+    return get_latest_version_from_list_of_versions_by_numeric_sorting(list(data["releases"].keys()))
 
-    return latest_version
 
+def normalize_project_name(name: str) -> str:
+    """PEP 503 normalization"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def pypi_urls(pypi_url: str) -> tuple[str | None, str | None]:
+    """The simple index page and the legacy JSON API URL of a package, None where they cannot be derived."""
+    url = pypi_url.split("?", 1)[0].rstrip("/")
+    legacy = re.fullmatch(r"(?P<base>.+)/pypi/(?P<name>[^/]+)(?:/json)?", url)
+    if legacy is not None:
+        return f"{legacy['base']}/simple/{normalize_project_name(legacy['name'])}/", pypi_url
+
+    simple = re.fullmatch(r"(?P<base>.+)/simple/(?P<name>[^/]+)", url)
+    if simple is not None:
+        return f"{url}/", f"{simple['base']}/pypi/{simple['name']}/json"
+
+    return None, pypi_url
+
+
+def get_simple_index_versions(simple_url: str, timeout=None) -> list[str] | None:
+    """The versions listed on the project page of a simple index, or None if the index does not serve JSON."""
+    import requests
+
+    with _no_simple_json_lock:
+        if simple_url in _no_simple_json:
+            return None
+
+    headers = {"Accept": SIMPLE_JSON_TYPE, "Accept-Encoding": "gzip"}
+    try:
+        response = cached_get(simple_url, headers=headers, timeout=timeout)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code not in (404, 406):
+            raise
+        # Not found (yet): the project may be published later, so the page is asked again next time
+        if e.response.status_code == 404:
+            return None
+        # The index cannot serve JSON (406 Not Acceptable)
+        response = None
+
+    if response is None or not response.headers.get("Content-Type", "").startswith(SIMPLE_JSON_TYPE):
+        with _no_simple_json_lock:
+            _no_simple_json.add(simple_url)
+        return None
 
-def get_latest_conda_version(conda_url) -> str:
-    """URL to the JSON API of the Conda package. For example: https://api.anaconda.org/package/krande/ada-py"""
-    # Make a GET request to the URL
-    response = requests.get(conda_url)
     data = response.json()
+    # PEP 700 (api-version 1.1)
+    if "versions" in data:
+        return list(data["versions"])
+
+    name = normalize_project_name(data.get("name", simple_url.rstrip("/").rsplit("/", 1)[-1]))
+    versions = {_version_from_filename(file["filename"], name) for file in data.get("files", [])}
+    return sorted(v for v in versions if v is not None)
+
+
+def _version_from_filename(filename: str, name: str) -> str | None:
+    if filename.endswith(".whl"):
+        # {distribution}-{version}(-{build})?-{python}-{abi}-{platform}.whl, the distribution has no dashes
+        parts = filename[: -len(".whl")].split("-")
+        return parts[1] if len(parts) >= 5 else None
+
+    for suffix in _SDIST_SUFFIXES:
+        if filename.endswith(suffix):
+            stem = filename[: -len(suffix)]
+            # The project name may contain dashes, the version does not
+            if normalize_project_name(stem.rsplit("-", 1)[0]) == name:
+                return stem.rsplit("-", 1)[1]
+    return None
+
+
+def get_latest_conda_version(conda_url, timeout=None, package_name=None) -> str:
+    """URL to the JSON API of the Conda package. For example: https://api.anaconda.org/package/krande/ada-py
+
+    The URL may also point to the repodata.json or repodata.json.zst of a channel's subdir, see
+    `get_latest_repodata_version`."""
+    if is_repodata_url(conda_url):
+        return get_latest_repodata_version(conda_url, package_name, timeout)
+
+    # The document lists every file of every build, only the versions are picked from it while it is downloaded
+    stream = cached_stream(conda_url, timeout=timeout)
+    files = iter_members(stream, {"files"})
+    version = latest_version(_unique(file["version"] for _, file in files))
+    _read_to_end(stream)
+    return version
+
+
+def is_repodata_url(url: str) -> bool:
+    return url.split("?", 1)[0].endswith(("/repodata.json", "/repodata.json.zst"))
+
+
+def _split_zst(url: str) -> tuple[str, bool]:
+    """The URL without a .zst suffix on its path (the query is kept), and whether it had one."""
+    path, separator, query = url.partition("?")
+    if path.endswith(".zst"):
+        return path.removesuffix(".zst") + separator + query, True
+    return url, False
+
+
+def get_latest_repodata_version(repodata_url, package_name, timeout=None) -> str:
+    """The latest version of package_name in the repodata of a channel's subdir. For example:
+    https://conda.anaconda.org/krande/noarch/repodata.json.zst
+
+    Reading repodata.json.zst requires the zstandard package, without it the uncompressed repodata.json next to it
+    is read instead."""
+    if package_name is None:
+        raise ValueError(f"The package name is needed to look up its version in {repodata_url}")
+
+    chunks = None
+    uncompressed_url, compressed = _split_zst(repodata_url)
+    if compressed:
+        try:
+            import zstandard
+        except ImportError:
+            logger.info("zstandard is not installed, reading the uncompressed repodata.json")
+            repodata_url = uncompressed_url
+        else:
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+            stream = cached_stream(repodata_url, timeout=timeout)
+            chunks = (decompressor.decompress(chunk) for chunk in stream)
+
+    if chunks is None:
+        stream = chunks = cached_stream(repodata_url, timeout=timeout)
+
+    records = iter_members(chunks, {"packages", "packages.conda"})
+    version = latest_version(_unique(record["version"] for _, (_, record) in records if record["name"] == package_name))
+    _read_to_end(stream)
+    return version
+
+
+def _read_to_end(stream: Iterator[bytes]):
+    """Parsing stops once the members that are needed were read. The rest of the document is still downloaded, but not
+    parsed, because `cached_stream` only stores a document that is read to the end."""
+    for _ in stream:
+        pass
 
-    versions = [file["version"] for file in data["files"]]
-    latest_conda_version = get_latest_version_from_list_of_versions_by_numeric_sorting(versions)
 
-    return latest_conda_version
+def _unique(versions: Iterable[str]) -> Iterator[str]:
+    seen = set()
+    for version in versions:
+        if version not in seen:
+            seen.add(version)
+            yield version
@@ -0,0 +1,199 @@
+"""Rewrite the version of pyproject.toml and package.json files in place.
+
+Instead of parsing the whole document and serialising it again, the byte span of the version value is located with a
+single scan and only that span is replaced. Everything else in the file, formatting and comments included, is kept
+byte for byte. Files the scanner does not understand (e.g. a version set with a dotted key or an inline table) fall
+back to a full parse with tomlkit or json.
+
+Set BUMPY_VALIDATE_REWRITE=1 to parse every rewritten document and check that it yields the new version before it is
+written."""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import pathlib
+import re
+import stat
+import tempfile
+from dataclasses import dataclass
+
+from bumpyproject import env_vars as env
+
+
+class RewriteError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class VersionSpan:
+    """The byte offsets of a version value, without its quotes."""
+
+    start: int
+    end: int
+
+    def value(self, content: bytes) -> str:
+        return content[self.start : self.end].decode("utf-8")
+
+
+_TOML_TABLE_HEADER = re.compile(rb"^[ \t]*\[", re.MULTILINE)
+_TOML_PROJECT_HEADER = re.compile(rb"^[ \t]*\[[ \t]*project[ \t]*\][ \t]*(?:#[^\n]*)?\r?$", re.MULTILINE)
+_TOML_VERSION = re.compile(rb"""^[ \t]*(?:version|"version")[ \t]*=[ \t]*(?:"([^"\\\n]*)"|'([^'\n]*)')""", re.MULTILINE)
+
+_TOML_STRING_OR_COMMENT = re.compile(
+    rb'"""(?:[^"\\]|\\.|"(?!""))*"{3,5}|\'\'\'.*?\'{3,5}|"(?:[^"\\\n]|\\.)*"|\'[^\'\n]*\'|#[^\n]*',
+    re.DOTALL,
+)
+_TRIPLE_QUOTES = (b'"""', b"'''")
+
+_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]:]')
+
+
+def find_pyproject_version(content: bytes) -> VersionSpan | None:
+    """Find `version = "..."` in the [project] table. Returns None if it is not set in that simple form."""
+    strings = _multiline_string_spans(content)
+
+    def outside_strings(matches):
+        return [m for m in matches if not _is_inside(m.start(), strings)]
+
+    headers = outside_strings(_TOML_PROJECT_HEADER.finditer(content))
+    if len(headers) == 0:
+        return None
+    header = headers[0]
+
+    next_headers = outside_strings(_TOML_TABLE_HEADER.finditer(content, header.end()))
+    table_end = len(content) if len(next_headers) == 0 else next_headers[0].start()
+
+    matches = outside_strings(_TOML_VERSION.finditer(content, header.end(), table_end))
+    # More than one match is invalid TOML, let the parser report it
+    if len(matches) != 1:
+        return None
+
+    group = 1 if matches[0].group(1) is not None else 2
+    return VersionSpan(matches[0].start(group), matches[0].end(group))
+
+
+def _multiline_string_spans(content: bytes) -> list[tuple[int, int]]:
+    """The (start, end) offsets of the multi-line strings, in which lines that look like keys or headers are text."""
+    if b'"""' not in content and b"'''" not in content:
+        return []
+
+    # Strings and comments are matched from the start of the document, so quotes inside them are skipped over
+    tokens = _TOML_STRING_OR_COMMENT.finditer(content)
+    return [(m.start(), m.end()) for m in tokens if m.group().startswith(_TRIPLE_QUOTES)]
+
+
+def _is_inside(pos: int, spans: list[tuple[int, int]]) -> bool:
+    i = bisect.bisect_right(spans, (pos, float("inf"))) - 1
+    return i >= 0 and spans[i][0] <= pos < spans[i][1]
+
+
+def find_package_json_version(content: bytes) -> VersionSpan | None:
+    """Find the string value of the top level "version" key."""
+    depth = 0
+    tokens = _JSON_TOKEN.finditer(content)
+    previous = None
+    for token in tokens:
+        text = token.group()
+        if text in (b"{", b"["):
+            depth += 1
+        elif text in (b"}", b"]"):
+            depth -= 1
+        elif text == b":" and depth == 1 and previous is not None and previous.group() == b'"version"':
+            value = next(tokens, None)
+            # Only replace string values that directly follow the colon
+            if value is None or not value.group().startswith(b'"') or content[token.end() : value.start()].strip():
+                return None
+            return VersionSpan(value.start() + 1, value.end() - 1)
+        previous = token
+
+    return None
+
+
+def read_pyproject_version(content: bytes) -> str:
+    span = find_pyproject_version(content)
+    if span is not None:
+        return span.value(content)
+
+    import tomlkit
+
+    return str(tomlkit.parse(content.decode("utf-8"))["project"]["version"])
+
+
+def read_package_json_version(content: bytes) -> str:
+    span = find_package_json_version(content)
+    if span is not None and b"\\" not in content[span.start : span.end]:
+        return span.value(content)
+
+    return json.loads(content)["version"]
+
+
+def set_pyproject_version(content: bytes, new_version: str, validate: bool | None = None) -> bytes:
+    span = find_pyproject_version(content)
+    if span is not None and not re.search(r"[\"'\\\n]", new_version):
+        new_content = content[: span.start] + new_version.encode("utf-8") + content[span.end :]
+    else:
+        import tomlkit
+
+        toml_data = tomlkit.parse(content.decode("utf-8"))
+        toml_data["project"]["version"] = new_version
+        new_content = tomlkit.dumps(toml_data).encode("utf-8")
+
+    if env.VALIDATE_REWRITE if validate is None else validate:
+        _validate(new_content, "toml", new_version)
+    return new_content
+
+
+def set_package_json_version(content: bytes, new_version: str, validate: bool | None = None) -> bytes:
+    span = find_package_json_version(content)
+    if span is not None:
+        # json.dumps escapes the value the same way the json module would have written it
+        new_content = content[: span.start] + json.dumps(new_version)[1:-1].encode("utf-8") + content[span.end :]
+    else:
+        data = json.loads(content)
+        data["version"] = new_version
+        new_content = json.dumps(data, indent=2).encode("utf-8")
+
+    if env.VALIDATE_REWRITE if validate is None else validate:
+        _validate(new_content, "json", new_version)
+    return new_content
+
+
+def read_version_with_parser(content: bytes, kind: str) -> str:
+    """Read the version with a full parse of the document."""
+    if kind == "json":
+        return json.loads(content)["version"]
+
+    import tomlkit
+
+    return str(tomlkit.parse(content.decode("utf-8"))["project"]["version"])
+
+
+def _validate(content: bytes, kind: str, expected: str):
+    try:
+        actual = read_version_with_parser(content, kind)
+    except Exception as e:
+        raise RewriteError(f"The rewritten document cannot be parsed: {e}") from e
+
+    if actual != expected:
+        raise RewriteError(f"The rewritten document has version {actual!r} instead of {expected!r}")
+
+
+def write_atomic(path: str | pathlib.Path, content: bytes):
+    """Replace the file with a temp file + rename so readers never see a partially written file.
+
+    The permissions of the existing file are kept."""
+    path = pathlib.Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        try:
+            os.chmod(tmp_name, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import functools
+import os
+import pathlib
+import re
+import tempfile
+from dataclasses import dataclass, field
+
+import tomlkit
+
+from bumpyproject import discovery
+from bumpyproject.versions import make_pep440_compatible
+
+CHUNK_SIZE = 1024 * 1024
+# Matches must end within this many characters after the end of a chunk's last complete line
+MAX_MATCH_SIZE = 64 * 1024
+
+_NUMBERED_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+_LEADING_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+# Escapes are matched too, so that an escaped "(" is not taken for the start of a group
+_GROUP_NAME = re.compile(r"\\.|\(\?P<(\w+)>|\(\?\((\w+)\)", re.DOTALL)
+
+
+class SubstitutionError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SubstitutionRule:
+    """Replace the first group of `pattern` (or the whole match if it has no groups) in the files matching `glob`.
+
+    The glob is relative to the root directory; `**` matches any number of directories. `format` is "semver" or
+    "pep440" and selects how the new version is written."""
+
+    glob: str
+    pattern: str
+    format: str = "semver"
+
+    def __post_init__(self):
+        if self.format not in ("semver", "pep440"):
+            raise SubstitutionError(f"Unknown version format {self.format!r} of substitution {self.pattern!r}")
+        if _NUMBERED_BACKREFERENCE.search(self.pattern):
+            raise SubstitutionError(f"Backreferences are not supported in substitution patterns: {self.pattern!r}")
+        try:
+            re.compile(self.pattern)
+            # The form the pattern takes when it is combined with the other rules of a file
+            re.compile(combinable_pattern(self.pattern, 0))
+        except re.error as e:
+            raise SubstitutionError(f"Invalid substitution pattern {self.pattern!r}: {e}") from e
+
+    def format_version(self, version: str) -> str:
+        return make_pep440_compatible(version) if self.format == "pep440" else version
+
+    @functools.cached_property
+    def glob_regex(self) -> re.Pattern:
+        return glob_to_regex(self.glob)
+
+
+@dataclass
+class SubstitutionMatch:
+    path: pathlib.Path
+    line: int
+    rule: SubstitutionRule
+    old: str
+    new: str
+
+
+@dataclass
+class FileSubstitution:
+    path: pathlib.Path
+    matches: list[SubstitutionMatch] = field(default_factory=list)
+    # (first line, old lines, new lines) of every changed region
+    hunks: list[tuple[int, str, str]] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def changed(self) -> bool:
+        return any(m.old != m.new for m in self.matches)
+
+
+@dataclass
+class SubstitutionReport:
+    root_dir: pathlib.Path
+    files: list[FileSubstitution] = field(default_factory=list)
+
+    @property
+    def matches(self) -> list[SubstitutionMatch]:
+        return [m for f in self.files for m in f.matches]
+
+    @property
+    def changed_paths(self) -> list[pathlib.Path]:
+        return [f.path for f in self.files if f.changed and f.error is None]
+
+    def format(self) -> str:
+        lines = []
+        for f in self.files:
+            rel_path = f.path.relative_to(self.root_dir).as_posix()
+            if f.error is not None:
+                lines.append(f"{rel_path}: skipped ({f.error})")
+            for m in f.matches:
+                lines.append(f"{rel_path}:{m.line}: {m.old} -> {m.new}")
+        return "\n".join(lines)
+
+    def diff(self) -> str:
+        """The changes as a unified diff (without context lines)."""
+        lines = []
+        for f in self.files:
+            if not f.hunks:
+                continue
+            rel_path = f.path.relative_to(self.root_dir).as_posix()
+            lines += [f"--- a/{rel_path}", f"+++ b/{rel_path}"]
+            for line_no, old, new in f.hunks:
+                old_lines, new_lines = old.splitlines(), new.splitlines()
+                lines.append(f"@@ -{line_no},{len(old_lines)} +{line_no},{len(new_lines)} @@")
+                lines += [f"-{x}" for x in old_lines] + [f"+{x}" for x in new_lines]
+        return "\n".join(lines)
+
+
+def glob_to_regex(glob: str) -> re.Pattern:
+    """Translate a glob with `**` support to a regex matching posix paths relative to the root directory."""
+    parts = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif glob[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif glob[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif glob[i] == "[" and "]" in glob[i + 1 :]:
+            end = glob.index("]", i + 1)
+            parts.append("[" + glob[i + 1 : end].replace("!", "^", 1) + "]")
+            i = end + 1
+        else:
+            parts.append(re.escape(glob[i]))
+            i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+def load_substitution_rules(pyproject_toml: str | pathlib.Path) -> list[SubstitutionRule]:
+    """Read the rules listed as [[tool.bumpy.substitutions]] in pyproject.toml.
+
+    Each rule has a `glob` (a string or a list of strings), a `pattern` and optionally a `format`."""
+    with open(pyproject_toml, mode="r") as fp:
+        toml_data = tomlkit.load(fp)
+
+    rules = []
+    for entry in toml_data.get("tool", {}).get("bumpy", {}).get("substitutions", []):
+        globs = entry["glob"]
+        for glob in [globs] if isinstance(globs, str) else globs:
+            rules.append(SubstitutionRule(str(glob), str(entry["pattern"]), str(entry.get("format", "semver"))))
+
+    return rules
+
+
+def combinable_pattern(pattern: str, index: int) -> str:
+    """The pattern as alternative `index` of a combined regex, in the named group `_rule<index>`.
+
+    Leading global flags such as `(?i)` are scoped to the alternative and named groups are prefixed with the
+    alternative's name, so that rules reusing a group name can be combined."""
+    flags = ""
+    while match := _LEADING_FLAGS.match(pattern):
+        flags += "".join(flag for flag in match.group(1) if flag not in flags)
+        pattern = pattern[match.end() :]
+
+    def rename(match: re.Match) -> str:
+        if match.group(1) is not None:
+            return f"(?P<_rule{index}_{match.group(1)}>"
+        if match.group(2) is not None and not match.group(2).isdigit():
+            return f"(?(_rule{index}_{match.group(2)})"
+        return match.group(0)
+
+    pattern = _GROUP_NAME.sub(rename, pattern)
+    if flags:
+        pattern = f"(?{flags}:{pattern})"
+    return f"(?P<_rule{index}>{pattern})"
+
+
+class CombinedMatcher:
+    """All patterns that apply to a file compiled into one alternation, so a file is scanned once for every rule."""
+
+    def __init__(self, rules: tuple[SubstitutionRule, ...]):
+        self.rules = rules
+        alternatives = [combinable_pattern(rule.pattern, i) for i, rule in enumerate(rules)]
+        try:
+            self.regex = re.compile("|".join(alternatives), flags=re.MULTILINE)
+        except re.error as e:
+            raise SubstitutionError(f"Substitution patterns cannot be combined: {e}") from e
+
+        # The group holding the version of each rule: its first own group, or the whole alternative
+        self._groups = []
+        for i, rule in enumerate(rules):
+            outer = self.regex.groupindex[f"_rule{i}"]
+            self._groups.append(outer + 1 if re.compile(rule.pattern).groups > 0 else outer)
+
+    def rule_of(self, match: re.Match) -> tuple[SubstitutionRule, int]:
+        # The outer group of an alternative closes last, so it is always the match's lastgroup
+        i = int(match.lastgroup[len("_rule") :])
+        return self.rules[i], self._groups[i]
+
+
+@functools.lru_cache(maxsize=64)
+def _combined_matcher(rules: tuple[SubstitutionRule, ...]) -> CombinedMatcher:
+    return CombinedMatcher(rules)
+
+
+def find_target_files(root_dir: pathlib.Path, rules: list[SubstitutionRule]) -> dict[pathlib.Path, tuple]:
+    """Map every file below root_dir to the rules whose glob matches it, walking the tree once."""
+    targets = {}
+    for rel_path in discovery.iter_files(root_dir):
+        matching = tuple(rule for rule in rules if rule.glob_regex.match(rel_path))
+        if matching:
+            targets[root_dir / rel_path] = matching
+    return targets
+
+
+def substitute_file(
+    path: pathlib.Path,
+    rules: tuple[SubstitutionRule, ...],
+    new_version: str,
+    dry_run=False,
+    chunk_size=CHUNK_SIZE,
+    max_match_size=MAX_MATCH_SIZE,
+) -> FileSubstitution:
+    """Apply the rules to the file in a single streaming pass.
+
+    The file is read in chunks of whole lines and the result is streamed to a temp file which replaces the file if
+    anything changed."""
+    matcher = _combined_matcher(rules)
+    result = FileSubstitution(path)
+    tmp_file = None
+    try:
+        if not dry_run:
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+            tmp_file = os.fdopen(fd, "w", encoding="utf-8", newline="")
+
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            buffer = ""
+            line_no = 1
+            at_eof = False
+            while not at_eof:
+                chunk = f.read(chunk_size)
+                at_eof = chunk == ""
+                buffer += chunk
+                if at_eof:
+                    limit = len(buffer)
+                else:
+                    # Only matches starting before the last line break that is far enough from the end are final
+                    limit = buffer.rfind("\n", 0, max(0, len(buffer) - max_match_size)) + 1
+                    if limit == 0:
+                        continue
+
+                output, consumed = _substitute_buffer(buffer, limit, line_no, matcher, new_version, result)
+                if tmp_file is not None:
+                    tmp_file.write(output)
+                line_no += buffer.count("\n", 0, consumed)
+                buffer = buffer[consumed:]
+
+        if tmp_file is not None:
+            tmp_file.close()
+            if result.changed:
+                os.chmod(tmp_name, os.stat(path).st_mode & 0o7777)
+                os.replace(tmp_name, path)
+    except UnicodeDecodeError as e:
+        result.error = f"not a text file: {e.reason}"
+        result.matches.clear()
+        result.hunks.clear()
+    finally:
+        if tmp_file is not None and not tmp_file.closed:
+            tmp_file.close()
+        # The temp file is left over if it did not replace the file
+        if tmp_file is not None and os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+    return result
+
+
+def _substitute_buffer(buffer, limit, line_no, matcher, new_version, result) -> tuple[str, int]:
+    """Replace the matches starting before limit. Returns the new text and the number of characters consumed."""
+    parts = []
+    last = 0
+    consumed = limit
+    hunk_start = hunk_end = None
+    hunk_parts = []
+
+    def close_hunk():
+        old = buffer[hunk_start:hunk_end]
+        new = "".join(hunk_parts) + buffer[last:hunk_end]
+        if old != new:
+            result.hunks.append((line_no + buffer.count("\n", 0, hunk_start), old, new))
+
+    for match in matcher.regex.finditer(buffer):
+        # A match that ends past limit extends the consumed part, and the matches that start in it are final too
+        if match.start() >= consumed:
+            break
+        rule, group = matcher.rule_of(match)
+        start, end = match.span(group)
+        if start < 0:
+            continue
+
+        old = buffer[start:end]
+        new = rule.format_version(new_version)
+        result.matches.append(SubstitutionMatch(result.path, line_no + buffer.count("\n", 0, start), rule, old, new))
+
+        # The lines around the match make up a diff hunk, matches on adjacent lines share one
+        line_start = buffer.rfind("\n", 0, start) + 1
+        line_end = buffer.find("\n", end)
+        line_end = len(buffer) if line_end < 0 else line_end
+        if hunk_start is not None and line_start > hunk_end + 1:
+            close_hunk()
+            hunk_start = None
+        if hunk_start is None:
+            hunk_start, hunk_parts = line_start, [buffer[line_start:start]]
+        else:
+            hunk_parts.append(buffer[last:start])
+        hunk_end = max(line_end, end)
+        hunk_parts.append(new)
+
+        parts += [buffer[last:start], new]
+        last = end
+        if match.end() > consumed:
+            # The next buffer has to start at a line start for ^ and lookbehinds, and for the line numbers
+            next_line = buffer.find("\n", match.end() - 1) + 1
+            consumed = next_line if next_line > 0 else len(buffer)
+
+    if hunk_start is not None:
+        close_hunk()
+
+    parts.append(buffer[last:consumed])
+    return "".join(parts), consumed
+
+
+def apply_substitutions(
+    root_dir: str | pathlib.Path,
+    rules: list[SubstitutionRule],
+    new_version: str,
+    dry_run=False,
+) -> SubstitutionReport:
+    root_dir = pathlib.Path(root_dir).resolve()
+    report = SubstitutionReport(root_dir)
+    if len(rules) == 0:
+        return report
+
+    for path, file_rules in sorted(find_target_files(root_dir, rules).items()):
+        report.files.append(substitute_file(path, file_rules, new_version, dry_run=dry_run))
+    return report
@@ -0,0 +1,152 @@
+"""An index of the version tags of a repository.
+
+The tag names are read straight from packed-refs and the loose refs below refs/tags instead of creating a GitPython
+reference per tag. Repositories with the reftable backend are read with `git for-each-ref`. The names are parsed
+and sorted by version once, so the latest, the latest stable and the latest tag of a release series are lookups.
+
+Indexes are cached per repository and rebuilt when packed-refs or a directory below refs/tags changes, i.e. when a
+tag is created, deleted or packed."""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import subprocess
+import threading
+from operator import itemgetter
+
+from bumpyproject.versions import parse_version
+
+_cache: dict[tuple[pathlib.Path, str], tuple[tuple, TagIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+class TagIndex:
+    """The tags named `<prefix><version>` sorted by version. Tags whose remainder is not a version are ignored."""
+
+    def __init__(self, tag_names, prefix=""):
+        self.prefix = prefix
+        entries = []
+        for name in tag_names:
+            if not name.startswith(prefix):
+                continue
+            try:
+                version = parse_version(name[len(prefix) :])
+            except ValueError:
+                continue
+            entries.append((version.key, version, name))
+        # Sorting by the precomputed keys alone is much faster than hashing or comparing Version instances
+        entries.sort(key=itemgetter(0, 2))
+
+        self._names: list[str] = []
+        self._latest_stable = None
+        self._latest_in_series: dict[tuple, str] = {}
+        last_key = None
+        for key, version, name in entries:
+            # Of tags with the same version (e.g. with different build metadata) the last name wins
+            if key == last_key:
+                self._names[-1] = name
+            else:
+                self._names.append(name)
+            last_key = key
+
+            if version.prerelease is None:
+                self._latest_stable = name
+            self._latest_in_series[(version.major,)] = name
+            self._latest_in_series[(version.major, version.minor)] = name
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def names(self) -> list[str]:
+        """The tag names, oldest version first."""
+        return list(self._names)
+
+    def latest(self) -> str | None:
+        return self._names[-1] if self._names else None
+
+    def latest_stable(self) -> str | None:
+        """The latest tag that is not a pre-release."""
+        return self._latest_stable
+
+    def latest_in_series(self, major: int, minor: int | None = None) -> str | None:
+        """The latest tag with the major version, or the major and minor version if minor is given."""
+        series = (major,) if minor is None else (major, minor)
+        return self._latest_in_series.get(series)
+
+
+def _common_dir(git_dir: pathlib.Path) -> pathlib.Path:
+    """The directory holding the refs, which is shared by all worktrees."""
+    common_dir_file = git_dir / "commondir"
+    if common_dir_file.exists():
+        return (git_dir / common_dir_file.read_text().strip()).resolve()
+    return git_dir
+
+
+def _signature(common_dir: pathlib.Path) -> tuple:
+    """Changes whenever a tag is created, deleted or packed: adding or removing a loose ref changes the mtime of its
+    directory and `git pack-refs` rewrites packed-refs."""
+    entries = []
+    for path in (common_dir / "packed-refs", common_dir / "reftable"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((path.name, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+
+    for dir_path, _, _ in os.walk(common_dir / "refs" / "tags"):
+        entries.append((dir_path, os.stat(dir_path).st_mtime_ns))
+
+    return tuple(entries)
+
+
+def read_tag_names(common_dir: pathlib.Path) -> list[str]:
+    if (common_dir / "reftable").is_dir():
+        result = subprocess.run(
+            ["git", "for-each-ref", "--format=%(refname:strip=2)", "refs/tags/"],
+            cwd=common_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.splitlines()
+
+    names = set()
+    try:
+        with open(common_dir / "packed-refs", "rb") as f:
+            for line in f:
+                # Lines are "<sha> <ref>", "^<sha>" (the commit of the tag above) or a "#" header
+                _, _, ref = line.rstrip(b"\n").partition(b" ")
+                if ref.startswith(b"refs/tags/"):
+                    names.add(ref[len(b"refs/tags/") :].decode("utf-8", errors="surrogateescape"))
+    except FileNotFoundError:
+        pass
+
+    tags_dir = common_dir / "refs" / "tags"
+    for dir_path, _, file_names in os.walk(tags_dir):
+        rel_dir = pathlib.Path(dir_path).relative_to(tags_dir)
+        for file_name in file_names:
+            # A ref that is being written by a concurrent git process
+            if file_name.endswith(".lock"):
+                continue
+            names.add((rel_dir / file_name).as_posix())
+
+    return list(names)
+
+
+def get_tag_index(git_dir: str | pathlib.Path, prefix="") -> TagIndex:
+    """The tag index of the repository, built again only if its tags changed since the last call."""
+    common_dir = _common_dir(pathlib.Path(git_dir).resolve())
+    signature = _signature(common_dir)
+    key = (common_dir, prefix)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    index = TagIndex(read_tag_names(common_dir), prefix)
+    with _cache_lock:
+        _cache[key] = (signature, index)
+    return index
@@ -0,0 +1,136 @@
+"""Light-weight tracing of the phases of a bump run.
+
+Spans are no-ops until `enable()` is called, so they can stay in production code:
+
+    with tracing.span("git.commit", files=2):
+        ...
+
+    @tracing.traced("registry.pypi")
+    def get_latest_pypi_version(...):
+        ...
+
+The tracer is kept in a context variable, so the concurrent commands of the daemon each record their own spans.
+Worker threads see it when they run in a copy of the context (`helpers.map_in_context`, `helpers.run_concurrently`).
+
+The recorded spans are exported in the Chrome trace event format (chrome://tracing, https://ui.perfetto.dev) and
+summarised per span name."""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import pathlib
+import threading
+import time
+from dataclasses import dataclass, field
+
+_tracer: contextvars.ContextVar[Tracer | None] = contextvars.ContextVar("tracer", default=None)
+_no_span = contextlib.nullcontext()
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    args: dict = field(default_factory=dict)
+
+
+class Tracer:
+    def __init__(self, clock=time.perf_counter_ns):
+        self._clock = clock
+        self.origin_ns = clock()
+        self.spans: list[SpanRecord] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            # list.append is atomic, spans may be recorded from worker threads
+            self.spans.append(SpanRecord(name, start, self._clock() - start, threading.get_ident(), args))
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": (s.start_ns - self.origin_ns) / 1000,
+                "dur": s.duration_ns / 1000,
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": {key: str(value) for key, value in s.args.items()},
+            }
+            for s in sorted(self.spans, key=lambda s: s.start_ns)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str | pathlib.Path):
+        pathlib.Path(path).write_text(json.dumps(self.chrome_trace()))
+
+    def summary(self) -> list[tuple[str, int, float, float]]:
+        """Return (name, count, total ms, max ms) per span name, slowest first."""
+        totals: dict[str, list] = {}
+        for s in self.spans:
+            entry = totals.setdefault(s.name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += s.duration_ns
+            entry[2] = max(entry[2], s.duration_ns)
+
+        rows = [(name, count, total / 1e6, longest / 1e6) for name, (count, total, longest) in totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def format_summary(self) -> str:
+        rows = self.summary()
+        width = max([len("span"), *(len(row[0]) for row in rows)])
+        lines = [f"{'span':<{width}}  {'count':>5}  {'total ms':>10}  {'max ms':>10}"]
+        for name, count, total_ms, max_ms in rows:
+            lines.append(f"{name:<{width}}  {count:>5}  {total_ms:>10.1f}  {max_ms:>10.1f}")
+        return "\n".join(lines)
+
+
+def enable(tracer: Tracer | None = None) -> Tracer:
+    tracer = tracer or Tracer()
+    _tracer.set(tracer)
+    return tracer
+
+
+def disable() -> Tracer | None:
+    tracer = _tracer.get()
+    _tracer.set(None)
+    return tracer
+
+
+def is_enabled() -> bool:
+    return _tracer.get() is not None
+
+
+def span(name: str, **args):
+    """Time the enclosed block. Costs a context variable lookup when tracing is off."""
+    tracer = _tracer.get()
+    if tracer is None:
+        return _no_span
+    return tracer.span(name, **args)
+
+
+def traced(name: str):
+    """Decorator version of `span`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer.get()
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,9 +1,29 @@
-from enum import Enum
+from __future__ import annotations
 
-import semver
+import heapq
+import re
+from collections.abc import Iterable
+from enum import Enum
+from functools import lru_cache
 
 from bumpyproject import env_vars as env
 
+_SEMVER_REGEX = re.compile(
+    r"""
+    ^(?P<major>0|[1-9]\d*)\.(?P<minor>0|[1-9]\d*)\.(?P<patch>0|[1-9]\d*)
+    (?:-(?P<prerelease>
+        (?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*)
+        (?:\.(?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*))*
+    ))?
+    (?:\+(?P<build>[0-9a-zA-Z-]+(?:\.[0-9a-zA-Z-]+)*))?
+    \Z
+    """,
+    re.VERBOSE,
+)
+
+# Sorts a release after all of its pre-releases
+_RELEASE_KEY = (1,)
+
 
 class BumpLevel(str, Enum):
     MAJOR = "major"
@@ -24,14 +44,149 @@ class BumpLevel(str, Enum):
         return result
 
 
-def get_latest_version_from_list_of_versions_by_numeric_sorting(versions: list[str]) -> str:
-    latest_version = make_semver_compatible(versions[0])
-    for ver in versions[1:]:
-        semver_compatible = make_semver_compatible(ver)
-        if semver.compare(semver_compatible, latest_version) == 1:
-            latest_version = semver_compatible
+class Version:
+    """A parsed semantic version which orders like `semver.compare` (build metadata is ignored).
+
+    The comparison key is computed once when parsing, so comparing, hashing and sorting are plain tuple operations.
+    Use `parse_version` to get memoized instances."""
+
+    __slots__ = ("build", "key", "major", "minor", "patch", "prerelease", "text")
+
+    def __init__(self, text: str):
+        match = _SEMVER_REGEX.match(text)
+        if match is None:
+            raise ValueError(f"{text} is not valid SemVer string")
+
+        major, minor, patch, prerelease, build = match.groups()
+        self.text = text
+        self.major = int(major)
+        self.minor = int(minor)
+        self.patch = int(patch)
+        self.prerelease = prerelease
+        self.build = build
+
+        if prerelease is None:
+            pre_key = _RELEASE_KEY
+        else:
+            # Numeric identifiers sort before alphanumeric ones and a shorter set of identifiers sorts first
+            pre_key = (0, tuple([(0, int(x), "") if x.isdigit() else (1, 0, x) for x in prerelease.split(".")]))
+
+        self.key = (self.major, self.minor, self.patch, pre_key)
+
+    @property
+    def is_prerelease(self) -> bool:
+        return self.prerelease is not None
+
+    def to_tuple(self) -> tuple[int, int, int, str | None, str | None]:
+        return self.major, self.minor, self.patch, self.prerelease, self.build
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"Version({self.text!r})"
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key == other.key
+
+    def __lt__(self, other: Version):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key < other.key
+
+    def __le__(self, other: Version):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key <= other.key
+
+    def __gt__(self, other: Version):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key > other.key
+
+    def __ge__(self, other: Version):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key >= other.key
+
 
-    return latest_version
+def parse_version(version: str) -> Version:
+    """The memoized Version of the string. make_semver_compatible depends on RELEASE_TAG, so it is part of the key."""
+    return _parse_version(version, env.RELEASE_TAG)
+
+
+@lru_cache(maxsize=131072)
+def _parse_version(version: str, release_tag: str) -> Version:
+    return Version(make_semver_compatible(version))
+
+
+def _sort_key(version: Version):
+    return version.key
+
+
+def parse_versions(versions: Iterable[str], skip_invalid=False) -> list[Version]:
+    if not skip_invalid:
+        return [parse_version(v) for v in versions]
+
+    parsed = []
+    for ver in versions:
+        try:
+            parsed.append(parse_version(ver))
+        except ValueError:
+            continue
+
+    return parsed
+
+
+def latest_version(versions: Iterable[str], skip_invalid=False) -> str:
+    """The newest of the versions. Iterators are consumed one item at a time, so streamed input is never held in
+    memory as a whole."""
+    latest = None
+    for ver in versions:
+        try:
+            parsed = parse_version(ver)
+        except ValueError:
+            if skip_invalid:
+                continue
+            raise
+        if latest is None or parsed.key > latest.key:
+            latest = parsed
+
+    if latest is None:
+        raise ValueError("No valid versions to choose from")
+
+    return latest.text
+
+
+def top_versions(versions: Iterable[str], k: int, skip_invalid=False) -> list[str]:
+    """The k newest versions, newest first"""
+    return [v.text for v in heapq.nlargest(k, set(parse_versions(versions, skip_invalid)), key=_sort_key)]
+
+
+def latest_versions_per_series(versions: Iterable[str], depth=2, skip_invalid=False) -> dict[tuple, str]:
+    """The newest version of each release series. Series are keyed by (major,) for depth=1 or (major, minor)
+    for depth=2."""
+    latest: dict[tuple, Version] = {}
+    for ver in parse_versions(versions, skip_invalid):
+        series = (ver.major, ver.minor)[:depth]
+        curr = latest.get(series)
+        if curr is None or ver.key > curr.key:
+            latest[series] = ver
+
+    return {series: ver.text for series, ver in sorted(latest.items())}
+
+
+def sort_versions(versions: Iterable[str], reverse=False, skip_invalid=False) -> list[str]:
+    return [v.text for v in sorted(parse_versions(versions, skip_invalid), key=_sort_key, reverse=reverse)]
+
+
+def get_latest_version_from_list_of_versions_by_numeric_sorting(versions: list[str]) -> str:
+    return latest_version(versions)
 
 
 def make_semver_compatible(version: str) -> str:
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import git
+import requests
+
+from bumpyproject import bumper
+from bumpyproject import env_vars as env
+from bumpyproject.git_helper import GitHelper
+from bumpyproject.helpers import find_files_in_subdirectories, get_working_dir, map_in_context
+from bumpyproject.log_utils import logger
+from bumpyproject.project import Project
+
+# The errors that fail a single package. Anything else is a bug and aborts the whole bump
+PACKAGE_ERRORS = (
+    bumper.BumpLevelSizeError,
+    bumper.OutdatedBumpError,
+    bumper.NoVersionChangeError,
+    git.GitCommandError,
+    requests.RequestException,
+    OSError,
+    ValueError,
+)
+
+
+class WorkspaceBumpError(Exception):
+    pass
+
+
+@dataclass
+class PackageBump:
+    name: str
+    pyproject_toml: pathlib.Path
+    old_version: str | None = None
+    new_version: str | None = None
+    status: str = "pending"
+    error: str | None = None
+    duration: float = 0.0
+
+
+class Workspace:
+    """All packages (pyproject.toml files) found below a single git repository.
+
+    The pypi_url and conda_url may contain a "{name}" placeholder which is replaced by each package's name."""
+
+    def __init__(self, root_dir=None, pypi_url=None, conda_url=None, max_workers=None):
+        if root_dir is None:
+            root_dir = get_working_dir()
+
+        self._root_dir = pathlib.Path(root_dir).resolve().absolute()
+        self._git_helper = GitHelper.for_dir(self._root_dir)
+        self._git_lock = threading.Lock()
+        self._max_workers = max_workers
+        self.pypi_url = pypi_url
+        self.conda_url = conda_url
+
+        pyproject_files = find_files_in_subdirectories(self._root_dir, "pyproject.toml")
+        if len(pyproject_files) == 0:
+            raise FileNotFoundError(f"Could not find any pyproject.toml in {self._root_dir}")
+
+        projects = self._map(self._make_project, pyproject_files)
+        self._projects = [project for project, _ in projects]
+        self._names = [name for _, name in projects]
+
+    @property
+    def root_dir(self) -> pathlib.Path:
+        return self._root_dir
+
+    @property
+    def git(self) -> GitHelper:
+        return self._git_helper
+
+    @property
+    def projects(self) -> list[Project]:
+        return self._projects
+
+    def _map(self, func, items) -> list:
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="bumpy-workspace") as executor:
+            return map_in_context(executor, func, items)
+
+    def _make_project(self, pyproject_toml: pathlib.Path) -> tuple[Project, str]:
+        project = Project(
+            self._root_dir,
+            pyproject_toml=pyproject_toml,
+            package_json=pyproject_toml.parent / "package.json",
+            git_helper=self._git_helper,
+        )
+        name = project.get_pyproject_name()
+        if self.pypi_url is not None:
+            project.pypi_url = self.pypi_url.format(name=name)
+        if self.conda_url is not None:
+            project.conda_url = self.conda_url.format(name=name)
+
+        return project, name
+
+    def _plan_package(
+        self, project: Project, name: str, bump_level, check_git: bool, check_current_version: bool
+    ) -> PackageBump:
+        start = time.perf_counter()
+        result = PackageBump(name, project.pyproject_toml_path)
+        try:
+            result.old_version = project.get_pyproject_version()
+            if check_current_version:
+                result.new_version = result.old_version
+            else:
+                result.new_version = bumper.bump_version(result.old_version, bump_level)
+
+            if check_git:
+                # GitPython repo objects are not safe to share between threads
+                with self._git_lock:
+                    project.check_git_history(result.new_version)
+
+            project.check_registries(result.new_version)
+            result.status = "ok"
+        except PACKAGE_ERRORS as e:
+            result.status = "failed"
+            result.error = f"{type(e).__name__}: {e}"
+
+        result.duration = time.perf_counter() - start
+        return result
+
+    def _write_package(self, args: tuple[Project, PackageBump]) -> PackageBump:
+        project, result = args
+        start = time.perf_counter()
+        try:
+            is_bumped = project.write_version(result.new_version)
+            result.status = "bumped" if is_bumped else "unchanged"
+        except PACKAGE_ERRORS as e:
+            result.status = "failed"
+            result.error = f"{type(e).__name__}: {e}"
+
+        result.duration += time.perf_counter() - start
+        return result
+
+    def bump(
+        self,
+        bump_level,
+        check_git=True,
+        ignore_git_state=False,
+        git_push=False,
+        check_current_version=False,
+        dry_run=False,
+    ) -> list[PackageBump]:
+        """Bump every package in the workspace and commit and tag all of them in a single step.
+
+        All packages are checked before any file is rewritten, so a single failing package leaves the tree
+        untouched."""
+        if not ignore_git_state and not check_current_version:
+            scoped = env.DIRTY_CHECK == "scoped"
+            self.git.check_git_state([f for p in self.projects for f in p.version_files] if scoped else None)
+
+        results = self._map(
+            lambda args: self._plan_package(*args, bump_level, check_git, check_current_version),
+            list(zip(self.projects, self._names)),
+        )
+        failed = [r for r in results if r.status == "failed"]
+        if len(failed) > 0:
+            logger.error(format_summary(results))
+            raise WorkspaceBumpError(f"{len(failed)} of {len(results)} packages failed the version checks")
+
+        if check_current_version:
+            logger.info(f"Check complete for {len(results)} packages.")
+            return results
+
+        if dry_run:
+            logger.info(f"Dry run: {len(results)} packages would be bumped.")
+            return results
+
+        results = self._map(self._write_package, list(zip(self.projects, results)))
+        failed = [r for r in results if r.status == "failed"]
+        if len(failed) > 0:
+            logger.error(format_summary(results))
+            raise WorkspaceBumpError(f"{len(failed)} of {len(results)} packages could not be rewritten")
+
+        bumped = [(r.name, r.old_version, r.new_version) for r in results if r.status == "bumped"]
+        if not ignore_git_state and len(bumped) > 0:
+            paths = [f for p, r in zip(self.projects, results) if r.status == "bumped" for f in p.version_files]
+            self.git.commit_and_tag_packages(bumped, paths=paths)
+
+        if git_push:
+            self.git.push()
+
+        return results
+
+
+def format_summary(results: list[PackageBump]) -> str:
+    header = ("package", "old", "new", "status", "seconds")
+    rows = [header]
+    for r in sorted(results, key=lambda x: x.name):
+        rows.append((r.name, r.old_version or "", r.new_version or "", r.error or r.status, f"{r.duration:.3f}"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+
+    return "\n".join(lines)
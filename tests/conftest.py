@@ -10,6 +10,13 @@ import git
 MOCK_PROJ_A_DIR = pathlib.Path(__file__).parent.parent / "files/mock_project_a"
 
 
+@pytest.fixture(autouse=True)
+def bumpy_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "bumpy_cache"
+    monkeypatch.setattr(env, "BUMPY_CACHE_DIR", cache_dir)
+    return cache_dir
+
+
 @pytest.fixture(scope="function")
 def mock_proj_a():
     # Create a temporary directory for the remote repository
@@ -20,8 +27,8 @@ def mock_proj_a():
         # Create a temporary directory for the local repository
         with tempfile.TemporaryDirectory() as local_temp_dir:
             copy_tree(str(MOCK_PROJ_A_DIR), local_temp_dir)
-            os.environ['PYPROJECT_TOML'] = str((pathlib.Path(local_temp_dir) / "pyproject.toml").resolve().absolute())
-            os.environ['GIT_ROOT_DIR'] = local_temp_dir
+            os.environ["PYPROJECT_TOML"] = str((pathlib.Path(local_temp_dir) / "pyproject.toml").resolve().absolute())
+            os.environ["GIT_ROOT_DIR"] = local_temp_dir
 
             # Initialize a new Git repository in the temporary directory
             local_repo = git.Repo.init(local_temp_dir)
@@ -39,3 +46,24 @@ def mock_proj_a():
             local_repo.git.execute(["git", "commit", "-am", "Initial Commit"])
             local_repo.git.push("origin", curr_branch.name, set_upstream=True)
             yield local_temp_dir
+
+
+@pytest.fixture(scope="function")
+def mock_monorepo():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        remote_repo = git.Repo.init(os.path.join(temp_dir, "remote_repo.git"), bare=True)
+        local_dir = pathlib.Path(temp_dir) / "local_repo"
+
+        for i in range(3):
+            package_dir = local_dir / "packages" / f"pkg_{i}"
+            package_dir.mkdir(parents=True)
+            (package_dir / "pyproject.toml").write_text(f'[project]\nname = "pkg_{i}"\nversion = "0.1.0"\n')
+
+        local_repo = git.Repo.init(local_dir)
+        local_repo.create_remote("origin", url=remote_repo.git_dir)
+        local_repo.git.config("user.email", env.GIT_USER_EMAIL)
+        local_repo.git.config("user.name", env.GIT_USER)
+        local_repo.git.add(".")
+        local_repo.git.execute(["git", "commit", "-am", "Initial Commit"])
+        local_repo.git.push("origin", local_repo.active_branch.name, set_upstream=True)
+        yield local_dir
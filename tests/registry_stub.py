@@ -0,0 +1,247 @@
+"""Local HTTP stand-ins for the package and container registries, used by the tests and the benchmarks."""
+
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class Route:
+    body: bytes | dict | list
+    status: int = 200
+    content_type: str = "application/json"
+    latency: float = 0.0
+    headers: dict = field(default_factory=dict)
+
+    def payload(self) -> bytes:
+        if isinstance(self.body, bytes):
+            return self.body
+        return json.dumps(self.body).encode()
+
+
+class RegistryStub:
+    """A local HTTP stand-in for PyPI, Conda and container registries.
+
+    Routes are keyed by request path. Every request is recorded as (method, path, headers)."""
+
+    def __init__(self, routes: dict[str, Route] | None = None):
+        self.routes = routes or {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, method: str, path: str, headers, body: bytes) -> tuple[int, dict, bytes]:
+        """Return (status, headers, body) for a request. Serves the static routes for GET and HEAD requests."""
+        route = self.routes.get(path)
+        if route is None or method not in ("GET", "HEAD"):
+            return 404, {}, b""
+
+        time.sleep(route.latency)
+        etag = route.headers.get("ETag")
+        if etag is not None and headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+
+        return route.status, {"Content-Type": route.content_type, **route.headers}, route.payload()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                stub.requests.append((method, self.path, dict(self.headers)))
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length > 0 else b""
+
+                status, headers, payload = stub.handle(method, self.path, self.headers, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if method != "HEAD":
+                    self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_HEAD(self):
+                self._respond("HEAD")
+
+            def do_PUT(self):
+                self._respond("PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def pypi_route(versions, **kwargs) -> Route:
+    return Route({"info": {}, "releases": {v: [] for v in versions}}, **kwargs)
+
+
+def simple_route(versions, **kwargs) -> Route:
+    """The PEP 691/700 JSON project page of a simple index"""
+    body = {"meta": {"api-version": "1.1"}, "name": "pkg", "files": [], "versions": list(versions)}
+    return Route(body, content_type=SimpleIndexStub.json_type, **kwargs)
+
+
+def conda_route(versions, **kwargs) -> Route:
+    return Route({"files": [{"version": v, "basename": f"noarch/pkg-{v}.tar.bz2"} for v in versions]}, **kwargs)
+
+
+class OCIRegistryStub(RegistryStub):
+    """An in-memory stand-in for the OCI distribution API (/v2).
+
+    `manifests` maps (repository, reference) to the raw manifest, where references are tags and digests. If a token is
+    given, every /v2 request needs it and the token is issued at /token for the username and password."""
+
+    media_type = "application/vnd.docker.distribution.manifest.v2+json"
+
+    def __init__(self, token: str | None = None, credentials=("user", "secret"), page_size=None, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.manifests: dict[tuple[str, str], bytes] = {}
+        self.blobs: dict[tuple[str, str], bytes] = {}
+        self.token = token
+        self.credentials = credentials
+        self.page_size = page_size
+
+    def add_image(self, repository: str, tag: str, config: bytes, layers=(b"layer",)) -> tuple[str, str]:
+        """Store an image and return (manifest digest, config digest)."""
+
+        def digest(data):
+            return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+        self.blobs[(repository, digest(config))] = config
+        for layer in layers:
+            self.blobs[(repository, digest(layer))] = layer
+        manifest = json.dumps(
+            {
+                "schemaVersion": 2,
+                "mediaType": self.media_type,
+                "config": {"digest": digest(config), "size": len(config)},
+                "layers": [{"digest": digest(layer), "size": len(layer)} for layer in layers],
+            }
+        ).encode()
+        self.manifests[(repository, tag)] = manifest
+        self.manifests[(repository, digest(manifest))] = manifest
+        return digest(manifest), digest(config)
+
+    def tags(self, repository: str) -> list[str]:
+        return sorted(ref for repo, ref in self.manifests if repo == repository and not ref.startswith("sha256:"))
+
+    def _authorized(self, headers) -> bool:
+        return self.token is None or headers.get("Authorization") == f"Bearer {self.token}"
+
+    def handle(self, method, path, headers, body):
+        time.sleep(self.latency)
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        if url.path == "/token":
+            user, password = base64.b64decode(headers.get("Authorization", "Basic ").split()[1]).decode().split(":")
+            if (user, password) != tuple(self.credentials):
+                return 401, {}, b""
+            return 200, {"Content-Type": "application/json"}, json.dumps({"token": self.token}).encode()
+
+        if not self._authorized(headers):
+            challenge = f'Bearer realm="{self.url}/token",service="stub",scope="repository:x:pull,push"'
+            return 401, {"WWW-Authenticate": challenge}, b""
+
+        parts = url.path.split("/")
+        kind = parts[-2]
+        repository = "/".join(parts[2:-2])
+        reference = parts[-1]
+        if kind == "manifests":
+            if method == "PUT":
+                self.manifests[(repository, reference)] = body
+                return 201, {}, b""
+            manifest = self.manifests.get((repository, reference))
+            if manifest is None:
+                return 404, {}, b""
+            digest = f"sha256:{hashlib.sha256(manifest).hexdigest()}"
+            return 200, {"Content-Type": self.media_type, "Docker-Content-Digest": digest}, manifest
+
+        if kind == "blobs":
+            blob = self.blobs.get((repository, reference))
+            return (404, {}, b"") if blob is None else (200, {}, blob)
+
+        if kind == "tags" and reference == "list":
+            tags = self.tags(repository)
+            start = tags.index(query["last"][0]) + 1 if "last" in query else 0
+            n = self.page_size or int(query.get("n", [len(tags)])[0])
+            page = tags[start : start + n]
+            response_headers = {"Content-Type": "application/json"}
+            if start + n < len(tags):
+                response_headers["Link"] = f'</v2/{repository}/tags/list?n={n}&last={page[-1]}>; rel="next"'
+            return 200, response_headers, json.dumps({"name": repository, "tags": page}).encode()
+
+        return 404, {}, b""
+
+
+class SimpleIndexStub(RegistryStub):
+    """A stand-in for a PEP 503 simple index, e.g. a private index or a mirror, at /simple/<project>/.
+
+    The PEP 691 JSON form is served to clients that accept it, HTML otherwise. Other paths are served from the routes.
+    With api_version "1.0" the PEP 700 `versions` list is left out, with serve_json=False the index only serves HTML.
+    Responses are gzipped on request."""
+
+    json_type = "application/vnd.pypi.simple.v1+json"
+
+    def __init__(self, api_version="1.1", serve_json=True, latency=0.0, routes: dict[str, Route] | None = None):
+        super().__init__(routes)
+        self.projects: dict[str, list[str]] = {}
+        self.api_version = api_version
+        self.serve_json = serve_json
+        self.latency = latency
+
+    def add_project(self, name: str, versions: list[str]):
+        self.projects[name] = versions
+
+    def handle(self, method, path, headers, body):
+        time.sleep(self.latency)
+        parts = urlparse(path).path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "simple" or parts[1] not in self.projects:
+            # e.g. the legacy JSON API
+            return super().handle(method, path, headers, body)
+
+        name, versions = parts[1], self.projects[parts[1]]
+        files = [{"filename": f"{name}-{v}.tar.gz", "url": f"/files/{name}-{v}.tar.gz", "hashes": {}} for v in versions]
+        files += [
+            {"filename": f"{name.replace('-', '_')}-{v}-py3-none-any.whl", "url": "/files/x.whl", "hashes": {}}
+            for v in versions
+        ]
+        if self.serve_json and self.json_type in headers.get("Accept", ""):
+            document = {"meta": {"api-version": self.api_version}, "name": name, "files": files}
+            if self.api_version != "1.0":
+                document["versions"] = versions
+            content_type, payload = self.json_type, json.dumps(document).encode()
+        else:
+            links = "".join(f'<a href="{f["url"]}">{f["filename"]}</a>\n' for f in files)
+            content_type, payload = "text/html", f"<!DOCTYPE html><html><body>{links}</body></html>".encode()
+
+        response_headers = {"Content-Type": content_type}
+        if "gzip" in headers.get("Accept-Encoding", ""):
+            payload = gzip.compress(payload)
+            response_headers["Content-Encoding"] = "gzip"
+        return 200, response_headers, payload
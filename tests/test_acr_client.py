@@ -0,0 +1,78 @@
+import time
+from types import SimpleNamespace
+
+from azure.core.credentials import AccessToken
+
+from bumpyproject.acr_client import DiskCachedCredential
+from bumpyproject.docker_helper import DockerACRHelper
+
+
+class FakeCredential:
+    def __init__(self):
+        self.calls = 0
+
+    def get_token(self, *scopes, **kwargs):
+        self.calls += 1
+        return AccessToken(f"token-{self.calls}", int(time.time()) + 3600)
+
+
+class FakeTagPages:
+    def __init__(self, pages):
+        self.pages = pages
+        self.pages_read = 0
+
+    def by_page(self):
+        for page in self.pages:
+            self.pages_read += 1
+            yield iter([SimpleNamespace(name=name) for name in page])
+
+
+class FakeACRClient:
+    def __init__(self, pages):
+        self.tags = FakeTagPages(pages)
+
+    def list_tag_properties(self, repository, **kwargs):
+        return self.tags
+
+
+def test_tokens_are_cached_on_disk(tmp_path):
+    cache_file = tmp_path / "tokens.json"
+    inner = FakeCredential()
+    assert DiskCachedCredential(inner, cache_file).get_token("scope/.default").token == "token-1"
+
+    # A new process (here a new credential object) reuses the token until it is about to expire
+    assert DiskCachedCredential(inner, cache_file).get_token("scope/.default").token == "token-1"
+    assert DiskCachedCredential(inner, cache_file, expiry_margin=4000).get_token("scope/.default").token == "token-2"
+    assert inner.calls == 2
+
+
+def test_latest_tagged_image_streams_pages():
+    helper = DockerACRHelper("myacr", "myrepo", "tenant", "client", "secret")
+    helper._acr_client = FakeACRClient([["latest", "0.2.0"], ["0.3.0-alpha.1", "0.1.0"], ["0.0.1"]])
+    assert helper.get_latest_tagged_image(scan_limit=0) == "0.3.0-alpha.1"
+    assert helper.acr_client.tags.pages_read == 3
+
+    # With a scan limit only the most recently updated tags are read
+    helper._acr_client = FakeACRClient([["latest", "0.2.0"], ["0.3.0-alpha.1", "0.1.0"], ["0.0.1"]])
+    assert helper.get_latest_tagged_image(scan_limit=2) == "0.2.0"
+    assert helper.acr_client.tags.pages_read == 1
+
+
+def test_latest_tagged_image_scans_past_the_limit_to_a_version():
+    # Commit SHA tags were pushed after the latest version
+    pages = [[f"sha-{i:04}" for i in range(j, j + 3)] for j in range(0, 9, 3)] + [["0.2.0", "0.1.0"], ["0.3.0"]]
+    helper = DockerACRHelper("myacr", "myrepo", "tenant", "client", "secret")
+    helper._acr_client = FakeACRClient(pages)
+    assert helper.get_latest_tagged_image(scan_limit=2) == "0.2.0"
+    assert helper.acr_client.tags.pages_read == 4
+
+
+def test_tokens_are_cached_per_tenant_and_cae(tmp_path):
+    cache_file = tmp_path / "tokens.json"
+    inner = FakeCredential()
+    credential = DiskCachedCredential(inner, cache_file)
+    assert credential.get_token("scope/.default").token == "token-1"
+    assert credential.get_token("scope/.default", tenant_id="other").token == "token-2"
+    assert credential.get_token("scope/.default", enable_cae=True).token == "token-3"
+    assert credential.get_token("scope/.default", tenant_id="other").token == "token-2"
+    assert inner.calls == 3
@@ -47,4 +47,3 @@ def test_invalid_bump_level_on_non_main_branch(mock_proj_a):
     project.bump("pre-release")
     with pytest.raises(BumpLevelSizeError):
         project.bump("pre-release")
-
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+# Modules that must only be imported by the commands that need them
+LAZY_MODULES = ["docker", "azure", "git", "requests", "dotenv", "tomlkit"]
+
+# Budget for importing the CLI in a fresh interpreter. Override with BUMPY_IMPORT_BUDGET_MS on slow machines.
+IMPORT_BUDGET_MS = float(os.getenv("BUMPY_IMPORT_BUDGET_MS", "250"))
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of every module imported by `module` (python -X importtime)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def test_cli_imports_are_lazy():
+    times = import_times("bumpyproject.cli_bumpy")
+    eager = sorted(name for name in times if name.split(".")[0] in LAZY_MODULES)
+    assert eager == []
+
+
+def test_cli_cold_start_budget():
+    # Take the best of a few runs to keep the budget check robust against noisy CI machines
+    best_ms = min(import_times("bumpyproject.cli_bumpy")["bumpyproject.cli_bumpy"] for _ in range(3)) / 1000
+    assert best_ms < IMPORT_BUDGET_MS, f"Importing the CLI took {best_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+
+def test_env_vars_are_read_again_on_refresh(monkeypatch):
+    from bumpyproject import env_vars as env
+
+    monkeypatch.setenv("GIT_USER", "before")
+    env.read_all(refresh=True)
+    monkeypatch.setenv("GIT_USER", "after")
+    assert env.GIT_USER == "before"
+
+    env.read_all(refresh=True)
+    assert env.GIT_USER == "after"
+
+    monkeypatch.delenv("GIT_USER")
+    env.read_all(refresh=True)
@@ -0,0 +1,143 @@
+import io
+import json
+import os
+import pathlib
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from bumpyproject import daemon
+from bumpyproject.daemon import BumpyDaemon, run_client, send_command
+from bumpyproject.helpers import map_in_context
+
+
+@pytest.fixture
+def bumpy_daemon(bumpy_cache_dir):
+    # Unix socket paths are limited to ~100 characters, pytest's tmp_path can be longer
+    with tempfile.TemporaryDirectory() as socket_dir:
+        socket_path = pathlib.Path(socket_dir) / "bumpyd.sock"
+        environ = {**os.environ, "BUMPY_CACHE_DIR": str(bumpy_cache_dir), "GIT_ROOT_DIR": "", "PYPROJECT_TOML": ""}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "bumpyproject.cli_main", "daemon", "--socket", str(socket_path)], env=environ
+        )
+        deadline = time.monotonic() + 30
+        while not daemon.is_daemon_running(socket_path):
+            assert process.poll() is None and time.monotonic() < deadline, "The daemon did not start"
+            time.sleep(0.05)
+
+        yield SimpleNamespace(socket_path=socket_path)
+        process.terminate()
+        process.wait()
+
+
+def test_commands_run_in_the_daemon(bumpy_daemon, mock_proj_a):
+    response = send_command(
+        ["pyproject", "--bump-level", "patch", "--dry-run"], bumpy_daemon.socket_path, cwd=mock_proj_a, environ={}
+    )
+
+    assert response["exit_code"] == 0, response["stderr"]
+    # The repository was not touched by the dry run
+    response = send_command(["history", "--at", "HEAD"], bumpy_daemon.socket_path, cwd=mock_proj_a, environ={})
+    assert response["stdout"].strip() == "0.0.1"
+
+
+def test_client_environment_backs_the_options(bumpy_daemon, mock_proj_a, tmp_path, monkeypatch):
+    github_output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(github_output))
+    monkeypatch.setenv("PYPROJECT_TOML", "pyproject.toml")
+    monkeypatch.chdir(mock_proj_a)
+
+    exit_code = run_client(["pyproject", "--check-current", "--ga-version-output"], bumpy_daemon.socket_path)
+
+    assert exit_code == 0
+    assert github_output.read_text() == "VERSION=0.0.1\n"
+
+
+def test_errors_are_returned_to_the_client(bumpy_daemon, mock_proj_a):
+    response = send_command(["no-such-command"], bumpy_daemon.socket_path, cwd=mock_proj_a, environ={})
+    assert response["exit_code"] == 2
+    assert "No such command" in response["stderr"]
+
+    response = send_command(["history", "--at", "nope"], bumpy_daemon.socket_path, cwd=mock_proj_a, environ={})
+    assert response["exit_code"] == 2
+    assert "Unknown revision 'nope'" in response["stderr"]
+    assert "Traceback" not in response["stderr"]
+
+
+def test_commands_for_the_same_repository_share_a_lock(mock_proj_a, tmp_path):
+    bumpy_daemon = BumpyDaemon(tmp_path / "bumpyd.sock")
+    lock = bumpy_daemon._repo_lock({"cwd": str(pathlib.Path(mock_proj_a) / "config")})
+    assert lock is bumpy_daemon._repo_lock({"cwd": mock_proj_a})
+    assert lock is not bumpy_daemon._repo_lock({"cwd": str(tmp_path)})
+
+
+def test_repo_lock_follows_the_options(mock_proj_a, tmp_path):
+    bumpy_daemon = BumpyDaemon(tmp_path / "bumpyd.sock")
+    lock = bumpy_daemon._repo_lock({"cwd": mock_proj_a, "argv": []})
+
+    requests = [
+        {"cwd": str(tmp_path), "argv": ["history", "--git-root-dir", mock_proj_a]},
+        {
+            "cwd": str(tmp_path),
+            "argv": ["--profile", "t.json", "pyproject", "--pyproject-toml", f"{mock_proj_a}/pyproject.toml"],
+        },
+        {"cwd": str(tmp_path), "argv": ["workspace"], "env": {"GIT_ROOT_DIR": mock_proj_a}},
+        {"cwd": str(tmp_path.parent), "argv": ["history", "--git-root-dir", f"../{tmp_path.name}", "--bogus"]},
+    ]
+    assert [bumpy_daemon._repo_lock(request) is lock for request in requests] == [True, True, True, False]
+
+
+def test_client_runs_locally_without_a_daemon(tmp_path):
+    assert run_client(["--help"], tmp_path / "missing.sock") is None
+
+    result = subprocess.run(
+        [sys.executable, "-m", "bumpyproject.cli_main", "--help"],
+        check=False,
+        capture_output=True,
+        text=True,
+        env={"BUMPY_DAEMON_SOCKET": str(tmp_path / "missing.sock"), "PATH": "/usr/bin:/bin"},
+    )
+    assert result.returncode == 0
+    assert "daemon" in result.stdout
+
+
+def test_option_envvars_match_the_app(tmp_path):
+    assert set(BumpyDaemon(tmp_path / "bumpyd.sock")._option_envvars) == daemon.OPTION_ENVVARS
+
+
+def test_only_option_envvars_are_sent():
+    requests = []
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            requests.append(json.loads(self.rfile.readline()))
+            self.wfile.write(b"{}\n")
+
+    with tempfile.TemporaryDirectory() as socket_dir:
+        socket_path = pathlib.Path(socket_dir) / "bumpyd.sock"
+        with socketserver.UnixStreamServer(str(socket_path), Handler) as server:
+            thread = threading.Thread(target=server.handle_request)
+            thread.start()
+            send_command(["--help"], socket_path, environ={"PYPI_URL": "https://pypi.org", "GITHUB_TOKEN": "secret"})
+            thread.join()
+
+    assert requests[0]["env"] == {"PYPI_URL": "https://pypi.org"}
+
+
+def test_workers_run_in_the_context_of_the_request():
+    stream = io.StringIO()
+    token = daemon._stdout.set(stream)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            streams = map_in_context(executor, lambda _: daemon._stdout.get(), range(4))
+    finally:
+        daemon._stdout.reset(token)
+
+    assert all(s is stream for s in streams)
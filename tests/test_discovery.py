@@ -0,0 +1,35 @@
+import subprocess
+
+from bumpyproject import discovery
+
+
+def _make_tree(root):
+    for rel_path in ["pyproject.toml", "pkg/pyproject.toml", ".venv/lib/pyproject.toml", "build/pyproject.toml"]:
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("[project]\n")
+
+
+def test_walk_prunes_ignored_dirs(tmp_path):
+    _make_tree(tmp_path)
+    assert discovery.walk_for_files(tmp_path, "pyproject.toml") == [
+        tmp_path / "pkg/pyproject.toml",
+        tmp_path / "pyproject.toml",
+    ]
+
+
+def test_git_index_discovery(tmp_path):
+    _make_tree(tmp_path)
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "-f", "pyproject.toml", "build/pyproject.toml"], cwd=tmp_path, check=True)
+
+    files = discovery.find_files(tmp_path, "pyproject.toml", use_git_index=True)
+    assert files == [tmp_path / "pyproject.toml"]
+
+    # Adding a file changes the index, which invalidates the cached listing
+    subprocess.run(["git", "add", "pkg/pyproject.toml"], cwd=tmp_path, check=True)
+    files = discovery.find_files(tmp_path, "pyproject.toml", use_git_index=True)
+    assert files == [tmp_path / "pkg/pyproject.toml", tmp_path / "pyproject.toml"]
+
+    # Outside a git repository it falls back to walking the file system
+    assert discovery.git_index_files(tmp_path.parent / "elsewhere", "pyproject.toml") is None
@@ -0,0 +1,132 @@
+import subprocess
+import threading
+import time
+
+import pytest
+
+from bumpyproject import docker_matrix as dm
+
+MATRIX_TOML = """
+[project]
+name = "images"
+version = "1.2.0"
+
+[[tool.bumpy.images]]
+name = "runtime"
+dockerfile = "docker/runtime.Dockerfile"
+
+[[tool.bumpy.images]]
+name = "dev"
+dockerfile = "docker/dev.Dockerfile"
+depends_on = ["runtime"]
+build_args = { BASE_TAG = "1.2.0" }
+
+[[tool.bumpy.images]]
+name = "test"
+dockerfile = "docker/test.Dockerfile"
+context = "docker"
+"""
+
+
+class FakeRunner:
+    def __init__(self, fail=(), drivers=None):
+        self.fail = fail
+        # Builder name (None for the active one) -> driver
+        self.drivers = {None: "docker"} if drivers is None else drivers
+        self.commands = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd, **kwargs):
+        if cmd[:3] == ["docker", "buildx", "inspect"]:
+            driver = self.drivers.get(cmd[3] if len(cmd) > 3 else None)
+            stdout = f"Name:   builder\nDriver: {driver}\n"
+            return subprocess.CompletedProcess(cmd, 1 if driver is None else 0, stdout=stdout)
+        if cmd[:3] == ["docker", "buildx", "create"]:
+            self.commands.append(cmd)
+            self.drivers[cmd[cmd.index("--name") + 1]] = cmd[cmd.index("--driver") + 1]
+            return subprocess.CompletedProcess(cmd, 0)
+
+        with self._lock:
+            self.commands.append(cmd)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        name = cmd[cmd.index("--tag") + 1].split("/")[-1].split(":")[0]
+        return subprocess.CompletedProcess(cmd, 1 if name in self.fail else 0, stdout=f"built {name}")
+
+
+@pytest.fixture
+def matrix_specs(tmp_path):
+    pyproject_toml = tmp_path / "pyproject.toml"
+    pyproject_toml.write_text(MATRIX_TOML)
+    return dm.load_build_matrix(pyproject_toml)
+
+
+def test_build_waves(matrix_specs, tmp_path):
+    waves = dm.plan_build_waves(matrix_specs)
+    assert [[s.name for s in wave] for wave in waves] == [["runtime", "test"], ["dev"]]
+    assert matrix_specs[2].context == tmp_path / "docker"
+
+    cmd = dm.buildx_command(matrix_specs[1], "myacr.azurecr.io", "1.2.0", cache_dir=tmp_path / "cache", push=True)
+    assert cmd[-2:] == ["--push", str(tmp_path)]
+    assert "myacr.azurecr.io/dev:1.2.0" in cmd and "myacr.azurecr.io/dev:latest" in cmd
+    assert "BASE_TAG=1.2.0" in cmd
+    assert f"type=local,dest={tmp_path / 'cache' / 'dev'},mode=max" in cmd
+
+    matrix_specs[0].depends_on = ("dev",)
+    with pytest.raises(dm.BuildMatrixError):
+        dm.plan_build_waves(matrix_specs)
+
+
+def test_build_matrix_runs_independent_images_concurrently(matrix_specs):
+    runner = FakeRunner()
+    results = dm.build_matrix(matrix_specs, "myacr.azurecr.io", "1.2.0", runner=runner)
+    assert [r.status for r in results] == ["built", "built", "built"]
+    assert runner.max_active == 2
+
+    runner = FakeRunner(fail=("runtime",))
+    results = dm.build_matrix(matrix_specs, "myacr.azurecr.io", "1.2.0", runner=runner)
+    assert [r.status for r in results] == ["failed", "skipped", "built"]
+
+
+def test_build_matrix_cache_builder(matrix_specs, tmp_path):
+    # Pushed builds export caches with a docker-container builder, which is created once
+    runner = FakeRunner()
+    dm.build_matrix(matrix_specs, "myacr.azurecr.io", "1.2.0", cache_dir=tmp_path / "cache", push=True, runner=runner)
+    assert runner.commands[0][:4] == ["docker", "buildx", "create", "--name"]
+    assert all(cmd[cmd.index("--builder") + 1] == dm.CACHE_BUILDER_NAME for cmd in runner.commands[1:])
+    assert all("--cache-to" in cmd for cmd in runner.commands[1:])
+
+    dm.build_matrix(
+        matrix_specs, "myacr.azurecr.io", "1.2.0", cache_ref="myacr.azurecr.io/cache", push=True, runner=runner
+    )
+    assert sum(cmd[2] == "create" for cmd in runner.commands) == 1
+
+    # Local builds stay on the docker driver, so later waves see the loaded base images, and do not export caches
+    runner = FakeRunner()
+    dm.build_matrix(matrix_specs, "myacr.azurecr.io", "1.2.0", cache_ref="myacr.azurecr.io/cache", runner=runner)
+    assert all("--builder" not in cmd and "--cache-to" not in cmd for cmd in runner.commands)
+    assert all("--cache-from" in cmd for cmd in runner.commands)
+
+
+def test_check_image_versions_unpublished(matrix_specs, monkeypatch):
+    from bumpyproject.bumper import OutdatedBumpError
+    from bumpyproject.docker_helper import DockerACRHelper
+
+    published = {"runtime": "1.3.0", "dev": None, "test": None}
+
+    def get_latest_tagged_image(self):
+        if published[self.acr_repo_name] is None:
+            raise ValueError("No valid versions to choose from")
+        return published[self.acr_repo_name]
+
+    monkeypatch.setattr(DockerACRHelper, "get_latest_tagged_image", get_latest_tagged_image)
+    with pytest.raises(OutdatedBumpError):
+        dm.check_image_versions(matrix_specs, "myacr", "1.2.0", "tenant", "client", "secret")
+
+    published["runtime"] = "1.1.0"
+    dm.check_image_versions(matrix_specs, "myacr", "1.2.0", "tenant", "client", "secret")
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from bumpyproject.docker_helper import NoAuthenticationError, ProgressRenderer, format_bytes, print_logs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def push_events(clock, layer_ids=("aaa", "bbb"), steps=1000):
+    yield {"status": "The push refers to repository [myacr.azurecr.io/myrepo]"}
+    for layer_id in layer_ids:
+        yield {"status": "Preparing", "progressDetail": {}, "id": layer_id}
+    for i in range(steps):
+        clock.now += 0.001
+        for layer_id in layer_ids:
+            yield {
+                "status": "Pushing",
+                "progressDetail": {"current": (i + 1) * 1000, "total": steps * 1000},
+                "id": layer_id,
+            }
+    for layer_id in layer_ids:
+        yield {"status": "Pushed", "progressDetail": {}, "id": layer_id}
+
+
+def test_non_tty_only_prints_state_transitions():
+    clock = FakeClock()
+    output = io.StringIO()
+    renderer = ProgressRenderer(output, is_tty=False, clock=clock)
+    print_logs(push_events(clock), renderer=renderer)
+
+    lines = output.getvalue().splitlines()
+    # One line for the header, three transitions per layer and one summary line per layer
+    assert len(lines) == 1 + 3 * 2 + 2
+    assert "aaa: Pushed 1.0MB/1.0MB" in lines[-2]
+    assert renderer.layers["aaa"].bytes_per_second == pytest.approx(999_000 / 0.999)
+    assert format_bytes(renderer.layers["bbb"].bytes_per_second) == "1.0MB"
+
+
+def test_tty_redraws_at_frame_rate():
+    clock = FakeClock()
+    output = io.StringIO()
+    print_logs(push_events(clock), renderer=ProgressRenderer(output, is_tty=True, frame_rate=10, clock=clock))
+
+    # One second of pushing at 10 frames per second plus the final frame
+    assert 8 <= output.getvalue().count("aaa: Pushing") <= 12
+
+
+def test_authentication_errors_are_detected():
+    events = [{"stream": "Step 1/2"}, {"stream": "unauthorized: authentication required"}]
+    with pytest.raises(NoAuthenticationError):
+        print_logs(iter(events), renderer=ProgressRenderer(io.StringIO(), is_tty=False))
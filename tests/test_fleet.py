@@ -0,0 +1,97 @@
+import pathlib
+
+import git
+import pytest
+from typer.testing import CliRunner
+
+from bumpyproject import fleet
+from bumpyproject.cli_bumpy import app
+
+
+def make_downstream(tmp_path: pathlib.Path, name: str, version="0.1.0") -> str:
+    work_dir = tmp_path / f"{name}-work"
+    work = git.Repo.init(work_dir)
+    work.git.config("user.email", "test@bumpyproject.com")
+    work.git.config("user.name", "test")
+    (work_dir / "requirements.txt").write_text(f"bumpyproject=={version}\nrequests\n")
+    (work_dir / "Dockerfile").write_text(f"FROM python\nARG BUMPY_VERSION={version}\n")
+    work.git.add(".")
+    work.git.commit("-m", "Initial Commit")
+
+    upstream = tmp_path / f"{name}.git"
+    git.Repo.clone_from(work_dir, upstream, bare=True)
+    return str(upstream)
+
+
+def write_manifest(tmp_path: pathlib.Path, entries: list[dict]) -> pathlib.Path:
+    lines = []
+    for entry in entries:
+        lines.append("[[repos]]")
+        lines += [f"{key} = '{value}'" for key, value in entry.items()]
+    manifest = tmp_path / "fleet.toml"
+    manifest.write_text("\n".join(lines) + "\n")
+    return manifest
+
+
+def test_versions_are_propagated_to_all_repos(tmp_path):
+    urls = [make_downstream(tmp_path, f"repo_{i}") for i in range(4)]
+    entries = []
+    for url in urls:
+        entries.append({"url": url, "file": "requirements.txt", "pattern": r"^bumpyproject==(\S+)"})
+        entries.append({"url": url, "file": "Dockerfile", "pattern": r"^ARG BUMPY_VERSION=(\S+)"})
+    entries[0]["branch"] = entries[1]["branch"] = "bump-bumpyproject"
+    targets = fleet.load_fleet_manifest(write_manifest(tmp_path, entries))
+
+    results = fleet.propagate_version(targets, "0.2.0", max_workers=4)
+
+    assert [(r.status, r.old_versions) for r in results] == [("pushed", ["0.1.0"])] * 4
+    first = git.Repo(urls[0])
+    assert first.heads["bump-bumpyproject"].commit.message.strip() == "bumping version 0.1.0 -> 0.2.0"
+    assert first.heads["master"].commit.message.strip() == "Initial Commit"
+    for url in urls[1:]:
+        commit = git.Repo(url).head.commit
+        assert set(commit.stats.files) == {"requirements.txt", "Dockerfile"}
+        assert b"bumpyproject==0.2.0\n" in (commit.tree / "requirements.txt").data_stream.read()
+
+
+def test_failures_are_reported_per_repo(tmp_path, monkeypatch):
+    good = make_downstream(tmp_path, "good")
+    unchanged = make_downstream(tmp_path, "unchanged", version="0.2.0")
+    entries = [
+        {"url": good, "file": "requirements.txt", "pattern": r"^bumpyproject==(\S+)"},
+        {"url": unchanged, "file": "requirements.txt", "pattern": r"^bumpyproject==(\S+)"},
+        {"url": good, "file": "Dockerfile", "pattern": r"^ARG NOPE=(\S+)", "branch": "x"},
+        {"url": str(tmp_path / "missing.git"), "file": "requirements.txt", "pattern": r"(\S+)"},
+    ]
+
+    results = fleet.propagate_version(
+        fleet.load_fleet_manifest(write_manifest(tmp_path, entries)), "0.2.0", retries=1, retry_delay=0.01
+    )
+
+    assert [r.status for r in results] == ["pushed", "unchanged", "failed", "failed"]
+    assert results[2].attempts == 1 and "does not match" in results[2].error
+    # Cloning a missing repository is retried
+    assert results[3].attempts == 2
+    summary = fleet.format_summary(results)
+    assert "missing.git" in summary and "attempts" in summary
+
+
+def test_bugs_are_not_repo_failures(tmp_path, monkeypatch):
+    def substitute_file(*args, **kwargs):
+        raise TypeError("a bug")
+
+    monkeypatch.setattr(fleet, "substitute_file", substitute_file)
+    entries = [{"url": make_downstream(tmp_path, "good"), "file": "requirements.txt", "pattern": r"(\S+)"}]
+    with pytest.raises(TypeError):
+        fleet.propagate_version(fleet.load_fleet_manifest(write_manifest(tmp_path, entries)), "0.2.0")
+
+
+def test_fleet_command(tmp_path):
+    url = make_downstream(tmp_path, "repo")
+    manifest = write_manifest(tmp_path, [{"url": url, "file": "Dockerfile", "pattern": r"BUMPY_VERSION=(\S+)"}])
+
+    result = CliRunner().invoke(app, ["fleet", str(manifest), "--new-version", "1.0.0", "--no-push"])
+
+    assert result.exit_code == 0, result.output
+    assert "committed" in result.output
+    assert git.Repo(url).head.commit.message.strip() == "Initial Commit"
@@ -0,0 +1,67 @@
+import os
+import pathlib
+import shutil
+
+from bumpyproject.git_cat_file import CatFileReader
+from bumpyproject.project import Project
+
+
+def test_read_blobs_across_revisions(mock_proj_a):
+    proj = Project(mock_proj_a)
+    proj.bump("patch", check_git=False)
+    proj.git.git_repo.git.commit("--allow-empty", "-m", "unrelated")
+    proj.bump("minor", check_git=False)
+
+    revs = ["HEAD~3", "HEAD~2", "HEAD~1", "HEAD", "0.0.2", "no-such-rev"]
+    assert proj.pyproject_versions_at(revs) == {
+        "HEAD~3": "0.0.1",
+        "HEAD~2": "0.0.2",
+        "HEAD~1": "0.0.2",
+        "HEAD": "0.1.0",
+        "0.0.2": "0.0.2",
+        "no-such-rev": None,
+    }
+
+    reader = proj.git.cat_file
+    # HEAD~2, HEAD~1 and the tag share a blob
+    assert len(reader._cache) == 3
+    assert reader.read_blob("HEAD:config") is None
+    assert reader.read_blob("HEAD:no such file") is None
+    assert reader.resolve(["HEAD:config"])["HEAD:config"][1] == "tree"
+
+
+def test_large_batches_and_restarts(mock_proj_a):
+    reader = CatFileReader(pathlib.Path(mock_proj_a))
+    # Enough requests to fill the pipes in both directions
+    names = ["HEAD:pyproject.toml" if i % 2 else f"HEAD:missing_{i}.toml" for i in range(20000)]
+    contents = reader.read_blobs(names)
+    assert contents["HEAD:pyproject.toml"].startswith(b"[")
+    assert sum(c is None for c in contents.values()) == 10000
+
+    reader.close()
+    assert reader.read_blob("HEAD:pyproject.toml") == contents["HEAD:pyproject.toml"]
+
+    # Processes that died are replaced
+    for process, _ in reader._processes.values():
+        process.kill()
+        process.wait()
+    assert reader.resolve(["HEAD"])["HEAD"][1] == "commit"
+    reader.close()
+
+
+def test_git_without_batch_command(mock_proj_a, tmp_path, monkeypatch):
+    # A git before 2.36, which does not know `cat-file --batch-command`
+    real_git = shutil.which("git")
+    fake_git = tmp_path / "bin" / "git"
+    fake_git.parent.mkdir()
+    fake_git.write_text(
+        "#!/bin/sh\n"
+        'for arg in "$@"; do [ "$arg" = "--batch-command" ] && exit 129; done\n'
+        f'exec "{real_git}" "$@"\n'
+    )
+    fake_git.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{fake_git.parent}{os.pathsep}{os.environ['PATH']}")
+
+    reader = CatFileReader(pathlib.Path(mock_proj_a))
+    assert reader.read_blob("HEAD:pyproject.toml").startswith(b"[")
+    reader.close()
@@ -0,0 +1,149 @@
+import pathlib
+import shutil
+
+import pytest
+
+from bumpyproject import env_vars as env
+from bumpyproject.commit_messages import bump_level_of_message
+from bumpyproject.git_helper import DirtyRepoError, GitHelper
+from bumpyproject.project import Project, bump_pyproject
+from bumpyproject.versions import BumpLevel
+
+
+def test_plumbing_commit_is_identical_to_porcelain(mock_proj_a, tmp_path, monkeypatch):
+    # Pin the dates so that both commits can be compared byte by byte
+    monkeypatch.setenv("GIT_AUTHOR_DATE", "2023-01-01T12:00:00+0000")
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2023-01-01T12:00:00+0000")
+
+    shutil.copytree(mock_proj_a, tmp_path / "porcelain")
+    shutil.copytree(mock_proj_a, tmp_path / "plumbing")
+
+    commits = {}
+    for name in ("porcelain", "plumbing"):
+        root_dir = tmp_path / name
+        pyproject_toml = root_dir / "pyproject.toml"
+        bump_pyproject(pyproject_toml, "0.0.2")
+
+        git_helper = GitHelper(root_dir)
+        paths = None if name == "porcelain" else [pyproject_toml]
+        git_helper.commit_and_tag("0.0.1", "0.0.2", paths=paths)
+
+        repo = git_helper.git_repo
+        assert not repo.is_dirty()
+        commits[name] = (repo.head.commit.hexsha, repo.tags["0.0.2"].tag.hexsha)
+
+    assert commits["porcelain"] == commits["plumbing"]
+
+
+def test_plumbing_tags_fall_back_with_tag_signing(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    assert git_helper.can_tag_with_plumbing()
+
+    git_helper.git_repo.git.config("tag.gpgSign", "true")
+    assert not git_helper.can_tag_with_plumbing()
+
+
+def test_plumbing_commit_falls_back_with_hooks(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    assert git_helper.can_commit_with_plumbing()
+
+    hook = pathlib.Path(git_helper.git_repo.git_dir) / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\nexit 0\n")
+    hook.chmod(0o755)
+    assert not git_helper.can_commit_with_plumbing()
+
+
+def _commit(repo, message):
+    repo.git.commit("--allow-empty", "-m", message)
+
+
+def test_bump_level_from_commits_since_the_last_tag(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    repo = git_helper.git_repo
+    _commit(repo, "feat!: drop python 3.8 [minor]")
+    repo.git.tag("0.0.2")
+    _commit(repo, "fix(cli): handle empty versions")
+    _commit(repo, "feat: add the history command\n\nRefs: #12")
+    _commit(repo, "docs: typo")
+
+    assert git_helper.get_latest_version_tag() == "0.0.2"
+    # The breaking change was released with 0.0.2
+    assert git_helper.get_bump_level_from_commit() == BumpLevel.MINOR
+
+    _commit(repo, "chore: update\n\nBREAKING CHANGE: the config moved")
+    assert git_helper.get_bump_level_from_commit() == BumpLevel.MAJOR
+    assert git_helper.get_bump_level_from_commit(since="HEAD~2") == BumpLevel.MAJOR
+    assert git_helper.get_bump_level_from_commit(since="HEAD~3", rev="HEAD~1") == BumpLevel.MINOR
+
+    repo.git.tag("0.1.0")
+    with pytest.raises(ValueError, match="No bump level"):
+        git_helper.get_bump_level_from_commit()
+
+
+def test_commit_messages_are_streamed(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    for i in range(3):
+        _commit(git_helper.git_repo, f"commit {i}\n\nbody {i}")
+
+    messages = list(git_helper.iter_commit_messages())
+    assert messages == ["commit 2\n\nbody 2\n", "commit 1\n\nbody 1\n", "commit 0\n\nbody 0\n", "Initial Commit\n"]
+    assert list(git_helper.iter_commit_messages("HEAD~1..HEAD", chunk_size=4)) == messages[:1]
+
+
+@pytest.mark.parametrize(
+    "message, level",
+    [
+        ("fix: off by one [major]", BumpLevel.MAJOR),
+        ("[pre] try something", BumpLevel.PRE_RELEASE),
+        ("refactor(core)!: rename everything", BumpLevel.MAJOR),
+        ("Feat(api): new endpoint", BumpLevel.MINOR),
+        ("perf: faster sort", BumpLevel.PATCH),
+        ("chore: bump deps\n\nBREAKING-CHANGE: needs python 3.11", BumpLevel.MAJOR),
+        ("chore: bump deps", None),
+        ("Merge branch 'fix: x'", None),
+    ],
+)
+def test_bump_level_of_message(message, level):
+    assert bump_level_of_message(message) == level
+
+
+def test_dirty_check_can_be_scoped_to_paths(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    root_dir = pathlib.Path(mock_proj_a)
+    pyproject_toml = root_dir / "pyproject.toml"
+    assert not git_helper.is_dirty()
+    assert not git_helper.is_dirty([pyproject_toml])
+
+    # Changes to other files in the work tree are only seen by the full check
+    (root_dir / "config" / "a_yaml_with_some_text.yaml").write_text("changed: true\n")
+    assert git_helper.is_dirty()
+    assert not git_helper.is_dirty([pyproject_toml])
+
+    # Staged changes are always seen
+    git_helper.git_repo.git.add("config")
+    assert git_helper.is_dirty([pyproject_toml])
+    git_helper.git_repo.git.reset("-q", "config")
+    assert not git_helper.is_dirty([pyproject_toml])
+
+    # The cached verdict is dropped when the file changes
+    bump_pyproject(pyproject_toml, "0.0.2")
+    assert git_helper.is_dirty([pyproject_toml])
+    with pytest.raises(DirtyRepoError):
+        git_helper.check_git_state([pyproject_toml])
+
+
+def test_scoped_dirty_check_bumps_with_unrelated_changes(mock_proj_a, monkeypatch):
+    monkeypatch.setattr(env, "DIRTY_CHECK", "scoped")
+    root_dir = pathlib.Path(mock_proj_a)
+    (root_dir / "config" / "a_yaml_with_some_text.yaml").write_text("changed: true\n")
+
+    proj = Project(mock_proj_a)
+    assert proj.bump("patch", check_git=False) == "0.0.2"
+
+    repo = proj.git.git_repo
+    assert repo.git.show("--name-only", "--format=", "HEAD").split() == ["pyproject.toml"]
+    assert repo.is_dirty()
+
+    monkeypatch.setattr(env, "DIRTY_CHECK", "full")
+    with pytest.raises(DirtyRepoError):
+        proj.bump("patch", check_git=False)
@@ -0,0 +1,58 @@
+from typer.testing import CliRunner
+
+from bumpyproject.cli_bumpy import app
+from bumpyproject.history import VersionHistory
+from bumpyproject.project import Project
+
+
+def test_version_history(mock_proj_a):
+    proj = Project(mock_proj_a)
+    repo = proj.git.git_repo
+    initial_commit = repo.head.commit.hexsha
+
+    proj.bump("patch", check_git=False)
+    patch_commit = repo.head.commit.hexsha
+
+    # Commits that do not touch pyproject.toml keep the version of their parent
+    repo.git.execute(["git", "commit", "--allow-empty", "-m", "unrelated"])
+    proj.bump("minor", check_git=False)
+
+    history = proj.version_history()
+    assert history.version_at(initial_commit) == "0.0.1"
+    assert history.version_at("HEAD~1") == "0.0.2"
+    assert history.version_at("HEAD") == "0.1.0"
+    assert history.commit_introducing("0.0.2") == patch_commit
+    assert [version for _, version in history.changes] == ["0.0.1", "0.0.2", "0.1.0"]
+
+    # The index is persisted and only new commits are indexed on the next update
+    proj.bump("patch", check_git=False)
+    history = VersionHistory(proj.git, proj.pyproject_toml_path)
+    assert history.update() == 1
+    assert history.version_at("HEAD") == "0.1.1"
+
+
+def test_history_cli(mock_proj_a):
+    proj = Project(mock_proj_a)
+    proj.bump("patch", check_git=False)
+
+    result = CliRunner().invoke(app, ["history", "--introduced", "0.0.2", "--git-root-dir", mock_proj_a])
+    assert result.exit_code == 0
+    assert result.output.strip() == proj.git.git_repo.head.commit.hexsha
+
+    result = CliRunner().invoke(app, ["history", "--at", "nope", "--git-root-dir", mock_proj_a])
+    assert result.exit_code == 2
+    assert "Unknown revision 'nope'" in result.output
+
+
+def test_history_drops_tips_that_no_longer_exist(mock_proj_a):
+    proj = Project(mock_proj_a)
+    history = proj.version_history()
+    # e.g. a tip that was rebased away and garbage collected
+    history._tips.insert(0, "f" * 40)
+    history._save()
+
+    proj.bump("patch", check_git=False)
+    history = VersionHistory(proj.git, proj.pyproject_toml_path)
+    assert history.update() == 1
+    assert history.version_at("HEAD") == "0.0.2"
+    assert [version for _, version in history.changes] == ["0.0.1", "0.0.2"]
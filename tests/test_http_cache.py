@@ -0,0 +1,53 @@
+import time
+
+from bumpyproject import py_distro
+from bumpyproject.http_cache import HttpCache
+from tests.registry_stub import RegistryStub, Route, pypi_route
+
+
+def test_conditional_requests(bumpy_cache_dir):
+    routes = {"/pypi/pkg/json": pypi_route(["0.1.0", "0.2.0"], headers={"ETag": '"v1"'})}
+    with RegistryStub(routes) as stub:
+        url = f"{stub.url}/pypi/pkg/json"
+        assert py_distro.get_latest_pypi_version(url) == "0.2.0"
+        assert py_distro.get_latest_pypi_version(url) == "0.2.0"
+
+    assert [r[2].get("If-None-Match") for r in stub.requests if r[1] == "/pypi/pkg/json"] == [None, '"v1"']
+    assert len(list((bumpy_cache_dir / "http").glob("*.entry"))) == 1
+
+
+def test_ttl_and_eviction(tmp_path):
+    routes = {f"/doc/{i}": Route(b"x" * 1000, content_type="text/plain") for i in range(3)}
+    cache = HttpCache(tmp_path, ttl=60, max_bytes=2500)
+    with RegistryStub(routes) as stub:
+        cache.get(f"{stub.url}/doc/0")
+        time.sleep(0.01)
+        cache.get(f"{stub.url}/doc/1")
+        time.sleep(0.01)
+
+        # Within the TTL the cache is served without a request
+        assert cache.get(f"{stub.url}/doc/0").from_cache is True
+        assert len(stub.requests) == 2
+
+        # Only two entries fit, so the least recently used one is evicted
+        time.sleep(0.01)
+        cache.get(f"{stub.url}/doc/2")
+        assert cache.get(f"{stub.url}/doc/0").from_cache is True
+        assert cache.get(f"{stub.url}/doc/1").from_cache is False
+
+
+def test_streams_are_cached_when_read_to_the_end(tmp_path):
+    routes = {"/doc": Route(b"x" * 100_000, content_type="text/plain", headers={"ETag": '"v1"'})}
+    cache = HttpCache(tmp_path, ttl=0)
+    with RegistryStub(routes) as stub:
+        url = f"{stub.url}/doc"
+        chunks = cache.stream(url, chunk_size=1000)
+        next(chunks)
+        chunks.close()
+        # The partial document is discarded instead of downloading the rest
+        assert list(tmp_path.iterdir()) == []
+
+        assert b"".join(cache.stream(url)) == b"x" * 100_000
+        assert b"".join(cache.stream(url)) == b"x" * 100_000
+
+    assert [r[2].get("If-None-Match") for r in stub.requests] == [None, None, '"v1"']
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from bumpyproject import py_distro
+from bumpyproject.json_stream import iter_members
+from tests.registry_stub import RegistryStub, Route, conda_route
+
+
+def _chunks(data: bytes, size: int):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+DOCUMENT = {
+    "name": "pkg",
+    "count": 1234567,
+    "nested": {"files": [1, 2]},
+    "files": [{"version": "1.0.0", "size": 10.5, "ok": True}, {"version": "ünïcode", "size": -3e5, "ok": None}],
+    "packages": {"a.tar.bz2": {"name": "a"}, "b.conda": {"name": "b"}},
+    "latest": 987654321,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_members_are_parsed_across_chunk_boundaries(chunk_size):
+    data = json.dumps(DOCUMENT, indent=1, ensure_ascii=False).encode()
+    members = list(iter_members(_chunks(data, chunk_size), {"files", "packages", "latest", "missing"}))
+
+    assert members == [
+        ("files", DOCUMENT["files"][0]),
+        ("files", DOCUMENT["files"][1]),
+        ("packages", ("a.tar.bz2", {"name": "a"})),
+        ("packages", ("b.conda", {"name": "b"})),
+        ("latest", 987654321),
+    ]
+
+
+def test_reading_stops_after_the_last_key():
+    def chunks():
+        yield b'{"files": [], "empty": {}, "rest": '
+        raise AssertionError("The rest of the document was read")
+
+    assert list(iter_members(chunks(), {"files", "empty"})) == []
+
+
+def test_invalid_documents_raise():
+    with pytest.raises(ValueError):
+        list(iter_members([b'{"files": [1, 2'], {"files"}))
+    with pytest.raises(ValueError):
+        list(iter_members([b'["files"]'], {"files"}))
+
+
+def test_conda_versions_are_streamed(bumpy_cache_dir):
+    versions = [f"0.{i % 50}.{i % 7}" for i in range(5000)] + ["1.0.0a1", "0.49.6"]
+    repodata = {
+        "info": {"subdir": "noarch"},
+        "packages": {f"pkg-{v}-{i}.tar.bz2": {"name": "pkg", "version": v} for i, v in enumerate(versions[:10])},
+        "packages.conda": {"other-9.0.0-0.conda": {"name": "other", "version": "9.0.0"}},
+    }
+    routes = {
+        "/package/owner/pkg": conda_route(versions, headers={"ETag": '"v1"'}),
+        "/owner/noarch/repodata.json": Route(repodata),
+        # A channel URL with a token in the query
+        "/owner/noarch/repodata.json?t=1": Route(repodata),
+    }
+    with RegistryStub(routes) as stub:
+        url = f"{stub.url}/package/owner/pkg"
+        assert py_distro.get_latest_conda_version(url) == "1.0.0-alpha.1"
+        # Parsing stops before the end of the document, the rest is still read so it is cached and revalidated
+        assert py_distro.get_latest_conda_version(url) == "1.0.0-alpha.1"
+
+        repodata_url = f"{stub.url}/owner/noarch/repodata.json"
+        assert py_distro.get_latest_conda_version(repodata_url, package_name="pkg") == "0.9.2"
+        # Read from repodata.json when zstandard is missing, or decompressed on the fly
+        assert py_distro.get_latest_conda_version(repodata_url + ".zst", package_name="pkg") == "0.9.2"
+        assert py_distro.get_latest_conda_version(repodata_url + ".zst?t=1", package_name="pkg") == "0.9.2"
+        with pytest.raises(ValueError, match="package name"):
+            py_distro.get_latest_conda_version(repodata_url)
+
+    assert [r[2].get("If-None-Match") for r in stub.requests[:2]] == [None, '"v1"']
@@ -0,0 +1,90 @@
+import json
+
+from bumpyproject.docker_helper import DockerACRHelper
+from bumpyproject.oci_registry import OCIRegistry, retag_existing_image
+from tests.registry_stub import OCIRegistryStub
+
+
+def test_retag_by_repo_digest_puts_the_same_manifest():
+    with OCIRegistryStub(token="t0k3n") as stub:
+        manifest_digest, config_digest = stub.add_image("app", "1.0.0", b'{"config": 1}')
+        registry = OCIRegistry(stub.url, "user", "secret")
+
+        assert retag_existing_image(registry, "app", "1.0.1", config_digest, [f"acr.io/app@{manifest_digest}"])
+
+        assert stub.manifests[("app", "1.0.1")] == stub.manifests[("app", "1.0.0")]
+        assert not any(path.startswith("/v2/app/blobs/uploads") for _, path, _ in stub.requests)
+        # A single token request for the repository
+        assert sum(path.startswith("/token") for _, path, _ in stub.requests) == 1
+
+
+def test_retag_by_config_digest_scans_the_newest_versions_first():
+    with OCIRegistryStub(page_size=2) as stub:
+        for version in ("0.9.0", "1.0.0", "latest", "0.1.0"):
+            stub.add_image("app", version, f'{{"v": "{version}"}}'.encode())
+        _, config_digest = stub.add_image("app", "1.1.0", b'{"v": "same"}')
+        registry = OCIRegistry(stub.url)
+
+        assert retag_existing_image(registry, "app", "1.2.0", config_digest)
+
+        manifest_gets = [path for method, path, _ in stub.requests if method == "GET" and "/manifests/" in path]
+        # The image id lookup, then the newest version which matches
+        assert manifest_gets[-1] == "/v2/app/manifests/1.1.0"
+        assert json.loads(stub.manifests[("app", "1.2.0")])["config"]["digest"] == config_digest
+
+
+def test_unknown_image_is_not_retagged():
+    with OCIRegistryStub() as stub:
+        stub.add_image("app", "1.0.0", b'{"config": 1}')
+        registry = OCIRegistry(stub.url)
+
+        assert not retag_existing_image(registry, "app", "1.0.1", "sha256:" + "0" * 64)
+        assert ("app", "1.0.1") not in stub.manifests
+        # Tags are not scanned if the config blob does not exist
+        assert not any("/tags/list" in path for _, path, _ in stub.requests)
+
+
+def test_tags_are_paged_with_link_headers():
+    with OCIRegistryStub(page_size=2) as stub:
+        for version in ("1.0.0", "1.0.1", "1.0.2", "1.0.3", "1.0.4"):
+            stub.add_image("team/app", version, version.encode())
+
+        assert list(OCIRegistry(stub.url).iter_tags("team/app")) == ["1.0.0", "1.0.1", "1.0.2", "1.0.3", "1.0.4"]
+
+
+def test_expected_tags_are_checked_before_listing_tags():
+    with OCIRegistryStub() as stub:
+        for version in ("0.9.0", "1.0.0"):
+            stub.add_image("app", version, f'{{"v": "{version}"}}'.encode())
+        _, config_digest = stub.add_image("app", "latest", b'{"v": "same"}')
+        registry = OCIRegistry(stub.url)
+
+        assert retag_existing_image(registry, "app", "1.1.0", config_digest, expected_tags=["latest"])
+        assert not any("/tags/list" in path for _, path, _ in stub.requests)
+
+
+def test_tag_listing_is_bounded():
+    with OCIRegistryStub(page_size=2) as stub:
+        for version in ("1.0.0", "1.0.1", "1.0.2", "1.0.3", "1.0.4"):
+            stub.add_image("app", version, version.encode())
+        _, config_digest = stub.add_image("app", "1.0.4", b"1.0.4")
+
+        assert OCIRegistry(stub.url).find_manifest_by_config("app", config_digest, list_limit=3) is None
+        assert sum("/tags/list" in path for _, path, _ in stub.requests) == 2
+
+
+def test_registry_errors_fall_back_to_a_push(monkeypatch):
+    import docker
+
+    class FakeAPIClient:
+        def inspect_image(self, repo):
+            raise docker.errors.ImageNotFound(repo)
+
+    monkeypatch.setattr(docker, "APIClient", FakeAPIClient)
+    helper = DockerACRHelper("myacr", "app", "tenant", "user", "secret")
+    assert not helper.retag_if_pushed("myacr.azurecr.io/app:1.0.1")
+
+    # Nothing listens on this port
+    monkeypatch.setattr(DockerACRHelper, "registry_url", "http://127.0.0.1:9")
+    monkeypatch.setattr(FakeAPIClient, "inspect_image", lambda self, repo: {"Id": "sha256:" + "0" * 64})
+    assert not helper.retag_if_pushed("myacr.azurecr.io/app:1.0.1")
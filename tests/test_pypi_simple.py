@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+from bumpyproject import py_distro
+from tests.registry_stub import SimpleIndexStub, pypi_route
+
+VERSIONS = ["0.9.0", "0.10.0", "1.0.0a1", "0.10.1"]
+
+
+@pytest.mark.parametrize("api_version", ["1.1", "1.0"])
+def test_versions_from_the_simple_json_api(api_version):
+    with SimpleIndexStub(api_version=api_version) as stub:
+        stub.add_project("ada-py", VERSIONS)
+        assert sorted(py_distro.get_simple_index_versions(f"{stub.url}/simple/ada-py/")) == sorted(VERSIONS)
+        # A private index is addressed by its project page, a PyPI-like one also by its legacy JSON API URL
+        assert py_distro.get_latest_pypi_version(f"{stub.url}/simple/ada-py/") == "1.0.0-alpha.1"
+        assert py_distro.get_latest_pypi_version(f"{stub.url}/pypi/Ada_Py/json") == "1.0.0-alpha.1"
+
+    assert [r[1] for r in stub.requests] == ["/simple/ada-py/"] * 3
+    headers = stub.requests[0][2]
+    assert headers["Accept"] == py_distro.SIMPLE_JSON_TYPE
+    assert headers["Accept-Encoding"] == "gzip"
+
+
+def test_fallback_to_the_legacy_json_api():
+    with SimpleIndexStub(serve_json=False, routes={"/pypi/ada-py/json": pypi_route(VERSIONS)}) as stub:
+        stub.add_project("ada-py", VERSIONS)
+        url = f"{stub.url}/pypi/ada-py/json"
+        assert py_distro.get_latest_pypi_version(url) == "1.0.0-alpha.1"
+        # The index is known to serve HTML only, so it is not asked again
+        assert py_distro.get_latest_pypi_version(url) == "1.0.0-alpha.1"
+
+        # Neither API is available
+        with pytest.raises(requests.HTTPError):
+            py_distro.get_latest_pypi_version(f"{stub.url}/index/simple/other/")
+
+    assert [r[1] for r in stub.requests] == [
+        "/simple/ada-py/",
+        "/pypi/ada-py/json",
+        "/pypi/ada-py/json",
+        "/index/simple/other/",
+        "/index/pypi/other/json",
+    ]
+
+
+def test_unpublished_projects_are_asked_again():
+    with SimpleIndexStub() as stub:
+        url = f"{stub.url}/simple/ada-py/"
+        assert py_distro.get_simple_index_versions(url) is None
+
+        stub.add_project("ada-py", VERSIONS)
+        assert sorted(py_distro.get_simple_index_versions(url)) == sorted(VERSIONS)
+
+    assert [r[1] for r in stub.requests] == ["/simple/ada-py/"] * 2
+
+
+def test_pypi_urls():
+    assert py_distro.pypi_urls("https://pypi.org/pypi/Ada.Py/json") == (
+        "https://pypi.org/simple/ada-py/",
+        "https://pypi.org/pypi/Ada.Py/json",
+    )
+    assert py_distro.pypi_urls("https://pkgs.example.com/repo/simple/ada-py") == (
+        "https://pkgs.example.com/repo/simple/ada-py/",
+        "https://pkgs.example.com/repo/pypi/ada-py/json",
+    )
+    assert py_distro.pypi_urls("https://example.com/releases.json") == (None, "https://example.com/releases.json")
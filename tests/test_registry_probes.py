@@ -0,0 +1,120 @@
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from bumpyproject.bumper import OutdatedBumpError
+from bumpyproject.helpers import ProbeTimeoutError, run_concurrently
+from bumpyproject.project import Project
+from tests.registry_stub import RegistryStub, Route, conda_route, pypi_route
+
+
+def test_registry_probes_run_concurrently(mock_proj_a):
+    routes = {
+        "/pypi/pkg/json": pypi_route(["0.0.1a1", "0.0.0"], latency=0.5),
+        "/package/krande/pkg": conda_route(["0.0.1a1", "0.0.0"], latency=0.5),
+    }
+    with RegistryStub(routes) as stub:
+        proj = Project(mock_proj_a, pypi_url=f"{stub.url}/pypi/pkg/json", conda_url=f"{stub.url}/package/krande/pkg")
+
+        start = time.perf_counter()
+        assert proj.bump("patch", check_current_version=True) == "0.0.1"
+        elapsed = time.perf_counter() - start
+
+    # The stub has no simple index, so PyPI is looked up in the legacy JSON API after a 404
+    assert [r[1] for r in stub.requests if r[1].startswith("/simple/")] == ["/simple/pkg/"]
+    assert len(stub.requests) == 3
+    assert elapsed < 0.9
+
+
+def test_registry_probes_github_outputs(mock_proj_a, tmp_path, monkeypatch):
+    github_output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(github_output))
+
+    routes = {
+        "/pypi/pkg/json": pypi_route(["0.0.1"]),
+        "/package/krande/pkg": conda_route(["0.0.0"]),
+    }
+    with RegistryStub(routes) as stub:
+        proj = Project(
+            mock_proj_a,
+            pypi_url=f"{stub.url}/pypi/pkg/json",
+            conda_url=f"{stub.url}/package/krande/pkg",
+            ga_version_output=True,
+        )
+        proj.bump("patch", check_current_version=True)
+
+    assert github_output.read_text() == "PYPIBUMP=FALSE\nCONDABUMP=TRUE\n"
+
+
+def test_registry_probes_errors(mock_proj_a, monkeypatch):
+    routes = {
+        "/pypi/pkg/json": pypi_route(["0.1.0"]),
+        "/package/krande/pkg": conda_route(["0.0.0"], latency=1.0),
+    }
+    with RegistryStub(routes) as stub:
+        proj = Project(mock_proj_a, pypi_url=f"{stub.url}/pypi/pkg/json")
+        with pytest.raises(OutdatedBumpError):
+            proj.bump("patch", check_current_version=True)
+
+        monkeypatch.setattr("bumpyproject.env_vars.CONDA_TIMEOUT", 0.2)
+        proj = Project(mock_proj_a, conda_url=f"{stub.url}/package/krande/pkg")
+        with pytest.raises(ProbeTimeoutError):
+            proj.bump("patch", check_current_version=True)
+
+
+def test_registry_probes_are_checked_in_order(mock_proj_a, tmp_path, monkeypatch):
+    github_output = tmp_path / "github_output"
+    monkeypatch.setenv("GITHUB_OUTPUT", str(github_output))
+
+    # Conda fails first, but the outdated version on PyPI is what gets reported
+    routes = {
+        "/pypi/pkg/json": pypi_route(["0.1.0"], latency=0.3),
+        "/package/krande/pkg": Route({"error": "unavailable"}, status=503),
+    }
+    with RegistryStub(routes) as stub:
+        proj = Project(mock_proj_a, pypi_url=f"{stub.url}/pypi/pkg/json", conda_url=f"{stub.url}/package/krande/pkg")
+        with pytest.raises(OutdatedBumpError):
+            proj.bump("patch", check_current_version=True)
+
+        # With GitHub Actions outputs the PyPI output is written before the conda error is raised
+        proj = Project(
+            mock_proj_a,
+            pypi_url=f"{stub.url}/pypi/pkg/json",
+            conda_url=f"{stub.url}/package/krande/pkg",
+            ga_version_output=True,
+        )
+        with pytest.raises(requests.HTTPError):
+            proj.bump("patch", check_current_version=True)
+
+    assert github_output.read_text() == "PYPIBUMP=FALSE\n"
+
+
+def test_run_concurrently_raises_first_failure():
+    def slow():
+        time.sleep(2.0)
+
+    def fails():
+        raise ValueError("fails")
+
+    start = time.perf_counter()
+    # The slow task comes first, the failure of the second one is raised without waiting for it
+    with pytest.raises(ValueError):
+        run_concurrently({"slow": (slow, None), "fails": (fails, None)})
+    assert time.perf_counter() - start < 1.0
+
+
+def test_run_concurrently_timeout_does_not_block_exit():
+    code = (
+        "import time\n"
+        "from bumpyproject.helpers import ProbeTimeoutError, run_concurrently\n"
+        "try:\n"
+        "    run_concurrently({'slow': (lambda: time.sleep(3.0), 0.2)})\n"
+        "except ProbeTimeoutError:\n"
+        "    pass\n"
+    )
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert time.perf_counter() - start < 2.5
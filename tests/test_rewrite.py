@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+
+import pytest
+
+from bumpyproject import rewrite
+from bumpyproject.project import bump_package_json, bump_pyproject
+
+PYPROJECT = b"""# A comment that tomlkit would keep, but spacing like  this  is fragile
+[build-system]
+requires = ["setuptools"]
+version = "not this one"
+
+[project]
+name    = "example"   # aligned
+version = '0.1.0'  # the version
+description = \"\"\"
+version = "inside a string"
+\"\"\"
+
+[project.optional-dependencies]
+dev = ["pytest"]
+
+[tool.other]
+version = "9.9.9"
+"""
+
+
+def test_only_the_version_span_changes(tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_bytes(PYPROJECT.replace(b'description = """\nversion = "inside a string"\n"""\n', b""))
+
+    assert bump_pyproject(path, "0.2.0-alpha.1")
+
+    content = path.read_bytes()
+    assert content == PYPROJECT.replace(b'description = """\nversion = "inside a string"\n"""\n', b"").replace(
+        b"'0.1.0'", b"'0.2.0alpha.1'"
+    )
+    assert rewrite.read_version_with_parser(content, "toml") == "0.2.0alpha.1"
+
+
+def test_multiline_strings_are_skipped(tmp_path):
+    span = rewrite.find_pyproject_version(PYPROJECT)
+    assert span.value(PYPROJECT) == "0.1.0"
+
+    content = rewrite.set_pyproject_version(PYPROJECT, "0.2.0", validate=True)
+    assert content == PYPROJECT.replace(b"'0.1.0'", b"'0.2.0'")
+
+    # Without a real version key, the line in the string is not taken for one
+    for quotes in (b'"""', b"'''"):
+        content = PYPROJECT.replace(b"version = '0.1.0'  # the version\n", b"").replace(b'"""', quotes)
+        assert rewrite.find_pyproject_version(content) is None
+        assert rewrite.find_pyproject_version(b'[project]\ndescription = """\n[tool]\n"""\nversion = "1.0"\n')
+
+
+def test_escaped_version_falls_back_to_tomlkit(tmp_path):
+    content = PYPROJECT.replace(b"'0.1.0'", b'"0.1.\\u0030"')
+    assert rewrite.find_pyproject_version(content) is None
+
+    content = rewrite.set_pyproject_version(content, "0.2.0", validate=True)
+    assert rewrite.read_version_with_parser(content, "toml") == "0.2.0"
+    assert b'version = "9.9.9"' in content
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {"name": "x", "version": "1.0.0", "dependencies": {"version": "0.0.1"}},
+        {"config": {"version": "0.0.1"}, "versions": ["1"], "version": "1.0.0"},
+        {"name": 'with \\" escapes', "version": "1.0.0"},
+    ],
+)
+def test_package_json_keeps_formatting(tmp_path, document):
+    path = tmp_path / "package.json"
+    original = json.dumps(document, indent=4).replace(': "1.0.0"', ':   "1.0.0"') + "\n"
+    path.write_text(original)
+
+    assert bump_package_json(path, "1.1.0")
+
+    assert path.read_text() == original.replace('"1.0.0"', '"1.1.0"')
+
+
+def test_validation_catches_a_wrong_rewrite(monkeypatch):
+    # Simulate a scanner bug that points at the wrong span
+    monkeypatch.setattr(rewrite, "find_pyproject_version", lambda content: rewrite.VersionSpan(0, 1))
+
+    with pytest.raises(rewrite.RewriteError):
+        rewrite.set_pyproject_version(b'[project]\nversion = "0.1.0"\n', "0.2.0", validate=True)
+
+
+def test_atomic_write_keeps_permissions(tmp_path):
+    path = tmp_path / "package.json"
+    path.write_text('{"version": "1.0.0"}')
+    os.chmod(path, 0o644)
+
+    rewrite.write_atomic(path, b'{"version": "1.0.1"}')
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,159 @@
+import pathlib
+
+import git
+import pytest
+
+from bumpyproject.project import Project
+from bumpyproject.substitutions import (
+    SubstitutionError,
+    SubstitutionRule,
+    apply_substitutions,
+    glob_to_regex,
+    substitute_file,
+)
+
+RULES = [
+    SubstitutionRule("**/Dockerfile", r"^ARG VERSION=(\S+)"),
+    SubstitutionRule("src/*/__init__.py", r'^__version__ = "([^"]+)"', format="pep440"),
+    SubstitutionRule("**/*.yaml", r"^appVersion: (\S+)"),
+    SubstitutionRule("**/*.yaml", r"image: repo:(\S+)"),
+]
+
+
+def make_tree(root: pathlib.Path):
+    (root / "docker").mkdir()
+    (root / "docker" / "Dockerfile").write_text("FROM python\nARG VERSION=0.1.0\nRUN echo $VERSION\n")
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "pkg" / "__init__.py").write_text('__version__ = "0.1.0"\n')
+    (root / "chart.yaml").write_text("appVersion: 0.1.0\nimage: repo:0.1.0\nother: 0.1.0\n")
+    (root / "node_modules" / "x").mkdir(parents=True)
+    (root / "node_modules" / "x" / "Dockerfile").write_text("ARG VERSION=0.0.1\n")
+
+
+def test_rules_are_applied_across_files(tmp_path):
+    make_tree(tmp_path)
+
+    report = apply_substitutions(tmp_path, RULES, "0.2.0-alpha.1")
+
+    dockerfile = (tmp_path / "docker" / "Dockerfile").read_text()
+    assert dockerfile == "FROM python\nARG VERSION=0.2.0-alpha.1\nRUN echo $VERSION\n"
+    assert (tmp_path / "src" / "pkg" / "__init__.py").read_text() == '__version__ = "0.2.0alpha.1"\n'
+    chart = (tmp_path / "chart.yaml").read_text()
+    assert chart == "appVersion: 0.2.0-alpha.1\nimage: repo:0.2.0-alpha.1\nother: 0.1.0\n"
+    # Ignored directories are not searched
+    assert (tmp_path / "node_modules" / "x" / "Dockerfile").read_text() == "ARG VERSION=0.0.1\n"
+
+    assert [(m.path.name, m.line, m.old) for m in report.matches] == [
+        ("chart.yaml", 1, "0.1.0"),
+        ("chart.yaml", 2, "0.1.0"),
+        ("Dockerfile", 2, "0.1.0"),
+        ("__init__.py", 1, "0.1.0"),
+    ]
+    assert len(report.changed_paths) == 3
+    assert "chart.yaml:2: 0.1.0 -> 0.2.0-alpha.1" in report.format()
+
+
+def test_dry_run_reports_a_diff_without_writing(tmp_path):
+    make_tree(tmp_path)
+
+    report = apply_substitutions(tmp_path, RULES, "0.2.0", dry_run=True)
+
+    assert (tmp_path / "chart.yaml").read_text() == "appVersion: 0.1.0\nimage: repo:0.1.0\nother: 0.1.0\n"
+    diff = report.diff()
+    assert "--- a/chart.yaml\n+++ b/chart.yaml\n@@ -1,2 +1,2 @@\n-appVersion: 0.1.0\n-image: repo:0.1.0\n" in diff
+    assert "+ARG VERSION=0.2.0" in diff
+    assert list(tmp_path.glob("**/.*.tmp")) == []
+
+
+def test_large_files_are_processed_in_chunks(tmp_path):
+    path = tmp_path / "big.txt"
+    lines = [f"line {i} version=1.0.0" if i % 1000 == 0 else f"line {i}" for i in range(20_000)]
+    path.write_text("\n".join(lines) + "\n")
+
+    result = substitute_file(
+        path, (SubstitutionRule("big.txt", r"version=(\S+)"),), "2.0.0", chunk_size=4096, max_match_size=256
+    )
+
+    assert [m.line for m in result.matches] == list(range(1, 20_001, 1000))
+    assert path.read_text() == "\n".join(lines).replace("1.0.0", "2.0.0") + "\n"
+
+
+def test_matches_across_chunk_boundaries(tmp_path):
+    path = tmp_path / "f.txt"
+    text = "filler line\n" * 5 + "a\nversion=1.0.0b=1.0.0\n" + "filler line\n" * 5 + "b=1.0.0\n"
+    rules = (SubstitutionRule("f.txt", r"^a\nversion=([0-9.]+)"), SubstitutionRule("f.txt", r"^b=(\S+)"))
+
+    # Wherever the chunks end, the rest of a line after a match is not taken for the start of a line
+    for chunk_size in range(8, 64):
+        path.write_text(text)
+        result = substitute_file(path, rules, "2.0.0", chunk_size=chunk_size, max_match_size=24)
+        assert [m.line for m in result.matches] == [7, 13], chunk_size
+        assert path.read_text() == text.replace("version=1.0.0", "version=2.0.0").replace("\nb=1.0.0", "\nb=2.0.0")
+
+
+def test_rules_with_inline_flags(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("Version: 1.0.0\nname: a\n")
+    rules = (SubstitutionRule("f.txt", r"(?i)version: (.*)"),)
+    result = substitute_file(path, rules, "2.0.0")
+    assert [m.old for m in result.matches] == ["1.0.0"]
+
+    # Flags only apply to their own rule
+    path.write_text("Version: 1.0.0\nNAME: 1.0.0\n")
+    rules = (SubstitutionRule("f.txt", r"(?i)(?m)^version: (.*)$"), SubstitutionRule("f.txt", r"name: (.*)"))
+    result = substitute_file(path, rules, "2.0.0")
+    assert path.read_text() == "Version: 2.0.0\nNAME: 1.0.0\n"
+
+
+def test_rules_reusing_a_group_name(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_text("a=1.0.0\nb=1.0.0\n")
+    rules = (SubstitutionRule("f.txt", r"a=(?P<v>\S+)"), SubstitutionRule("f.txt", r"b=(?P<v>\S+)"))
+    result = substitute_file(path, rules, "2.0.0")
+    assert [m.rule for m in result.matches] == list(rules)
+    assert path.read_text() == "a=2.0.0\nb=2.0.0\n"
+
+
+def test_invalid_rules():
+    with pytest.raises(SubstitutionError):
+        SubstitutionRule("*", r"(\d+)\.\1")
+    with pytest.raises(SubstitutionError):
+        SubstitutionRule("*", r"version=(")
+    # Global flags must lead the pattern
+    with pytest.raises(SubstitutionError):
+        SubstitutionRule("*", r"version: (?i)(.*)")
+
+
+def test_glob_translation():
+    assert glob_to_regex("**/Dockerfile").match("Dockerfile")
+    assert glob_to_regex("**/Dockerfile").match("a/b/Dockerfile")
+    assert not glob_to_regex("*.yaml").match("a/b.yaml")
+    assert glob_to_regex("docs/**").match("docs/a/b.md")
+
+
+def test_bump_commits_the_substituted_files(mock_proj_a):
+    root = pathlib.Path(mock_proj_a)
+    with open(root / "pyproject.toml", "a") as f:
+        f.write('\n[[tool.bumpy.substitutions]]\nglob = "config/*.yaml"\npattern = "a_version_number: (.*)"\n')
+    repo = git.Repo(root)
+    repo.git.commit("-am", "Add substitutions")
+
+    Project(mock_proj_a).bump("patch", check_git=False)
+
+    assert "a_version_number: 0.0.2" in (root / "config" / "a_yaml_with_some_text.yaml").read_text()
+    assert not repo.is_dirty()
+    assert repo.head.commit.stats.files.keys() == {"pyproject.toml", "config/a_yaml_with_some_text.yaml"}
+
+
+def test_no_substitutions_without_a_version_change(mock_proj_a):
+    root = pathlib.Path(mock_proj_a)
+    with open(root / "pyproject.toml", "a") as f:
+        f.write('\n[[tool.bumpy.substitutions]]\nglob = "config/*.yaml"\npattern = "a_version_number: (.*)"\n')
+    repo = git.Repo(root)
+    repo.git.commit("-am", "Add substitutions")
+
+    project = Project(mock_proj_a)
+    project.write_version = lambda new_version: False
+    project.bump("patch", check_git=False)
+
+    assert not repo.is_dirty()
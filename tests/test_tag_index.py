@@ -0,0 +1,38 @@
+from bumpyproject.git_helper import GitHelper
+from bumpyproject.tag_index import TagIndex, get_tag_index
+
+
+def test_tags_are_sorted_by_version():
+    names = ["1.10.0", "1.9.0", "1.10.0-alpha.2", "1.10.0-alpha.10", "2.0.0-alpha.1", "latest", "pkg-3.0.0"]
+    index = TagIndex(names)
+
+    assert index.names == ["1.9.0", "1.10.0-alpha.2", "1.10.0-alpha.10", "1.10.0", "2.0.0-alpha.1"]
+    assert index.latest() == "2.0.0-alpha.1"
+    assert index.latest_stable() == "1.10.0"
+    assert index.latest_in_series(1) == "1.10.0"
+    assert index.latest_in_series(1, 9) == "1.9.0"
+    assert index.latest_in_series(3) is None
+
+    assert TagIndex(names, prefix="pkg-").names == ["pkg-3.0.0"]
+    assert TagIndex([]).latest() is None
+
+
+def test_index_reads_packed_and_loose_tags(mock_proj_a):
+    git_helper = GitHelper(mock_proj_a)
+    repo = git_helper.git_repo
+    for name in ("0.1.0", "0.10.0", "0.9.0", "nightly/0.11.0", "0.11.0-alpha.1"):
+        repo.git.tag(name)
+    repo.git.pack_refs("--all")
+    repo.git.tag("0.2.0")
+
+    index = git_helper.tag_index()
+    assert index.names == ["0.1.0", "0.2.0", "0.9.0", "0.10.0", "0.11.0-alpha.1"]
+    assert git_helper.get_latest_tag() == "0.11.0-alpha.1"
+    assert index.latest_stable() == "0.10.0"
+
+    # The index is reused until the tags change
+    assert get_tag_index(repo.git_dir) is index
+    repo.git.tag("0.12.0")
+    assert git_helper.get_latest_tag() == "0.12.0"
+    repo.git.tag("-d", "0.12.0", "0.11.0-alpha.1")
+    assert git_helper.get_latest_tag() == "0.10.0"
@@ -0,0 +1,67 @@
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from typer.testing import CliRunner
+
+from bumpyproject import tracing
+from bumpyproject.cli_bumpy import app
+from bumpyproject.helpers import map_in_context
+from bumpyproject.project import Project
+
+
+def test_spans_are_noops_when_disabled(mock_proj_a):
+    assert not tracing.is_enabled()
+    assert tracing.span("anything") is tracing.span("something else")
+
+    Project(mock_proj_a).bump("patch", check_git=False)
+    assert tracing.disable() is None
+
+
+def test_bump_phases_are_traced(mock_proj_a):
+    tracer = tracing.enable()
+    try:
+        Project(mock_proj_a).bump("patch", check_git=False)
+    finally:
+        tracing.disable()
+
+    names = {s.name for s in tracer.spans}
+    assert {"project.bump", "project.read_version", "git.check_state", "git.commit_and_tag", "git.commit"} <= names
+
+    bump = next(s for s in tracer.spans if s.name == "project.bump")
+    assert all(s.duration_ns <= bump.duration_ns for s in tracer.spans)
+
+    events = tracer.chrome_trace()["traceEvents"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert tracer.summary()[0][0] == "project.bump"
+
+
+def test_profile_option_writes_a_chrome_trace(mock_proj_a, tmp_path, monkeypatch):
+    monkeypatch.chdir(mock_proj_a)
+    trace_file = tmp_path / "trace.json"
+
+    result = CliRunner().invoke(app, ["--profile", str(trace_file), "pyproject", "--dry-run", "--bump-level", "patch"])
+
+    assert result.exit_code == 0, result.output
+    assert not tracing.is_enabled()
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert "project.bump" in {event["name"] for event in events}
+    assert "total ms" in result.output
+
+
+def test_tracers_are_per_context():
+    def work(_):
+        with tracing.span("worker"):
+            pass
+
+    tracer = tracing.enable()
+    try:
+        # e.g. another command running in the daemon
+        assert not contextvars.Context().run(tracing.is_enabled)
+        # Workers of this command record their spans
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            map_in_context(executor, work, range(2))
+    finally:
+        tracing.disable()
+
+    assert [s.name for s in tracer.spans] == ["worker", "worker"]
@@ -0,0 +1,63 @@
+import itertools
+import random
+
+import pytest
+import semver
+
+from bumpyproject import env_vars as env
+from bumpyproject import versions
+from bumpyproject.bumper import version_to_tuple
+
+
+def _random_versions(count, seed=0):
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        ver = f"{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 3)}"
+        pre = rng.choice([None, "alpha", "alpha.1", "alpha.10", "alpha.beta", "rc.2", "1", "alpha.1.1"])
+        if pre is not None:
+            ver += f"-{pre}"
+        if rng.random() < 0.1:
+            ver += "+build.5"
+        result.append(ver)
+    return result
+
+
+def test_version_ordering_matches_semver():
+    sample = _random_versions(60)
+    for a, b in itertools.product(sample, repeat=2):
+        va, vb = versions.parse_version(a), versions.parse_version(b)
+        expected = semver.Version.parse(a).compare(b)
+        assert ((va > vb) - (va < vb)) == expected, (a, b)
+
+
+def test_bulk_operations():
+    sample = ["0.1.0", "1.0.0-alpha.2", "1.0.0", "0.2.0a3", "1.1.0-alpha.1", "0.2.1", "latest"]
+
+    assert versions.latest_version(sample, skip_invalid=True) == "1.1.0-alpha.1"
+    assert versions.top_versions(sample, 2, skip_invalid=True) == ["1.1.0-alpha.1", "1.0.0"]
+    assert versions.sort_versions(sample[:3]) == ["0.1.0", "1.0.0-alpha.2", "1.0.0"]
+    assert versions.latest_versions_per_series(sample, depth=1, skip_invalid=True) == {
+        (0,): "0.2.1",
+        (1,): "1.1.0-alpha.1",
+    }
+    assert versions.latest_versions_per_series(sample, skip_invalid=True)[(0, 2)] == "0.2.1"
+    assert version_to_tuple("0.2.0-alpha.3") == (0, 2, 0, 3, 0)
+
+
+def test_parse_version_follows_the_release_tag(monkeypatch):
+    assert str(versions.parse_version("1.0.0alpha1")) == "1.0.0-alpha1"
+    with pytest.raises(ValueError):
+        versions.parse_version("1.0.0beta1")
+
+    monkeypatch.setattr(env, "RELEASE_TAG", "beta")
+    assert str(versions.parse_version("1.0.0beta1")) == "1.0.0-beta1"
+    # Not the parse made with the previous tag
+    assert str(versions.parse_version("1.0.0alpha1")) == versions.make_semver_compatible("1.0.0alpha1")
+
+
+def test_comparing_with_other_types():
+    version = versions.parse_version("1.0.0")
+    assert version != "1.0.0"
+    with pytest.raises(TypeError):
+        assert version < "1.0.0"
@@ -0,0 +1,43 @@
+import pytest
+
+from bumpyproject.workspace import Workspace, WorkspaceBumpError, format_summary
+from tests.registry_stub import RegistryStub, pypi_route
+
+
+def test_workspace_bump(mock_monorepo):
+    ws = Workspace(mock_monorepo)
+    assert [p.get_pyproject_name() for p in ws.projects] == ["pkg_0", "pkg_1", "pkg_2"]
+
+    results = ws.bump("minor", git_push=True)
+    assert {r.status for r in results} == {"bumped"}
+    assert [p.get_pyproject_version() for p in ws.projects] == ["0.2.0"] * 3
+
+    repo = ws.git.git_repo
+    assert sorted(t.name for t in repo.tags) == ["pkg_0-0.2.0", "pkg_1-0.2.0", "pkg_2-0.2.0"]
+    assert len(list(repo.iter_commits())) == 2
+    assert "pkg_1 0.1.0 --> 0.2.0" in repo.head.commit.message
+    assert "pkg_2" in format_summary(results)
+
+
+def test_workspace_failing_package_leaves_tree_untouched(mock_monorepo):
+    with RegistryStub({"/pypi/pkg_1/json": pypi_route(["1.0.0"])}) as stub:
+        routes = {f"/pypi/pkg_{i}/json": pypi_route(["0.1.0"]) for i in (0, 2)}
+        stub.routes.update(routes)
+        ws = Workspace(mock_monorepo, pypi_url=stub.url + "/pypi/{name}/json")
+        with pytest.raises(WorkspaceBumpError):
+            ws.bump("patch")
+
+    assert [p.get_pyproject_version() for p in ws.projects] == ["0.1.0"] * 3
+    assert not ws.git.git_repo.is_dirty()
+
+
+def test_workspace_bugs_are_not_package_failures(mock_monorepo, monkeypatch):
+    from bumpyproject.project import Project
+
+    def check_registries(self, new_version):
+        raise TypeError("a bug")
+
+    monkeypatch.setattr(Project, "check_registries", check_registries)
+    ws = Workspace(mock_monorepo)
+    with pytest.raises(TypeError):
+        ws.bump("patch")